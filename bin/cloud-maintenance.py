@@ -1,12 +1,38 @@
 import argparse
+import asyncio
+import cProfile
+import fnmatch
+import functools
+import hashlib
+import heapq
+import importlib.metadata
+import io
+import json
+import os
+import pickle
+import random
+import re
+import shutil
+import signal
 import sys
-from collections import namedtuple
+import tarfile
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Tuple
 
+import yaml
 from axolpy import logging
-from axolpy.aws import AWSRegion
+from axolpy.aws import AWSRegion, ECSCluster, ECSService, RDSDatabase
 from axolpy.cloudmaintenance import Operator, ResourceDataLoader
-from axolpy.cloudmaintenance.steps import (DumpMysqlTableStatus, DumpPgstats,
+from axolpy.kubernetes import Cluster, Deployment, Namespace
+from axolpy.cloudmaintenance.steps import (CloudMaintenanceStep,
+                                           DumpMysqlTableStatus, DumpPgstats,
                                            ModifyDatabaseClassType,
                                            ModifyDatabaseEngineVersion,
                                            QueryDatabaseStatus,
@@ -48,6 +74,1696 @@ def print_regions_detail(aws_regions: AWSRegion) -> None:
                     logger.info(f"      {deployment}")
 
 
+# The C parser and emitter of libyaml are much faster and are used if PyYAML
+# is built with them
+YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAMLDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+ItemFilter = namedtuple("ItemFilter", ["field", "values"])
+
+YAML_MERGE_TAG = "tag:yaml.org,2002:merge"
+
+
+class MergeKeyFound(Exception):
+    """
+    Raised by :class:`PrunedYAMLLoader` when a document has a merge key
+    (`<<`), which it doesn't resolve.
+    """
+
+    pass
+
+
+class PrunedYAMLLoader(object):
+    """
+    Load a YAML document from its event stream, materializing only the
+    parts chosen by a selector, so that a large document is never held in
+    memory as a whole. A selector is True to load a node, a dict of the
+    selectors of the keys to load of a mapping, or an :class:`ItemFilter`
+    to load the items of a sequence of mappings whose field has one of the
+    values. Merge keys are not resolved, so :class:`MergeKeyFound` is
+    raised when one is loaded, for the document to be loaded as a whole.
+    """
+
+    def __init__(self, stream: Any) -> None:
+        """
+        Initialize a loader.
+
+        :param stream: The YAML stream, which is read incrementally.
+        :type stream: Any
+        """
+
+        self._events = yaml.parse(stream, Loader=YAMLLoader)
+        self._resolver = yaml.resolver.Resolver()
+        self._constructor = yaml.constructor.SafeConstructor()
+        self._anchors: Dict[str, Any] = dict()
+
+    def load(self, selector: Any) -> Any:
+        """
+        Load the first document of the stream.
+
+        :param selector: The selector of the document.
+        :type selector: Any
+
+        :return: The selected parts of the document, or None if the stream
+            has no document.
+        :rtype: Any
+
+        :raises: :class:`MergeKeyFound` if a loaded part has a merge key.
+        """
+
+        for event in self._events:
+            if isinstance(event, yaml.DocumentStartEvent):
+                return self._select(next(self._events), selector)
+
+        return None
+
+    def _select(self, event: yaml.Event, selector: Any) -> Any:
+        if selector is True or event.anchor is not None or isinstance(event, yaml.AliasEvent):
+            # An anchored node is loaded, as an alias may refer to it
+            return self._build(event)
+
+        if isinstance(event, yaml.MappingStartEvent) and isinstance(selector, dict):
+            mapping = dict()
+            for key_event in self._events:
+                if isinstance(key_event, yaml.MappingEndEvent):
+                    return mapping
+                key = self._build(key_event)
+                if key in selector:
+                    mapping[key] = self._select(next(self._events), selector[key])
+                else:
+                    self._skip(next(self._events))
+            return mapping
+
+        if isinstance(event, yaml.SequenceStartEvent) and isinstance(selector, ItemFilter):
+            sequence = list()
+            for item_event in self._events:
+                if isinstance(item_event, yaml.SequenceEndEvent):
+                    return sequence
+                item = self._build(item_event)
+                if isinstance(item, dict) and item.get(selector.field) in selector.values:
+                    sequence.append(item)
+            return sequence
+
+        self._skip(event)
+        return None
+
+    def _build(self, event: yaml.Event) -> Any:
+        if isinstance(event, yaml.AliasEvent):
+            return self._anchors[event.anchor]
+
+        if isinstance(event, yaml.ScalarEvent):
+            value = self._construct_scalar(event)
+        elif isinstance(event, yaml.MappingStartEvent):
+            value = dict()
+            for key_event in self._events:
+                if isinstance(key_event, yaml.MappingEndEvent):
+                    break
+                key = self._build(key_event)
+                value[key] = self._build(next(self._events))
+        else:
+            value = list()
+            for item_event in self._events:
+                if isinstance(item_event, yaml.SequenceEndEvent):
+                    break
+                value.append(self._build(item_event))
+
+        if event.anchor is not None:
+            self._anchors[event.anchor] = value
+
+        return value
+
+    def _construct_scalar(self, event: yaml.ScalarEvent) -> Any:
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = self._resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+        if tag == YAML_MERGE_TAG:
+            raise MergeKeyFound(f"line {event.start_mark.line + 1}")
+        # The constructor of the tag is called directly, since
+        # construct_object keeps every node it constructs
+        construct = self._constructor.yaml_constructors.get(
+            tag, yaml.constructor.SafeConstructor.construct_undefined)
+
+        return construct(self._constructor, yaml.ScalarNode(tag, event.value, style=event.style))
+
+    def _skip(self, event: yaml.Event) -> None:
+        if isinstance(event, yaml.AliasEvent):
+            return
+        if event.anchor is not None:
+            # An anchored node is loaded, as an alias may refer to it
+            self._build(event)
+            return
+        if isinstance(event, yaml.ScalarEvent):
+            return
+        depth = 1
+        for event in self._events:
+            if isinstance(event, yaml.NodeEvent) and event.anchor is not None \
+                    and not isinstance(event, yaml.AliasEvent):
+                self._build(event)
+            elif isinstance(event, yaml.CollectionStartEvent):
+                depth += 1
+            elif isinstance(event, yaml.CollectionEndEvent):
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+def _item_filter(selector: dict, key: str, field: str) -> ItemFilter:
+    if key not in selector:
+        selector[key] = ItemFilter(field=field, values=set())
+    return selector[key]
+
+
+def _select_ecs_resources(region: dict, ecs_yaml: dict) -> None:
+    for cluster_name, cluster_yaml in (ecs_yaml or {}).get("clusters", {}).items():
+        cluster = region.setdefault("ecs", {"clusters": {}})["clusters"].setdefault(cluster_name, dict())
+        for service in cluster_yaml.get("services") or []:
+            _item_filter(cluster, "services", "name").values.add(service["name"])
+
+
+def _select_eks_resources(region: dict, eks_yaml: dict) -> None:
+    for cluster_name, cluster_yaml in (eks_yaml or {}).get("clusters", {}).items():
+        cluster = region.setdefault("eks", {"clusters": {}})["clusters"].setdefault(
+            cluster_name, {"namespaces": {}})
+        for namespace_name, namespace_yaml in (cluster_yaml.get("namespaces") or {}).items():
+            namespace = cluster["namespaces"].setdefault(namespace_name, dict())
+            for statefulset in namespace_yaml.get("statefulsets") or []:
+                _item_filter(namespace, "statefulsets", "name").values.add(statefulset["name"])
+            for deployment in namespace_yaml.get("deployments") or []:
+                _item_filter(namespace, "deployments", "name").values.add(deployment["name"])
+
+
+def get_resource_selector(operators_yaml: dict) -> dict:
+    """
+    Get the selector of the resources of the operators, for
+    :class:`PrunedYAMLLoader` to load them from `resource.yaml`.
+
+    :param operators_yaml: The parsed `operator.yaml` of the operators.
+    :type operators_yaml: dict
+
+    :return: The selector of the regions.
+    :rtype: dict
+    """
+
+    regions: Dict[str, dict] = dict()
+    for operator_yaml in operators_yaml.values():
+        for region_name, region_yaml in operator_yaml.items():
+            region = regions.setdefault(region_name, dict())
+            for database in region_yaml.get("databases") or []:
+                _item_filter(region, "databases", "id").values.add(database["id"])
+            _select_ecs_resources(region=region, ecs_yaml=region_yaml.get("ecs"))
+            _select_eks_resources(region=region, eks_yaml=region_yaml.get("eks"))
+
+    return regions
+
+
+def load_regions(data_path: Path, maintenance_id: str, operators_yaml: dict) -> Dict[str, AWSRegion]:
+    """
+    Load the regions with the resources of the operators. `resource.yaml`
+    is streamed by :class:`PrunedYAMLLoader`, and the resources it selects
+    are built by :class:`ResourceDataLoader`, from a copy of the file with
+    only them. A file with merge keys is loaded as a whole by
+    :class:`ResourceDataLoader`.
+
+    :param data_path: Base path storing data files.
+    :type data_path: :class:`Path`
+    :param maintenance_id: Maintenance ID.
+    :type maintenance_id: str
+    :param operators_yaml: The parsed `operator.yaml` of the operators.
+    :type operators_yaml: dict
+
+    :return: The regions by name.
+    :rtype: Dict[str, :class:`AWSRegion`]
+    """
+
+    resource_path = data_path.joinpath(maintenance_id, "resource.yaml")
+    try:
+        with resource_path.open("rb") as f:
+            resources_yaml = PrunedYAMLLoader(f).load(
+                selector={"regions": get_resource_selector(operators_yaml=operators_yaml)}) or {}
+    except MergeKeyFound as e:
+        logger.info(f"{resource_path} is loaded as a whole, as it has a merge key at {e}")
+        return ResourceDataLoader.load_from_file(data_path=data_path, maintenance_id=maintenance_id)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pruned_path = Path(tmp_dir, maintenance_id, "resource.yaml")
+        pruned_path.parent.mkdir(parents=True)
+        with pruned_path.open("w") as f:
+            yaml.dump({"regions": resources_yaml.get("regions") or {}}, f, Dumper=YAMLDumper)
+
+        return ResourceDataLoader.load_from_file(data_path=Path(tmp_dir), maintenance_id=maintenance_id)
+
+
+def load_operators(operators_yaml: dict, aws_regions: Dict[str, AWSRegion]) -> Dict[str, Operator]:
+    """
+    Load all the operators from the parsed `operator.yaml`, in the way of
+    :class:`OperatorDataLoader`, which parses the file again for each
+    operator.
+
+    :param operators_yaml: The parsed `operator.yaml`.
+    :type operators_yaml: dict
+    :param aws_regions: Data of all regions.
+    :type aws_regions: Dict[str, :class:`AWSRegion`]
+
+    :return: The operators by ID.
+    :rtype: Dict[str, :class:`Operator`]
+    """
+
+    operators: Dict[str, Operator] = dict()
+    for operator_id, operator_yaml in operators_yaml.items():
+        operator = Operator(id=operator_id)
+        operators[operator_id] = operator
+        for region_name, region_yaml in operator_yaml.items():
+            region = aws_regions[region_name]
+
+            for database in region_yaml.get("databases") or []:
+                operator.add_rds_databases(region.rds_database(id=database["id"]))
+
+            for cluster_name, cluster_yaml in (region_yaml.get("ecs") or {}).get("clusters", {}).items():
+                cluster = region.ecs_cluster(name=cluster_name)
+                for service in cluster_yaml.get("services") or []:
+                    operator.add_ecs_service(service=cluster.service(name=service["name"]))
+
+            for cluster_name, cluster_yaml in (region_yaml.get("eks") or {}).get("clusters", {}).items():
+                cluster = region.eks_cluster(name=cluster_name)
+                for namespace_name, namespace_yaml in (cluster_yaml.get("namespaces") or {}).items():
+                    namespace = cluster.namespace(name=namespace_name)
+                    for statefulset in namespace_yaml.get("statefulsets") or []:
+                        operator.add_eks_statefulset(statefulset=namespace.statefulset(name=statefulset["name"]))
+                    for deployment in namespace_yaml.get("deployments") or []:
+                        operator.add_eks_deployment(deployment=namespace.deployment(name=deployment["name"]))
+
+    return operators
+
+
+@functools.lru_cache(maxsize=None)
+def get_axolpy_lib_version() -> str:
+    """
+    Get the version of axolpy-lib, which renders the steps.
+
+    :return: The version.
+    :rtype: str
+    """
+
+    return importlib.metadata.version("axolpy-lib")
+
+
+def get_model_key(data_path: Path, maintenance_id: str, pattern: str) -> str:
+    """
+    Get the key of the model loaded from the data files of a maintenance
+    for the operators matching *pattern*, which changes when a file, the
+    version of axolpy-lib or this script, which prunes and selects the
+    resources, changes.
+
+    :param data_path: Base path storing data files.
+    :type data_path: :class:`Path`
+    :param maintenance_id: Maintenance ID.
+    :type maintenance_id: str
+    :param pattern: The glob pattern of the operators.
+    :type pattern: str
+
+    :return: The key.
+    :rtype: str
+    """
+
+    parts = [get_axolpy_lib_version(),
+             str(pickle.HIGHEST_PROTOCOL),
+             hashlib.sha256(Path(__file__).read_bytes()).hexdigest(),
+             pattern]
+    for filename in ("resource.yaml", "operator.yaml"):
+        filepath = data_path.joinpath(maintenance_id, filename).resolve()
+        stat = filepath.stat()
+        parts.append(f"{filepath}:{stat.st_mtime_ns}:{stat.st_size}")
+
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def read_snapshot(snapshot_path: Path, key: str) -> Tuple[Dict[str, AWSRegion], Dict[str, Operator]]:
+    """
+    Read the model from a snapshot if it has the key.
+
+    :param snapshot_path: The path to the snapshot.
+    :type snapshot_path: :class:`Path`
+    :param key: The key of the model.
+    :type key: str
+
+    :return: The regions and the operators by ID, or None if the snapshot
+        is missing, stale, truncated or unreadable.
+    :rtype: Tuple[Dict[str, :class:`AWSRegion`], Dict[str, :class:`Operator`]]
+    """
+
+    if not snapshot_path.exists():
+        return None
+
+    try:
+        with snapshot_path.open("rb") as f:
+            # The key comes first, so a stale snapshot is not loaded
+            if pickle.load(f) != key:
+                return None
+            model = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError) as e:
+        logger.warning(f"Snapshot {snapshot_path} is not loaded as it cannot be read: {str(e) or type(e).__name__}")
+        return None
+
+    logger.info(f"Model is loaded from snapshot {snapshot_path}")
+    return model
+
+
+def load_model(data_path: Path,
+               maintenance_id: str,
+               pattern: str = "*",
+               cache_dir: Path = None) -> Tuple[Dict[str, AWSRegion], Dict[str, Operator]]:
+    """
+    Load the operators matching *pattern* and their resources. Only the
+    resources of the operators are loaded, while `resource.yaml` is
+    streamed. The model is snapshotted in *cache_dir* and loaded from the
+    snapshot while the data files are unchanged, to skip parsing the YAML
+    files.
+
+    :param data_path: Base path storing data files.
+    :type data_path: :class:`Path`
+    :param maintenance_id: Maintenance ID.
+    :type maintenance_id: str
+    :param pattern: The glob pattern of the operators. Default is all.
+    :type pattern: str
+    :param cache_dir: The directory of the snapshots. None disables them.
+    :type cache_dir: :class:`Path`
+
+    :return: The regions and the operators by ID.
+    :rtype: Tuple[Dict[str, :class:`AWSRegion`], Dict[str, :class:`Operator`]]
+
+    :raises: ValueError if no operator matches *pattern*.
+    """
+
+    snapshot_path: Path = None
+    if cache_dir is not None:
+        key = get_model_key(data_path=data_path, maintenance_id=maintenance_id, pattern=pattern)
+        name = hashlib.sha256(
+            f"{data_path.joinpath(maintenance_id).resolve()}\n{pattern}".encode()).hexdigest()[:16]
+        snapshot_path = cache_dir.joinpath(f"{maintenance_id}-{name}.pickle")
+        model = read_snapshot(snapshot_path=snapshot_path, key=key)
+        if model is not None:
+            return model
+
+    with data_path.joinpath(maintenance_id, "operator.yaml").open("rb") as f:
+        operators_yaml = {operator_id: operator_yaml
+                          for operator_id, operator_yaml in yaml.load(f, Loader=YAMLLoader).items()
+                          if fnmatch.fnmatchcase(operator_id, pattern)}
+    if not operators_yaml:
+        raise ValueError(f"No operator in operator.yaml matches {pattern}")
+
+    aws_regions = load_regions(data_path=data_path, maintenance_id=maintenance_id, operators_yaml=operators_yaml)
+    operators = load_operators(operators_yaml=operators_yaml, aws_regions=aws_regions)
+
+    if snapshot_path is not None:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((aws_regions, operators), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(snapshot_path)
+        logger.info(f"Model is snapshotted in {snapshot_path}")
+
+    return aws_regions, operators
+
+
+class ResourceIndex(object):
+    """
+    Secondary indexes on the resources of an operator, by kind, by engine
+    type, by patched field and by property flag, so that a step finds the
+    resources it applies to without scanning all of them.
+    """
+
+    KINDS = ("rds_databases", "ecs_services", "eks_deployments", "eks_statefulsets")
+    PROPERTY_FLAGS = ("restart_after_upgrade",)
+
+    def __init__(self, operator: Operator) -> None:
+        """
+        Index the resources of an operator.
+
+        :param operator: The operator.
+        :type operator: :class:`Operator`
+        """
+
+        self._by_kind: Dict[str, List[Any]] = {kind: list(getattr(operator, kind)) for kind in self.KINDS}
+        self._by_engine_type: Dict[str, List[RDSDatabase]] = defaultdict(list)
+        self._by_patched_field: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+        self._by_property_flag: Dict[Tuple[str, str, bool], List[Any]] = defaultdict(list)
+
+        for database in self._by_kind["rds_databases"]:
+            self._by_engine_type[database.engine_type].append(database)
+
+        for kind, resources in self._by_kind.items():
+            for resource in resources:
+                if resource.patch:
+                    self._by_patched_field[(kind, None)].append(resource)
+                    for field, value in vars(resource.patch).items():
+                        if value is not None:
+                            self._by_patched_field[(kind, field.lstrip("_"))].append(resource)
+                if kind != "rds_databases":
+                    for flag in self.PROPERTY_FLAGS:
+                        self._by_property_flag[(kind, flag, bool(resource.property(flag)))].append(resource)
+
+    def kind(self, kind: str) -> List[Any]:
+        """
+        Get the resources of a kind.
+
+        :param kind: The kind, which is the name of the attribute of
+            :class:`Operator` listing the resources, such as `ecs_services`.
+        :type kind: str
+
+        :return: The resources.
+        :rtype: List[Any]
+        """
+
+        return self._by_kind[kind]
+
+    def engine_type(self, engine_type: str) -> List[RDSDatabase]:
+        """
+        Get the databases of an engine type.
+
+        :param engine_type: The engine type, such as `postgresql`.
+        :type engine_type: str
+
+        :return: The databases.
+        :rtype: List[:class:`RDSDatabase`]
+        """
+
+        return self._by_engine_type.get(engine_type, [])
+
+    def patched(self, kind: str, field: str = None) -> List[Any]:
+        """
+        Get the resources of a kind which have a patch.
+
+        :param kind: The kind.
+        :type kind: str
+        :param field: The field the patch must set. None for any patch.
+        :type field: str
+
+        :return: The resources.
+        :rtype: List[Any]
+        """
+
+        return self._by_patched_field.get((kind, field), [])
+
+    def flagged(self, kind: str, flag: str, value: bool = True) -> List[Any]:
+        """
+        Get the resources of a kind whose property flag is set, or unset.
+
+        :param kind: The kind.
+        :type kind: str
+        :param flag: The property flag, such as `restart_after_upgrade`.
+        :type flag: str
+        :param value: Whether the flag is set.
+        :type value: bool
+
+        :return: The resources.
+        :rtype: List[Any]
+        """
+
+        return self._by_property_flag.get((kind, flag, value), [])
+
+
+Step = namedtuple("Step", ["name", "class_", "resources", "zeroinfy", "description", "after"])
+
+# The steps of a maintenance, the resources of the operator each of them
+# reads, and the steps each of them must come after. The steps are numbered
+# in this order, which must respect the dependencies
+STEPS: List[Step] = [
+    Step(name="scale-down-ecs-services",
+         class_=UpdateECSTaskCount,
+         resources="ecs_services",
+         zeroinfy=True,
+         description="generate commands for updating ecs task count to 0",
+         after=()),
+    Step(name="scale-down-k8s-statefulsets",
+         class_=UpdateK8sStatefulSetReplicas,
+         resources="eks_statefulsets",
+         zeroinfy=True,
+         description="generate commands for updating k8s statefulset replicas to 0",
+         after=()),
+    Step(name="scale-down-k8s-deployments",
+         class_=UpdateK8sDeploymentReplicas,
+         resources="eks_deployments",
+         zeroinfy=True,
+         description="generate commands for updating k8s deployment replicas to 0",
+         after=()),
+    Step(name="dump-pgstats-before",
+         class_=DumpPgstats,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for dumping pgstats",
+         after=("scale-down-ecs-services", "scale-down-k8s-statefulsets", "scale-down-k8s-deployments")),
+    Step(name="dump-mysql-table-status-before",
+         class_=DumpMysqlTableStatus,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for dumping mysql table status",
+         after=("scale-down-ecs-services", "scale-down-k8s-statefulsets", "scale-down-k8s-deployments")),
+    Step(name="modify-database-engine-version",
+         class_=ModifyDatabaseEngineVersion,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for modifying database engine version",
+         after=("dump-pgstats-before", "dump-mysql-table-status-before")),
+    Step(name="modify-database-class-type",
+         class_=ModifyDatabaseClassType,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for modifying database class type",
+         after=("modify-database-engine-version",)),
+    Step(name="query-database-status",
+         class_=QueryDatabaseStatus,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for querying database status",
+         after=("modify-database-engine-version", "modify-database-class-type")),
+    Step(name="dump-mysql-table-status-after",
+         class_=DumpMysqlTableStatus,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for dumping mysql table status",
+         after=("query-database-status",)),
+    Step(name="dump-pgstats-after",
+         class_=DumpPgstats,
+         resources="rds_databases",
+         zeroinfy=False,
+         description="generate commands for dumping pgstats",
+         after=("query-database-status",)),
+    Step(name="restart-k8s-deployments",
+         class_=RestartK8sDeployment,
+         resources="eks_deployments",
+         zeroinfy=False,
+         description="generate commands for restarting k8s deployment",
+         after=("query-database-status",)),
+    Step(name="restart-ecs-services",
+         class_=RestartECSService,
+         resources="ecs_services",
+         zeroinfy=False,
+         description="generate commands for restarting ecs service",
+         after=("query-database-status",)),
+    Step(name="restart-eks-deployments",
+         class_=RestartK8sDeployment,
+         resources="eks_deployments",
+         zeroinfy=False,
+         description="generate commands for restarting eks deployment",
+         after=("query-database-status",)),
+    Step(name="resume-k8s-deployments",
+         class_=UpdateK8sDeploymentReplicas,
+         resources="eks_deployments",
+         zeroinfy=False,
+         description="generate commands for updating k8s deployment replicas to resume",
+         after=("query-database-status",)),
+    Step(name="resume-k8s-statefulsets",
+         class_=UpdateK8sStatefulSetReplicas,
+         resources="eks_statefulsets",
+         zeroinfy=False,
+         description="generate commands for updating k8s statefulset replicas to resume",
+         after=("query-database-status",)),
+    Step(name="resume-ecs-services",
+         class_=UpdateECSTaskCount,
+         resources="ecs_services",
+         zeroinfy=False,
+         description="generate commands for updating ecs task count to resume",
+         after=("query-database-status",)),
+    Step(name="query-k8s-deployment-status",
+         class_=QueryK8sDeploymentStatus,
+         resources="eks_deployments",
+         zeroinfy=False,
+         description="generate commands for querying k8s deployment status",
+         after=("restart-k8s-deployments", "restart-eks-deployments", "resume-k8s-deployments")),
+    Step(name="query-ecs-task-status",
+         class_=QueryECSTaskStatus,
+         resources="ecs_services",
+         zeroinfy=False,
+         description="generate commands for querying ecs task status",
+         after=("restart-ecs-services", "resume-ecs-services"))]
+
+
+# The resources each step class applies to, looked up in the index of an
+# operator. A step is eligible if there is any. It must agree with eligible()
+# of the class in axolpy-lib 1.4.10, which requirements.txt pins, and which
+# is called for a class not listed here. tests/test_cloud_maintenance.py
+# checks that both agree
+STEP_RESOURCES: Dict[type, Callable[[ResourceIndex], List[Any]]] = {
+    UpdateECSTaskCount: lambda index: index.kind("ecs_services"),
+    UpdateK8sStatefulSetReplicas: lambda index: index.flagged("eks_statefulsets", "restart_after_upgrade", False),
+    UpdateK8sDeploymentReplicas: lambda index: index.flagged("eks_deployments", "restart_after_upgrade", False),
+    DumpPgstats: lambda index: index.engine_type("postgresql"),
+    DumpMysqlTableStatus: lambda index: index.engine_type("mysql"),
+    # The patch steps of databases are eligible for any patch, and skip the
+    # databases without the field when they write the commands
+    ModifyDatabaseEngineVersion: lambda index: index.patched("rds_databases"),
+    ModifyDatabaseClassType: lambda index: index.patched("rds_databases"),
+    QueryDatabaseStatus: lambda index: index.kind("rds_databases"),
+    RestartK8sDeployment: lambda index: index.flagged("eks_deployments", "restart_after_upgrade"),
+    RestartECSService: lambda index: index.flagged("ecs_services", "restart_after_upgrade"),
+    QueryK8sDeploymentStatus: lambda index: index.kind("eks_deployments"),
+    QueryECSTaskStatus: lambda index: index.kind("ecs_services")}
+
+
+def order_steps(steps: List[Step]) -> List[Step]:
+    """
+    Order the steps so that every step comes after the steps it depends
+    on. Independent steps keep their order of declaration, so the numbering
+    of the steps is deterministic.
+
+    :param steps: The steps.
+    :type steps: List[Step]
+
+    :return: The ordered steps.
+    :rtype: List[Step]
+
+    :raises: ValueError if a dependency is unknown or there is a cycle.
+    """
+
+    index = {step.name: i for i, step in enumerate(steps)}
+    waiting: Dict[str, int] = dict()
+    dependents: Dict[str, List[str]] = {step.name: [] for step in steps}
+    for step in steps:
+        for name in step.after:
+            if name not in index:
+                raise ValueError(f"Step {step.name} depends on unknown step {name}")
+            dependents[name].append(step.name)
+        waiting[step.name] = len(step.after)
+
+    ready = [index[name] for name, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    ordered: List[Step] = list()
+    while ready:
+        step = steps[heapq.heappop(ready)]
+        ordered.append(step)
+        for name in dependents[step.name]:
+            waiting[name] -= 1
+            if waiting[name] == 0:
+                heapq.heappush(ready, index[name])
+
+    if len(ordered) < len(steps):
+        raise ValueError("Steps depend on each other in a cycle: "
+                         f"{', '.join(name for name, count in waiting.items() if count > 0)}")
+
+    return ordered
+
+
+def create_step(step: Step, step_no: int, operator: Operator, dist_path: Path) -> CloudMaintenanceStep:
+    step_args = {"step_no": step_no,
+                 "operator": operator,
+                 "dist_path": dist_path}
+    if step.zeroinfy:
+        step_args["zeroinfy"] = True
+
+    return step.class_(**step_args)
+
+
+class RunProfile(object):
+    """
+    The timings of the phases of a run and of the steps of each operator,
+    with the number of resources and the bytes written, to find where the
+    time goes.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty profile.
+        """
+
+        self._phases: Dict[str, Dict[str, float]] = dict()
+        self._steps: Dict[Tuple[str, str], dict] = dict()
+        self._resources: Dict[str, Dict[str, int]] = dict()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a phase. The timings of a phase entered many times add up.
+
+        :param name: The name of the phase.
+        :type name: str
+        """
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            phase = self._phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            phase["wall"] += time.perf_counter() - wall
+            phase["cpu"] += time.process_time() - cpu
+            phase["calls"] += 1
+
+    def record_resources(self, operator_id: str, index: ResourceIndex) -> None:
+        """
+        Record the number of resources of each kind of an operator.
+
+        :param operator_id: The ID of the operator.
+        :type operator_id: str
+        :param index: The index of the resources of the operator.
+        :type index: :class:`ResourceIndex`
+        """
+
+        self._resources[operator_id] = {kind: len(index.kind(kind)) for kind in ResourceIndex.KINDS}
+
+    def record_step(self, operator_id: str, step_name: str, **fields: Any) -> None:
+        """
+        Record the fields of a step of an operator, such as its timings.
+
+        :param operator_id: The ID of the operator.
+        :type operator_id: str
+        :param step_name: The name of the step.
+        :type step_name: str
+        """
+
+        self._steps.setdefault((operator_id, step_name),
+                               {"operator": operator_id, "step": step_name}).update(fields)
+
+    def step_totals(self) -> Dict[str, dict]:
+        """
+        Sum up the records of each step over the operators.
+
+        :return: The totals by the name of the step.
+        :rtype: Dict[str, dict]
+        """
+
+        totals: Dict[str, dict] = dict()
+        for record in self._steps.values():
+            total = totals.setdefault(record["step"], {"eligible": 0, "written": 0, "resources": 0,
+                                                       "eligible_wall": 0.0, "wall": 0.0, "cpu": 0.0,
+                                                       "bytes": 0})
+            total["eligible"] += 1 if record.get("eligible") else 0
+            total["written"] += 1 if record.get("written") else 0
+            total["resources"] += record.get("resources") or 0
+            for field in ("eligible_wall", "wall", "cpu", "bytes"):
+                total[field] += record.get(field, 0)
+
+        return totals
+
+    def report(self, **meta: Any) -> dict:
+        """
+        Get the report of the profile.
+
+        :return: The report, with *meta* on top.
+        :rtype: dict
+        """
+
+        return {**meta,
+                "phases": self._phases,
+                "resources": self._resources,
+                "step_totals": self.step_totals(),
+                "steps": list(self._steps.values())}
+
+    def print_step_totals(self) -> None:
+        """
+        Print the totals of the steps, the slowest first.
+        """
+
+        logger.info(f"{'Step':<40} {'Eligible':>8} {'Written':>7} {'Resources':>9} "
+                    f"{'Wall (ms)':>9} {'CPU (ms)':>8} {'Bytes':>10}")
+        for name, total in sorted(self.step_totals().items(),
+                                  key=lambda item: item[1]["wall"] + item[1]["eligible_wall"],
+                                  reverse=True):
+            logger.info(f"{name:<40} {total['eligible']:>8} {total['written']:>7} {total['resources']:>9} "
+                        f"{(total['wall'] + total['eligible_wall']) * 1000:>9.1f} {total['cpu'] * 1000:>8.1f} "
+                        f"{total['bytes']:>10}")
+
+
+def number_steps(steps: List[Step],
+                 operator: Operator,
+                 index: ResourceIndex,
+                 profile: RunProfile = None) -> List[Tuple[Step, int]]:
+    """
+    Number the steps of an operator. A step takes the next number only if
+    it is eligible for the resources of the operator.
+
+    :param steps: The ordered steps.
+    :type steps: List[Step]
+    :param operator: The operator.
+    :type operator: :class:`Operator`
+    :param index: The index of the resources of the operator.
+    :type index: :class:`ResourceIndex`
+    :param profile: The profile to record the checks of eligibility in.
+    :type profile: :class:`RunProfile`
+
+    :return: The eligible steps with their numbers.
+    :rtype: List[Tuple[Step, int]]
+    """
+
+    numbered = list()
+    step_no = 1
+    for step in steps:
+        logger.info(f"{operator.id} step {step_no}: {step.description}")
+        start_time = time.perf_counter()
+        if step.class_ in STEP_RESOURCES:
+            resources = len(STEP_RESOURCES[step.class_](index))
+            eligible = resources > 0
+        else:
+            resources = None
+            eligible = create_step(step=step, step_no=step_no, operator=operator, dist_path=None).eligible()
+        if profile is not None:
+            profile.record_step(operator.id, step.name,
+                                eligible=eligible,
+                                eligible_wall=time.perf_counter() - start_time,
+                                resources=resources)
+        if eligible:
+            numbered.append((step, step_no))
+            step_no += 1
+
+    return numbered
+
+
+MANIFEST_FILENAME = ".manifest.json"
+
+
+def describe_resource(value: Any) -> Any:
+    """
+    Describe a resource, with its patch and properties, in plain values
+    which can be serialized to JSON. The region, cluster and namespace of
+    the resource are described by their names only.
+
+    :param value: The resource, or one of its attributes.
+    :type value: Any
+
+    :return: The description.
+    :rtype: Any
+    """
+
+    if isinstance(value, AWSRegion):
+        return value.name
+    if isinstance(value, ECSCluster):
+        return [value.region.name, value.name]
+    if isinstance(value, Cluster):
+        return [value.platform_ref.region.name, value.name]
+    if isinstance(value, Namespace):
+        return describe_resource(value.cluster) + [value.name]
+    if isinstance(value, dict):
+        return {str(key): describe_resource(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [describe_resource(item) for item in value]
+    if hasattr(value, "__dict__"):
+        return {"class": type(value).__name__, **describe_resource(vars(value))}
+
+    return value
+
+
+def get_step_input_hash(step: Step, step_no: int, operator: Operator, resources: Any) -> str:
+    """
+    Get the hash of the inputs of the file of a step: the step, its
+    number, the version of axolpy-lib which renders it, and the resources
+    of the operator which it reads.
+
+    :param step: The step.
+    :type step: Step
+    :param step_no: The number of the step.
+    :type step_no: int
+    :param operator: The operator.
+    :type operator: :class:`Operator`
+    :param resources: The description of the resources the step reads, by
+        :func:`describe_resource`.
+    :type resources: Any
+
+    :return: The hash.
+    :rtype: str
+    """
+
+    inputs = {"axolpy-lib": get_axolpy_lib_version(),
+              "operator": operator.id,
+              "step": step.name,
+              "class": step.class_.__qualname__,
+              "zeroinfy": step.zeroinfy,
+              "step_no": step_no,
+              "resources": resources}
+
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_file_hash(filepath: Path) -> str:
+    """
+    Get the hash of the content of a file.
+
+    :param filepath: The file.
+    :type filepath: :class:`Path`
+
+    :return: The hash, or None if the file does not exist.
+    :rtype: str
+    """
+
+    try:
+        return hashlib.sha256(filepath.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(dist_path: Path) -> Dict[str, dict]:
+    """
+    Read the manifest of the files generated in a distribution directory.
+
+    :param dist_path: The path to the distribution directory.
+    :type dist_path: :class:`Path`
+
+    :return: The hashes of the input and the output of each file, by the
+        name of the file. Empty if there is no manifest.
+    :rtype: Dict[str, dict]
+    """
+
+    try:
+        return json.loads(dist_path.joinpath(MANIFEST_FILENAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return dict()
+
+
+def write_manifest(dist_path: Path, manifest: Dict[str, dict]) -> None:
+    """
+    Write the manifest of the files generated in a distribution directory.
+
+    :param dist_path: The path to the distribution directory.
+    :type dist_path: :class:`Path`
+    :param manifest: The hashes of the input and the output of each file,
+        by the name of the file.
+    :type manifest: Dict[str, dict]
+    """
+
+    manifest_path = dist_path.joinpath(MANIFEST_FILENAME)
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    tmp_path.replace(manifest_path)
+
+
+class BundleWriter(object):
+    """
+    Write the bundle of an operator into a new version directory under
+    `.bundles/<operator>`, next to its distribution directory, and swap it
+    into place atomically. The distribution directory is a symbolic link to
+    the current version, which is replaced by a link to the new version
+    with a single rename, so readers see either the whole previous bundle
+    or the whole new one, and a crash never leaves a bundle half written
+    or missing. The unchanged files are hard linked from the current
+    bundle, so they keep their modification time, and a new file is
+    written with a single write.
+    """
+
+    def __init__(self, dist_path: Path) -> None:
+        """
+        Initialize a writer of the bundle in a distribution directory.
+
+        :param dist_path: The path to the distribution directory.
+        :type dist_path: :class:`Path`
+        """
+
+        self._dist_path = dist_path
+        self._versions_path = dist_path.parent.joinpath(".bundles", dist_path.name)
+        self._version_path = self._versions_path.joinpath(f"{time.time_ns():x}")
+        self._contents: Dict[str, bytes] = dict()
+        self._kept: List[str] = list()
+
+    @property
+    def dist_path(self) -> Path:
+        return self._dist_path
+
+    def recover(self) -> None:
+        """
+        Remove the versions which the distribution directory doesn't link
+        to, which are the previous bundles and the bundle of an interrupted
+        run, and put back a bundle left aside by an interrupted swap of a
+        bundle written by an earlier version of this script.
+        """
+
+        for old_path in (self._dist_path.with_name(f".{self._dist_path.name}.old"),
+                         self._versions_path.joinpath("previous")):
+            if not self._dist_path.exists() and old_path.exists():
+                old_path.rename(self._dist_path)
+                logger.warning(f"{self._dist_path} is restored from an interrupted run")
+        shutil.rmtree(self._dist_path.with_name(f".{self._dist_path.name}.staging"), ignore_errors=True)
+
+        current = self._dist_path.resolve() if self._dist_path.is_symlink() else None
+        if self._versions_path.exists():
+            for path in self._versions_path.iterdir():
+                if path.resolve() != current:
+                    if path.is_dir() and not path.is_symlink():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink()
+
+    def add(self, filename: str, content: bytes) -> None:
+        """
+        Add a new file to the bundle.
+
+        :param filename: The name of the file.
+        :type filename: str
+        :param content: The content of the file.
+        :type content: bytes
+        """
+
+        self._contents[filename] = content
+
+    def keep(self, filename: str) -> None:
+        """
+        Keep an unchanged file of the current bundle in the bundle.
+
+        :param filename: The name of the file.
+        :type filename: str
+        """
+
+        self._kept.append(filename)
+
+    def commit(self, manifest: Dict[str, dict]) -> None:
+        """
+        Write the bundle with its manifest, and swap it into place.
+
+        :param manifest: The manifest of the files of the bundle.
+        :type manifest: Dict[str, dict]
+        """
+
+        self._version_path.mkdir(mode=0o755, parents=True)
+        for filename in self._kept:
+            try:
+                os.link(self._dist_path.joinpath(filename), self._version_path.joinpath(filename))
+            except OSError:
+                shutil.copy2(self._dist_path.joinpath(filename), self._version_path.joinpath(filename))
+        for filename, content in self._contents.items():
+            with self._version_path.joinpath(filename).open("xb") as f:
+                f.write(content)
+                os.fchmod(f.fileno(), 0o755)
+        write_manifest(dist_path=self._version_path, manifest=manifest)
+
+        previous = self._dist_path.resolve() if self._dist_path.is_symlink() else None
+        if self._dist_path.exists() and not self._dist_path.is_symlink():
+            # A bundle written by an earlier version of this script is a
+            # directory, which a link can't replace, so it is moved into
+            # the versions once
+            previous = self._versions_path.joinpath("previous")
+            self._dist_path.rename(previous)
+
+        # The link is created next to the versions and renamed over the
+        # distribution directory, which replaces it atomically
+        link_path = self._versions_path.joinpath(".link")
+        if link_path.is_symlink():
+            link_path.unlink()
+        link_path.symlink_to(self._version_path.relative_to(self._dist_path.parent))
+        os.replace(link_path, self._dist_path)
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def write_archive(self) -> Path:
+        """
+        Write the bundle into a compressed archive next to its directory.
+
+        :return: The path to the archive.
+        :rtype: :class:`Path`
+        """
+
+        archive_path = self._dist_path.with_name(f"{self._dist_path.name}.tar.gz")
+        tmp_path = archive_path.with_name(f".{archive_path.name}.tmp")
+        with tarfile.open(tmp_path, "w:gz") as archive:
+            for filepath in sorted(self._dist_path.iterdir()):
+                if filepath.name != MANIFEST_FILENAME:
+                    archive.add(filepath, arcname=f"{self._dist_path.name}/{filepath.name}")
+        tmp_path.replace(archive_path)
+
+        return archive_path
+
+
+_operators: Dict[str, Operator] = dict()
+
+
+def _init_worker(operators: Dict[str, Operator]) -> None:
+    # Every worker process receives the operators once, and the tasks refer
+    # to them by ID
+    global _operators
+    _operators = operators
+
+
+def render_step(step: Step, step_no: int, operator_id: str) -> Tuple[bytes, float, float]:
+    """
+    Render the file of a step in memory.
+
+    :param step: The step.
+    :type step: Step
+    :param step_no: The number of the step.
+    :type step_no: int
+    :param operator_id: The ID of the operator, who is given to the worker
+        process by :func:`_init_worker`.
+    :type operator_id: str
+
+    :return: The content of the file, and the wall time and the CPU time
+        taken in seconds.
+    :rtype: Tuple[bytes, float, float]
+    """
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    step_impl = create_step(step=step, step_no=step_no, operator=_operators[operator_id], dist_path=None)
+    # The content is rendered as write_file() of the step does, into a buffer
+    # instead of the file. _write_file_content is private to axolpy-lib,
+    # which requirements.txt pins to 1.4.10, so recheck it when the pin
+    # moves; tests/test_cloud_maintenance.py compares it with write_file()
+    buffer = io.StringIO()
+    step_impl._write_file_content(file=buffer)
+    content = buffer.getvalue().encode()
+
+    return content, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def check_steps(numbered: List[Tuple[Step, int]],
+                operator: Operator,
+                index: ResourceIndex,
+                writer: BundleWriter,
+                previous: Dict[str, dict],
+                manifest: Dict[str, dict],
+                profile: RunProfile) -> Tuple[List[str], List[Tuple[Step, int, str, str]]]:
+    """
+    Check which files of the numbered steps of an operator are outdated.
+    A file is unchanged if the hash of its inputs and the hash of the file
+    are those in the previous manifest, and it is then kept in the bundle
+    with its entry of the manifest.
+
+    :param numbered: The steps of the operator with their numbers.
+    :type numbered: List[Tuple[Step, int]]
+    :param operator: The operator.
+    :type operator: :class:`Operator`
+    :param index: The index of the resources of the operator.
+    :type index: :class:`ResourceIndex`
+    :param writer: The writer of the bundle of the operator.
+    :type writer: :class:`BundleWriter`
+    :param previous: The manifest of the previous run.
+    :type previous: Dict[str, dict]
+    :param manifest: The manifest of this run, to add the unchanged files to.
+    :type manifest: Dict[str, dict]
+    :param profile: The profile to record the steps in.
+    :type profile: :class:`RunProfile`
+
+    :return: The names of the files of the steps, and the outdated steps
+        with their number, file name and input hash.
+    :rtype: Tuple[List[str], List[Tuple[Step, int, str, str]]]
+    """
+
+    filenames = list()
+    outdated = list()
+    descriptions: Dict[str, Any] = dict()
+    for step, step_no in numbered:
+        filename = create_step(step=step, step_no=step_no, operator=operator, dist_path=None).filename()
+        filenames.append(filename)
+        profile.record_step(operator.id, step.name, step_no=step_no, filename=filename, written=False)
+        if step.resources not in descriptions:
+            descriptions[step.resources] = describe_resource(index.kind(step.resources))
+        input_hash = get_step_input_hash(step=step,
+                                         step_no=step_no,
+                                         operator=operator,
+                                         resources=descriptions[step.resources])
+        entry = previous.get(filename)
+        if entry and entry["input"] == input_hash \
+                and entry["output"] == get_file_hash(writer.dist_path.joinpath(filename)):
+            manifest[filename] = entry
+            writer.keep(filename)
+        else:
+            outdated.append((step, step_no, filename, input_hash))
+
+    return filenames, outdated
+
+
+def render_steps(tasks: List[Tuple[Step, int, str]],
+                 operators: Dict[str, Operator],
+                 jobs: int) -> List[Tuple[bytes, float, float]]:
+    """
+    Render the files of steps, by a pool of processes unless *jobs* is 1
+    or there is at most one file.
+
+    :param tasks: The steps with their number and the ID of their operator.
+    :type tasks: List[Tuple[Step, int, str]]
+    :param operators: The operators by ID.
+    :type operators: Dict[str, :class:`Operator`]
+    :param jobs: Number of processes.
+    :type jobs: int
+
+    :return: The content of each file with the wall and CPU time taken.
+    :rtype: List[Tuple[bytes, float, float]]
+    """
+
+    if jobs <= 1 or len(tasks) <= 1:
+        _init_worker(operators)
+        return [render_step(*task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=_init_worker,
+                             initargs=(operators,)) as executor:
+        return list(executor.map(render_step, *zip(*tasks)))
+
+
+def generate_bundle(operators: Dict[str, Operator],
+                    dist_paths: Dict[str, Path],
+                    jobs: int,
+                    force: bool = False,
+                    archive: bool = False,
+                    profile: RunProfile = None) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    Generate the steps of the operators. The steps are numbered in the
+    order of their dependencies first, and then their files, which only
+    read the resources, are rendered concurrently by a pool of processes.
+    The bundle of each operator is then written and swapped into place by
+    a :class:`BundleWriter`.
+
+    A file is rendered only if the hash of its inputs differs from the one
+    in the manifest of the distribution directory, or the file differs from
+    what was written. Unchanged files are left untouched, and the files of
+    the previous run which are no longer generated are removed. A bundle
+    without any change is not written at all.
+
+    :param operators: The operators by ID.
+    :type operators: Dict[str, :class:`Operator`]
+    :param dist_paths: The distribution directory of each operator.
+    :type dist_paths: Dict[str, :class:`Path`]
+    :param jobs: Number of processes. 1 renders the files in this process.
+    :type jobs: int
+    :param force: Write all the files regardless of the manifests.
+    :type force: bool
+    :param archive: Also write the bundle of each operator into an archive.
+    :type archive: bool
+    :param profile: The profile to record the phases and the steps in.
+    :type profile: :class:`RunProfile`
+
+    :return: The names of the files of each operator, and the names of the
+        files written for each operator.
+    :rtype: Tuple[Dict[str, List[str]], Dict[str, List[str]]]
+    """
+
+    if profile is None:
+        profile = RunProfile()
+
+    steps = order_steps(STEPS)
+    files: Dict[str, List[str]] = {operator_id: [] for operator_id in operators}
+    written: Dict[str, List[str]] = {operator_id: [] for operator_id in operators}
+    writers: Dict[str, BundleWriter] = dict()
+    manifests: Dict[str, Dict[str, dict]] = dict()
+    changed: Dict[str, bool] = dict()
+    tasks = list()
+    input_hashes = list()
+    for operator_id, operator in operators.items():
+        writer = BundleWriter(dist_path=dist_paths[operator_id])
+        writers[operator_id] = writer
+        with profile.phase("index"):
+            writer.recover()
+            previous = dict() if force else read_manifest(writer.dist_path)
+            manifests[operator_id] = dict()
+            index = ResourceIndex(operator)
+            profile.record_resources(operator_id=operator_id, index=index)
+        with profile.phase("number"):
+            numbered = number_steps(steps=steps, operator=operator, index=index, profile=profile)
+        with profile.phase("check"):
+            files[operator_id], outdated = check_steps(numbered=numbered,
+                                                       operator=operator,
+                                                       index=index,
+                                                       writer=writer,
+                                                       previous=previous,
+                                                       manifest=manifests[operator_id],
+                                                       profile=profile)
+            for step, step_no, filename, input_hash in outdated:
+                tasks.append((step, step_no, operator_id, filename))
+                input_hashes.append(input_hash)
+
+            removed = sorted(previous.keys() - set(files[operator_id]))
+            for filename in removed:
+                logger.info(f"{operator_id} file {filename} is removed")
+            changed[operator_id] = len(removed) > 0 or not writer.dist_path.joinpath(MANIFEST_FILENAME).exists()
+
+    with profile.phase("render"):
+        results = render_steps(tasks=[task[:3] for task in tasks], operators=operators, jobs=jobs)
+
+    with profile.phase("write"):
+        for (step, step_no, operator_id, filename), input_hash, (content, wall, cpu) \
+                in zip(tasks, input_hashes, results):
+            writers[operator_id].add(filename=filename, content=content)
+            written[operator_id].append(filename)
+            changed[operator_id] = True
+            manifests[operator_id][filename] = {"input": input_hash,
+                                                "output": hashlib.sha256(content).hexdigest()}
+            profile.record_step(operator_id, step.name, written=True, wall=wall, cpu=cpu, bytes=len(content))
+
+        for operator_id, writer in writers.items():
+            if changed[operator_id]:
+                writer.commit(manifest=manifests[operator_id])
+            archive_path = writer.dist_path.with_name(f"{writer.dist_path.name}.tar.gz")
+            if archive and (changed[operator_id] or not archive_path.exists()):
+                logger.info(f"{operator_id} bundle is archived in {writer.write_archive()}")
+
+    return files, written
+
+
+def print_summary(operators: Dict[str, Operator],
+                  dist_paths: Dict[str, Path],
+                  files: Dict[str, List[str]],
+                  written: Dict[str, List[str]]) -> None:
+    """
+    Print the resources of each operator and the number of files generated
+    and written for them.
+
+    :param operators: The operators by ID.
+    :type operators: Dict[str, :class:`Operator`]
+    :param dist_paths: The distribution directory of each operator.
+    :type dist_paths: Dict[str, :class:`Path`]
+    :param files: The names of the files of each operator.
+    :type files: Dict[str, List[str]]
+    :param written: The names of the files written for each operator.
+    :type written: Dict[str, List[str]]
+    """
+
+    logger.info(f"{'Operator':<24} {'Databases':>9} {'ECS services':>12} {'Deployments':>11} "
+                f"{'StatefulSets':>12} {'Files':>5} {'Written':>7}  Path")
+    for operator_id, operator in operators.items():
+        logger.info(f"{operator_id:<24} {len(operator.rds_databases):>9} {len(operator.ecs_services):>12} "
+                    f"{len(operator.eks_deployments):>11} {len(operator.eks_statefulsets):>12} "
+                    f"{len(files[operator_id]):>5} {len(written[operator_id]):>7}  {dist_paths[operator_id]}")
+
+
+ResourceStatus = namedtuple("ResourceStatus", ["kind", "location", "name", "status", "detail"])
+
+
+class StatusBackend(ABC):
+    """
+    A backend querying the live status of the resources in a maintenance.
+    Each query returns the status and the detail of each resource by name,
+    and a resource missing from the result is reported as missing.
+    """
+
+    # The number of ECS services described by one query
+    ecs_batch_size: int = 10
+
+    @abstractmethod
+    async def query_database(self, region: str, database: RDSDatabase) -> Dict[str, Tuple[str, str]]:
+        pass
+
+    @abstractmethod
+    async def query_ecs_services(self,
+                                 region: str,
+                                 cluster: str,
+                                 services: List[ECSService]) -> Dict[str, Tuple[str, str]]:
+        pass
+
+    @abstractmethod
+    async def query_k8s_deployments(self,
+                                    cluster: str,
+                                    namespace: str,
+                                    deployments: List[Deployment]) -> Dict[str, Tuple[str, str]]:
+        pass
+
+
+class CLIStatusBackend(StatusBackend):
+    """
+    Query the status with the aws and kubectl commands which the query
+    steps write into their scripts, with JSON output. kubectl queries each
+    cluster with its own context, so that the deployments of many clusters
+    are not all queried in the current context.
+    """
+
+    def __init__(self, contexts: Dict[str, str] = None) -> None:
+        """
+        Initialize a backend.
+
+        :param contexts: The kubectl context of each cluster by name. A
+            cluster which is not in it is queried with the context named
+            after the cluster, like `aws eks update-kubeconfig --alias`
+            names it.
+        :type contexts: Dict[str, str]
+        """
+
+        self._contexts = contexts or dict()
+
+    async def _run(self, *args: str) -> Any:
+        process = await asyncio.create_subprocess_exec(*args,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE,
+                                                       start_new_session=True)
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # The query has timed out. The children of the command are
+            # killed too, as they would keep its output open
+            os.killpg(process.pid, signal.SIGKILL)
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode().strip() or f"{args[0]} exited with {process.returncode}")
+
+        return json.loads(stdout) if stdout.strip() else None
+
+    async def query_database(self, region: str, database: RDSDatabase) -> Dict[str, Tuple[str, str]]:
+        instances = await self._run(
+            "aws", "rds", "describe-db-instances",
+            "--region", region,
+            "--db-instance-identifier", database.id,
+            "--output", "json",
+            "--query", "DBInstances[*].{Status:DBInstanceStatus,Class:DBInstanceClass,EngineVersion:EngineVersion}")
+
+        return {database.id: (instance["Status"], f"{instance['Class']} {instance['EngineVersion']}")
+                for instance in instances}
+
+    async def query_ecs_services(self,
+                                 region: str,
+                                 cluster: str,
+                                 services: List[ECSService]) -> Dict[str, Tuple[str, str]]:
+        descriptions = await self._run(
+            "aws", "ecs", "describe-services",
+            "--region", region,
+            "--cluster", cluster,
+            "--services", *[service.name for service in services],
+            "--output", "json",
+            "--query", "services[*].{Name:serviceName,Status:status,Desired:desiredCount,"
+            "Running:runningCount,Pending:pendingCount}")
+
+        return {description["Name"]: (description["Status"],
+                                      f"{description['Running']}/{description['Desired']} running, "
+                                      f"{description['Pending']} pending")
+                for description in descriptions}
+
+    async def query_k8s_deployments(self,
+                                    cluster: str,
+                                    namespace: str,
+                                    deployments: List[Deployment]) -> Dict[str, Tuple[str, str]]:
+        # A deployment which is not found is left out of the result rather
+        # than failing the others, and is reported as missing
+        result = await self._run("kubectl", "get", "deployments",
+                                 "--context", self._contexts.get(cluster, cluster),
+                                 "-n", namespace,
+                                 *[deployment.name for deployment in deployments],
+                                 "--ignore-not-found",
+                                 "-o", "json")
+        # A single deployment is returned as is, rather than in a list, and
+        # nothing is returned if it is not found
+        if result is None:
+            items = []
+        else:
+            items = result["items"] if "items" in result else [result]
+
+        statuses = dict()
+        for item in items:
+            replicas = item["spec"].get("replicas", 0)
+            ready = item["status"].get("readyReplicas", 0)
+            statuses[item["metadata"]["name"]] = ("READY" if ready == replicas else "PROGRESSING",
+                                                  f"{ready}/{replicas} ready")
+
+        return statuses
+
+
+class FakeStatusBackend(StatusBackend):
+    """
+    Report the status which the resources have once the maintenance is
+    done, after a random latency, so that the collection of the status can
+    be run without AWS and Kubernetes.
+    """
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0) -> None:
+        """
+        Initialize a fake backend.
+
+        :param latency: Average latency of a query in seconds.
+        :type latency: float
+        :param error_rate: Ratio of the queries which fail.
+        :type error_rate: float
+        """
+
+        self._latency = latency
+        self._error_rate = error_rate
+
+    async def _reply(self) -> None:
+        await asyncio.sleep(random.uniform(0, 2 * self._latency))
+        if random.random() < self._error_rate:
+            raise RuntimeError("Injected error")
+
+    async def query_database(self, region: str, database: RDSDatabase) -> Dict[str, Tuple[str, str]]:
+        await self._reply()
+        class_type = database.patch.class_type if database.patch and database.patch.class_type \
+            else database.class_type
+        engine_version = database.patch.engine_version if database.patch and database.patch.engine_version \
+            else database.engine_version
+
+        return {database.id: ("available", " ".join(str(value) for value in (class_type, engine_version) if value))}
+
+    async def query_ecs_services(self,
+                                 region: str,
+                                 cluster: str,
+                                 services: List[ECSService]) -> Dict[str, Tuple[str, str]]:
+        await self._reply()
+        statuses = dict()
+        for service in services:
+            count = service.patch.desired_count if service.patch and service.patch.desired_count \
+                else service.desired_count
+            statuses[service.name] = ("ACTIVE", f"{count}/{count} running, 0 pending")
+
+        return statuses
+
+    async def query_k8s_deployments(self,
+                                    cluster: str,
+                                    namespace: str,
+                                    deployments: List[Deployment]) -> Dict[str, Tuple[str, str]]:
+        await self._reply()
+        statuses = dict()
+        for deployment in deployments:
+            replicas = deployment.patch.replicas if deployment.patch and deployment.patch.replicas \
+                else deployment.replicas
+            statuses[deployment.name] = ("READY", f"{replicas}/{replicas} ready")
+
+        return statuses
+
+
+def parse_kube_context(value: str) -> Tuple[str, str]:
+    """
+    Parse a `<cluster>=<context>` option.
+
+    :param value: The option.
+    :type value: str
+
+    :return: The cluster and its kubectl context.
+    :rtype: Tuple[str, str]
+    """
+
+    cluster, separator, context = value.partition("=")
+    if not separator or not cluster or not context:
+        raise argparse.ArgumentTypeError(f"{value} is not in the form CLUSTER=CONTEXT")
+
+    return cluster, context
+
+
+STATUS_BACKENDS: Dict[str, type] = {"cli": CLIStatusBackend,
+                                    "fake": FakeStatusBackend}
+
+
+async def query_status(semaphore: asyncio.Semaphore,
+                       timeout: float,
+                       kind: str,
+                       location: str,
+                       names: List[str],
+                       query: Callable[[], Awaitable[Dict[str, Tuple[str, str]]]]) -> List[ResourceStatus]:
+    """
+    Run a status query of some resources, once the semaphore of their
+    region or cluster allows.
+
+    :param semaphore: The semaphore of the region or the cluster.
+    :type semaphore: :class:`asyncio.Semaphore`
+    :param timeout: Timeout of the query in seconds.
+    :type timeout: float
+    :param kind: The kind of the resources.
+    :type kind: str
+    :param location: The location of the resources.
+    :type location: str
+    :param names: The names of the resources.
+    :type names: List[str]
+    :param query: The function creating the query.
+    :type query: Callable[[], Awaitable[Dict[str, Tuple[str, str]]]]
+
+    :return: The status of each resource.
+    :rtype: List[ResourceStatus]
+    """
+
+    async with semaphore:
+        try:
+            statuses = await asyncio.wait_for(query(), timeout=timeout)
+        except asyncio.TimeoutError:
+            statuses = {name: ("TIMEOUT", f"no reply in {timeout}s") for name in names}
+        except Exception as e:
+            statuses = {name: ("ERROR", str(e).splitlines()[0] if str(e) else type(e).__name__) for name in names}
+
+    return [ResourceStatus(kind=kind,
+                           location=location,
+                           name=name,
+                           status=statuses[name][0] if name in statuses else "MISSING",
+                           detail=statuses[name][1] if name in statuses else "")
+            for name in names]
+
+
+async def collect_status(operators: Dict[str, Operator],
+                         backend: StatusBackend,
+                         concurrency: int,
+                         timeout: float) -> List[ResourceStatus]:
+    """
+    Collect the status of the resources which the query steps of the
+    operators query, concurrently. At most *concurrency* queries run at a
+    time against RDS and ECS of a region, and against a Kubernetes cluster.
+
+    :param operators: The operators by ID.
+    :type operators: Dict[str, :class:`Operator`]
+    :param backend: The backend to query.
+    :type backend: :class:`StatusBackend`
+    :param concurrency: Maximum number of queries at a time against a
+        service of a region or a cluster.
+    :type concurrency: int
+    :param timeout: Timeout of a query in seconds.
+    :type timeout: float
+
+    :return: The status of each resource.
+    :rtype: List[ResourceStatus]
+    """
+
+    # The resources are shared by the operators, so each of them is queried
+    # once
+    resources: Dict[str, Dict[int, Any]] = {kind: dict() for kind in ResourceIndex.KINDS}
+    for operator in operators.values():
+        index = ResourceIndex(operator)
+        for kind in ("rds_databases", "ecs_services", "eks_deployments"):
+            for resource in index.kind(kind):
+                resources[kind][id(resource)] = resource
+
+    semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(concurrency))
+    queries = list()
+    for database in resources["rds_databases"].values():
+        region = database.region.name
+        queries.append(query_status(
+            semaphore=semaphores[f"rds/{region}"], timeout=timeout,
+            kind="database", location=region, names=[database.id],
+            query=functools.partial(backend.query_database, region=region, database=database)))
+
+    ecs_clusters: Dict[Tuple[str, str], List[ECSService]] = defaultdict(list)
+    for service in resources["ecs_services"].values():
+        ecs_clusters[(service.cluster.region.name, service.cluster.name)].append(service)
+    for (region, cluster), services in ecs_clusters.items():
+        for i in range(0, len(services), backend.ecs_batch_size):
+            batch = services[i:i + backend.ecs_batch_size]
+            queries.append(query_status(
+                semaphore=semaphores[f"ecs/{region}"], timeout=timeout,
+                kind="ecs service", location=f"{region}/{cluster}", names=[service.name for service in batch],
+                query=functools.partial(backend.query_ecs_services, region=region, cluster=cluster, services=batch)))
+
+    namespaces: Dict[Tuple[str, str], List[Deployment]] = defaultdict(list)
+    for deployment in resources["eks_deployments"].values():
+        namespaces[(deployment.namespace.cluster.name, deployment.namespace.name)].append(deployment)
+    for (cluster, namespace), deployments in namespaces.items():
+        queries.append(query_status(
+            semaphore=semaphores[f"eks/{cluster}"], timeout=timeout,
+            kind="k8s deployment", location=f"{cluster}/{namespace}",
+            names=[deployment.name for deployment in deployments],
+            query=functools.partial(backend.query_k8s_deployments,
+                                    cluster=cluster, namespace=namespace, deployments=deployments)))
+
+    results = await asyncio.gather(*queries)
+
+    return [status for statuses in results for status in statuses]
+
+
+def print_status(statuses: List[ResourceStatus]) -> None:
+    """
+    Print the status of the resources in a table.
+
+    :param statuses: The status of each resource.
+    :type statuses: List[ResourceStatus]
+    """
+
+    logger.info(f"{'Kind':<14} {'Location':<32} {'Name':<32} {'Status':<12} Detail")
+    for status in sorted(statuses, key=lambda status: (status.kind, status.location, status.name)):
+        logger.info(f"{status.kind:<14} {status.location:<32} {status.name:<32} {status.status:<12} {status.detail}")
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--data-path",
@@ -56,97 +1772,151 @@ def main():
     parser.add_argument("-i", "--maintenance-id",
                         required=True,
                         help="Maintenance ID.")
-    parser.add_argument("-o", "--operator",
-                        required=True,
-                        help="Name of operator.")
+    operator_group = parser.add_mutually_exclusive_group(required=True)
+    operator_group.add_argument("-o", "--operator",
+                                help="Name of operator, or a glob pattern of the names, such as 'team-a-*'.")
+    operator_group.add_argument("-a", "--all-operators",
+                                action="store_true",
+                                help="Generate the steps of all the operators in operator.yaml.")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=os.cpu_count(),
+                        help="Number of processes to write the files of the steps with. "
+                        "Default is the number of CPU cores.")
+    parser.add_argument("--cache-dir",
+                        default=".cache/cloud-maintenance",
+                        help="The directory to snapshot the loaded resources and operators in. "
+                        "A snapshot is used while the data files are unchanged.")
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Parse the data files without using or writing a snapshot.")
+    parser.add_argument("-f", "--force",
+                        action="store_true",
+                        help="Write the files of all the steps, even those whose inputs are unchanged.")
+    parser.add_argument("--archive",
+                        action="store_true",
+                        help="Also write the bundle of each operator into dist/<operator>.tar.gz.")
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Write the wall and CPU time of each phase and each step, with the number of resources "
+                        "and the bytes written, to dist/<operator>.profile.json, or dist/profile.json with "
+                        "--all-operators. <operator> is the name or the pattern given by --operator.")
+    parser.add_argument("--cprofile",
+                        action="store_true",
+                        help="Profile this process with cProfile into dist/<operator>.profile.pstats, or "
+                        "dist/profile.pstats with --all-operators. The files are rendered by other processes "
+                        "unless --jobs is 1.")
+    parser.add_argument("-q", "--query-status",
+                        action="store_true",
+                        help="Query the status of the databases, ECS services and k8s deployments of the "
+                        "operators concurrently, like the query steps do, instead of generating the steps.")
+    parser.add_argument("--status-backend",
+                        choices=STATUS_BACKENDS.keys(),
+                        default="cli",
+                        help="The backend to query the status with. cli runs the aws and kubectl commands, "
+                        "and fake reports the status after the maintenance without querying anything.")
+    parser.add_argument("--status-concurrency",
+                        type=int,
+                        default=4,
+                        help="Maximum number of status queries at a time against a service of a region "
+                        "or a cluster.")
+    parser.add_argument("--status-timeout",
+                        type=float,
+                        default=30.0,
+                        help="Timeout of a status query in seconds.")
+    parser.add_argument("--kube-context",
+                        action="append",
+                        type=parse_kube_context,
+                        default=[],
+                        metavar="CLUSTER=CONTEXT",
+                        help="The kubectl context to query the deployments of a cluster with. Repeat it for "
+                        "each cluster. Default is the context named after the cluster.")
+    parser.add_argument("--fake-latency",
+                        type=float,
+                        default=0.2,
+                        help="Average latency of a query of the fake backend in seconds.")
+    parser.add_argument("--fake-error-rate",
+                        type=float,
+                        default=0.0,
+                        help="Ratio of the queries of the fake backend which fail.")
     args = parser.parse_args()
+    if args.query_status and (args.profile or args.cprofile):
+        parser.error("--profile and --cprofile profile the generation of the steps, not --query-status")
 
     data_path = Path(args.data_path)
+    pattern = "*" if args.all_operators else args.operator
+    # The profile of a run is named after the operators it covers, so that
+    # the runs of other operators do not overwrite it
+    profile_name = "profile" if args.all_operators else re.sub(r"[^\w.-]", "_", pattern) + ".profile"
 
-    dist_path = Path("./dist", args.operator)
-    dist_path.mkdir(parents=True, exist_ok=True)
+    profile = RunProfile()
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
 
-    aws_regions = ResourceDataLoader.load_from_file(
-        data_path=data_path,
-        maintenance_id=args.maintenance_id
-    )
+    try:
+        with profile.phase("load"):
+            aws_regions, selected = load_model(
+                data_path=data_path,
+                maintenance_id=args.maintenance_id,
+                pattern=pattern,
+                cache_dir=None if args.no_cache else Path(args.cache_dir))
+    except ValueError as e:
+        parser.error(str(e))
 
     print_regions_detail(aws_regions=aws_regions)
 
-    operator = Operator(id=args.operator)
-    operator.data_loader.load_from_file(
-        data_path=data_path,
-        maintenance_id=args.maintenance_id,
-        aws_regions=aws_regions)
-
-    Step = namedtuple("Step", ["class_", "zeroinfy", "description"])
-    steps = [Step(class_=UpdateECSTaskCount,
-                  zeroinfy=True,
-                  description="generate commands for updating ecs task count to 0"),
-             Step(class_=UpdateK8sStatefulSetReplicas,
-                  zeroinfy=True,
-                  description="generate commands for updating k8s statefulset replicas to 0"),
-             Step(class_=UpdateK8sDeploymentReplicas,
-                  zeroinfy=True,
-                  description="generate commands for updating k8s deployment replicas to 0"),
-             Step(class_=DumpPgstats,
-                  zeroinfy=False,
-                  description="generate commands for dumping pgstats"),
-             Step(class_=DumpMysqlTableStatus,
-                  zeroinfy=False,
-                  description="generate commands for dumping mysql table status"),
-             Step(class_=ModifyDatabaseEngineVersion,
-                  zeroinfy=False,
-                  description="generate commands for modifying database engine version"),
-             Step(class_=ModifyDatabaseClassType,
-                  zeroinfy=False,
-                  description="generate commands for modifying database class type"),
-             Step(class_=QueryDatabaseStatus,
-                  zeroinfy=False,
-                  description="generate commands for querying database status"),
-             Step(class_=DumpMysqlTableStatus,
-                  zeroinfy=False,
-                  description="generate commands for dumping mysql table status"),
-             Step(class_=DumpPgstats,
-                  zeroinfy=False,
-                  description="generate commands for dumping pgstats"),
-             Step(class_=RestartK8sDeployment,
-                  zeroinfy=False,
-                  description="generate commands for restarting k8s deployment"),
-             Step(class_=RestartECSService,
-                  zeroinfy=False,
-                  description="generate commands for restarting ecs service"),
-             Step(class_=RestartK8sDeployment,
-                  zeroinfy=False,
-                  description="generate commands for restarting eks deployment"),
-             Step(class_=UpdateK8sDeploymentReplicas,
-                  zeroinfy=False,
-                  description="generate commands for updating k8s deployment replicas to resume"),
-             Step(class_=UpdateK8sStatefulSetReplicas,
-                  zeroinfy=False,
-                  description="generate commands for updating k8s statefulset replicas to resume"),
-             Step(class_=UpdateECSTaskCount,
-                  zeroinfy=False,
-                  description="generate commands for updating ecs task count to resume"),
-             Step(class_=QueryK8sDeploymentStatus,
-                  zeroinfy=False,
-                  description="generate commands for querying k8s deployment status"),
-             Step(class_=QueryECSTaskStatus,
-                  zeroinfy=False,
-                  description="generate commands for querying ecs task status")]
+    if args.query_status:
+        if args.status_backend == "fake":
+            backend = FakeStatusBackend(latency=args.fake_latency, error_rate=args.fake_error_rate)
+        else:
+            backend = STATUS_BACKENDS[args.status_backend](
+                contexts=dict(args.kube_context))
+        start_time = time.perf_counter()
+        statuses = asyncio.run(collect_status(operators=selected,
+                                              backend=backend,
+                                              concurrency=args.status_concurrency,
+                                              timeout=args.status_timeout))
+        print_status(statuses=statuses)
+        failed = [status for status in statuses if status.status in ("ERROR", "TIMEOUT", "MISSING")]
+        logger.info(f"Queried the status of {len(statuses)} resources in {time.perf_counter() - start_time:.2f}s, "
+                    f"{len(failed)} of them failed")
 
-    step_no = 1
-    for step in steps:
-        logger.info(f"Step {step_no}: {step.description}")
-        step_args = {"step_no": step_no,
-                     "operator": operator,
-                     "dist_path": dist_path}
-        if step.zeroinfy:
-            step_args["zeroinfy"] = True
-        step_impl = step.class_(**step_args)
-        step_impl.write_file()
-        if step_impl.eligible():
-            step_no += 1
+        return 1 if failed else 0
+
+    dist_paths = {operator_id: Path("./dist", operator_id) for operator_id in selected}
+    Path("./dist").mkdir(exist_ok=True)
+
+    start_time = time.perf_counter()
+    files, written = generate_bundle(operators=selected,
+                                     dist_paths=dist_paths,
+                                     jobs=args.jobs,
+                                     force=args.force,
+                                     archive=args.archive,
+                                     profile=profile)
+    elapsed = time.perf_counter() - start_time
+
+    if profiler is not None:
+        profiler.disable()
+        stats_path = Path("./dist", f"{profile_name}.pstats")
+        profiler.dump_stats(stats_path)
+        logger.info(f"cProfile stats are written to {stats_path}")
+
+    print_summary(operators=selected, dist_paths=dist_paths, files=files, written=written)
+    logger.info(f"Generated {sum(len(filenames) for filenames in files.values())} files for "
+                f"{len(selected)} operators in {elapsed:.2f}s, "
+                f"{sum(len(filenames) for filenames in written.values())} of them written")
+
+    if args.profile:
+        profile.print_step_totals()
+        report = profile.report(maintenance_id=args.maintenance_id,
+                                operators=list(selected),
+                                jobs=args.jobs,
+                                axolpy_lib=get_axolpy_lib_version(),
+                                created=datetime.now(timezone.utc).isoformat())
+        report_path = Path("./dist", f"{profile_name}.json")
+        report_path.write_text(json.dumps(report, indent=2) + "\n")
+        logger.info(f"Profile is written to {report_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from axolpy.cryptography import encrypt_message, generate_key
+
+# A scenario is the arguments of crypt-message.py and its stdin
+SCENARIOS: Dict[str, Tuple[List[str], Optional[bytes]]] = {
+    "generate": (["-g"], None),
+    "encrypt": (["-k", "secret.key", "-m", "Hello, world!"], None),
+    "decrypt": (["-k", "secret.key", "-d", "-m", "{token}"], None),
+    "encrypt-stream": (["-k", "secret.key"], b"Hello, world!\n" * 64)}
+
+
+def run_scenario(script: Path,
+                 scenario: str,
+                 work_dir: Path,
+                 token: str,
+                 env: Dict[str, str],
+                 python_options: Tuple[str, ...] = ()) -> Tuple[float, subprocess.CompletedProcess]:
+    """
+    Run crypt-message.py for a scenario and time it from start to exit.
+
+    :param script: The path to crypt-message.py.
+    :type script: :class:`Path`
+    :param scenario: The name of the scenario.
+    :type scenario: str
+    :param work_dir: The working directory, which has the key file.
+    :type work_dir: :class:`Path`
+    :param token: A message encrypted with the key, to decrypt.
+    :type token: str
+    :param env: The environment variables.
+    :type env: Dict[str, str]
+    :param python_options: The options of the interpreter.
+    :type python_options: Tuple[str, ...]
+
+    :return: The time taken in seconds and the completed process.
+    :rtype: Tuple[float, :class:`subprocess.CompletedProcess`]
+    """
+
+    args, stdin = SCENARIOS[scenario]
+    args = [arg.format(token=token) for arg in args]
+    if scenario == "generate":
+        # The key file is generated in a directory of its own, as it is
+        # never overwritten
+        work_dir = Path(tempfile.mkdtemp(dir=work_dir))
+
+    start_time = time.perf_counter()
+    process = subprocess.run([sys.executable, *python_options, str(script), *args],
+                             cwd=work_dir,
+                             env=env,
+                             input=stdin if stdin is not None else b"",
+                             capture_output=True)
+    elapsed = time.perf_counter() - start_time
+    if process.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario} exited with {process.returncode}: "
+                           f"{process.stderr.decode().strip()}")
+
+    return elapsed, process
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Summarize the timings of the runs of a scenario in milliseconds.
+
+    :param timings: The timings in seconds.
+    :type timings: List[float]
+
+    :return: The minimum, the median, the mean, the 95th percentile and
+        the maximum.
+    :rtype: Dict[str, float]
+    """
+
+    ordered = sorted(timings)
+    return {"runs": len(ordered),
+            "min": ordered[0] * 1000,
+            "median": statistics.median(ordered) * 1000,
+            "mean": statistics.fmean(ordered) * 1000,
+            "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))] * 1000,
+            "max": ordered[-1] * 1000}
+
+
+def parse_importtime(stderr: str, top: int) -> List[Tuple[str, int, int]]:
+    """
+    Parse the output of `python -X importtime`.
+
+    :param stderr: The output.
+    :type stderr: str
+    :param top: The number of modules to return.
+    :type top: int
+
+    :return: The top level modules imported with their own and their
+        cumulative time in microseconds, the slowest first.
+    :rtype: List[Tuple[str, int, int]]
+    """
+
+    modules = list()
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        # Only the modules imported by the script or the interpreter
+        # itself are listed, without what they import in turn
+        if match and not match.group(3):
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2))))
+
+    return sorted(modules, key=lambda module: module[2], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent('''\
+            Benchmark the time crypt-message.py takes from start to exit for
+            generating a key, and encrypting and decrypting a short message.
+
+            A cold run compiles the modules as no bytecode is cached, and warm
+            runs use the bytecode cached by the cold run.
+            '''))
+    parser.add_argument("-s", "--script",
+                        default=str(Path(__file__).with_name("crypt-message.py")),
+                        help="The path to crypt-message.py. Default is the one next to this script.")
+    parser.add_argument("-n", "--runs",
+                        type=int,
+                        default=20,
+                        help="Number of warm runs of each scenario.")
+    parser.add_argument("--scenario",
+                        action="append",
+                        choices=SCENARIOS.keys(),
+                        help="The scenario to run. Repeat it to run many. Default is all.")
+    parser.add_argument("--importtime",
+                        type=int,
+                        default=10,
+                        metavar="TOP",
+                        help="Print the TOP slowest imports of each scenario, from python -X importtime. "
+                        "0 disables it.")
+    parser.add_argument("--json",
+                        help="Write the results to this JSON file, to track them over time.")
+    args = parser.parse_args()
+
+    script = Path(args.script).resolve()
+    scenarios = args.scenario or list(SCENARIOS.keys())
+    results: Dict[str, dict] = dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = Path(tmp_dir)
+        key = generate_key()
+        work_dir.joinpath("secret.key").write_bytes(key)
+        token = encrypt_message(message="Hello, world!", key=key).decode()
+
+        # The bytecode is cached in a directory of this run, so that the
+        # first run is cold whatever has been cached before
+        env = {**os.environ, "PYTHONPYCACHEPREFIX": str(work_dir.joinpath("pycache"))}
+
+        for scenario in scenarios:
+            cold, _ = run_scenario(script=script, scenario=scenario, work_dir=work_dir, token=token,
+                                   env={**env, "PYTHONPYCACHEPREFIX": str(work_dir.joinpath(f"cold-{scenario}"))})
+            warm = [run_scenario(script=script, scenario=scenario, work_dir=work_dir, token=token, env=env)[0]
+                    for _ in range(args.runs)]
+            results[scenario] = {"cold": cold * 1000, "warm": summarize(warm)}
+
+            if args.importtime > 0:
+                _, process = run_scenario(script=script, scenario=scenario, work_dir=work_dir, token=token,
+                                          env=env, python_options=("-X", "importtime"))
+                results[scenario]["imports"] = [
+                    {"module": module, "self_us": self_us, "cumulative_us": cumulative_us}
+                    for module, self_us, cumulative_us in parse_importtime(process.stderr.decode(),
+                                                                           top=args.importtime)]
+
+    print(f"{'Scenario':<16} {'Cold (ms)':>9} {'Min (ms)':>9} {'Median (ms)':>11} {'Mean (ms)':>9} "
+          f"{'P95 (ms)':>9} {'Max (ms)':>9}")
+    for scenario, result in results.items():
+        warm = result["warm"]
+        print(f"{scenario:<16} {result['cold']:>9.1f} {warm['min']:>9.1f} {warm['median']:>11.1f} "
+              f"{warm['mean']:>9.1f} {warm['p95']:>9.1f} {warm['max']:>9.1f}")
+
+    for scenario, result in results.items():
+        if result.get("imports"):
+            print(f"\nSlowest imports of {scenario}:")
+            for module in result["imports"]:
+                print(f"  {module['module']:<40} {module['cumulative_us'] / 1000:>8.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"script": str(script),
+                                               "python": sys.version.split()[0],
+                                               "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                                               "scenarios": results},
+                                              indent=2) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
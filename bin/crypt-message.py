@@ -1,11 +1,368 @@
 import argparse
+import glob
+import os
+import struct
 import sys
 import textwrap
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Tuple
 
 from axolpy.cryptography import (decrypt_message, encrypt_message,
                                  generate_key_file, load_key)
-from axolpy.util import prompt as axolpy_prompt
-from prompt_toolkit import prompt
+from cryptography.fernet import Fernet, InvalidToken
+
+# prompt_toolkit and the process pool are imported where they are used, as
+# importing them takes longer than encrypting a message given by arguments
+
+# An encrypted stream starts with this line, followed by one Fernet token
+# per line for each chunk of the message
+STREAM_MAGIC = b"axolpy-crypt-stream-v1\n"
+STREAM_CHUNK_SIZE = 1024 * 1024
+ENCRYPTED_SUFFIX = ".enc"
+
+# Every chunk is prefixed with the ID of its stream, its sequence number and
+# whether it is the last one before it is encrypted, so that chunks which are
+# reordered, dropped or taken from another stream are detected
+_CHUNK_HEADER = struct.Struct(">16sQ?")
+
+
+def encrypt_stream(source: BinaryIO,
+                   sink: BinaryIO,
+                   key: bytes,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+    """
+    Encrypt a stream in chunks, holding one chunk in memory at a time.
+
+    :param source: The stream to encrypt.
+    :type source: BinaryIO
+    :param sink: The stream to write the encrypted stream to.
+    :type sink: BinaryIO
+    :param key: Key to use for encryption.
+    :type key: bytes
+    :param chunk_size: The size of a chunk in bytes.
+    :type chunk_size: int
+    """
+
+    fernet = Fernet(key)
+    stream_id = os.urandom(16)
+    sink.write(STREAM_MAGIC)
+
+    seq = 0
+    chunk = source.read(chunk_size)
+    while True:
+        # The next chunk is read ahead to know if this is the last one
+        next_chunk = source.read(chunk_size) if len(chunk) == chunk_size else b""
+        final = not next_chunk
+        sink.write(fernet.encrypt(_CHUNK_HEADER.pack(stream_id, seq, final) + chunk) + b"\n")
+        if final:
+            break
+        chunk = next_chunk
+        seq += 1
+
+
+def decrypt_stream(source: BinaryIO, sink: BinaryIO, key: bytes) -> None:
+    """
+    Decrypt a stream encrypted by :func:`encrypt_stream`, chunk by chunk.
+    The chunks are written as soon as they are verified, so the output
+    must be discarded if an error is raised.
+
+    :param source: The encrypted stream.
+    :type source: BinaryIO
+    :param sink: The stream to write the decrypted stream to.
+    :type sink: BinaryIO
+    :param key: Key to use for decryption.
+    :type key: bytes
+
+    :raises: ValueError if the stream is not an encrypted stream, or its
+        chunks are malformed, out of order or truncated.
+    :raises: :class:`InvalidToken` if a chunk is not encrypted with the key
+        or has been modified.
+    """
+
+    if source.readline() != STREAM_MAGIC:
+        raise ValueError("The input is not an encrypted stream.")
+
+    fernet = Fernet(key)
+    stream_id = None
+    seq = 0
+    final = False
+    for line in source:
+        if final:
+            raise ValueError("The stream has data after its last chunk.")
+        plaintext = fernet.decrypt(line.rstrip(b"\n"))
+        if len(plaintext) < _CHUNK_HEADER.size:
+            raise ValueError(f"Chunk {seq} of the stream is too short to be a chunk.")
+        chunk_stream_id, chunk_seq, final = _CHUNK_HEADER.unpack_from(plaintext)
+        if stream_id is None:
+            stream_id = chunk_stream_id
+        if chunk_stream_id != stream_id or chunk_seq != seq:
+            raise ValueError(f"Chunk {seq} of the stream is out of order or from another stream.")
+        sink.write(plaintext[_CHUNK_HEADER.size:])
+        seq += 1
+
+    if not final:
+        raise ValueError("The stream is truncated.")
+
+
+def crypt_stream(args: argparse.Namespace, key: bytes) -> int:
+    """
+    Encrypt or decrypt a file or stdin in chunks into a file or stdout.
+
+    :param args: The arguments.
+    :type args: :class:`argparse.Namespace`
+    :param key: Key to use.
+    :type key: bytes
+
+    :return: The exit code.
+    :rtype: int
+    """
+
+    with ExitStack() as stack:
+        try:
+            source = stack.enter_context(open(args.input, "rb")) if args.input else sys.stdin.buffer
+            sink = stack.enter_context(open(args.output, "wb")) if args.output else sys.stdout.buffer
+        except OSError as e:
+            print(f"Failed to open the stream: {e}", file=sys.stderr)
+            return 1
+
+        try:
+            if args.decrypt:
+                decrypt_stream(source=source, sink=sink, key=key)
+            else:
+                encrypt_stream(source=source, sink=sink, key=key, chunk_size=args.chunk_size)
+        except (ValueError, InvalidToken, OSError) as e:
+            print(f"Failed to {'decrypt' if args.decrypt else 'encrypt'} the stream: {str(e) or 'a chunk is invalid.'}",
+                  file=sys.stderr)
+            if args.output:
+                # A partial output is not left behind
+                sink.close()
+                Path(args.output).unlink()
+            return 1
+        finally:
+            if not args.output:
+                sink.flush()
+
+    return 0
+
+
+_key: bytes = None
+
+
+def _init_worker(key: bytes) -> None:
+    # Every worker process receives the key once, instead of loading it for
+    # every file
+    global _key
+    _key = key
+
+
+def crypt_file(source_path: Path,
+               output_path: Path,
+               decrypt: bool,
+               chunk_size: int,
+               overwrite: bool) -> Tuple[Path, int, str]:
+    """
+    Encrypt or decrypt a file as a stream into another file. The output
+    is written to a temporary file which replaces the output once it is
+    complete. An error is returned rather than raised, so that a file
+    failing does not stop a batch.
+
+    :param source_path: The file to encrypt or decrypt.
+    :type source_path: :class:`Path`
+    :param output_path: The file to write.
+    :type output_path: :class:`Path`
+    :param decrypt: Decrypt the file instead of encrypting it.
+    :type decrypt: bool
+    :param chunk_size: The size of a chunk of a stream to encrypt in bytes.
+    :type chunk_size: int
+    :param overwrite: Overwrite the output if it exists.
+    :type overwrite: bool
+
+    :return: The file, its size in bytes and the error if it failed.
+    :rtype: Tuple[:class:`Path`, int, str]
+    """
+
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    try:
+        if output_path.exists() and not overwrite:
+            raise FileExistsError(f"{output_path} already exists.")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with source_path.open("rb") as source, tmp_path.open("wb") as sink:
+            if decrypt:
+                decrypt_stream(source=source, sink=sink, key=_key)
+            else:
+                encrypt_stream(source=source, sink=sink, key=_key, chunk_size=chunk_size)
+        tmp_path.replace(output_path)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        return source_path, 0, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+    return source_path, source_path.stat().st_size, None
+
+
+def get_batch_files(patterns: List[str],
+                    decrypt: bool,
+                    output_dir: Path = None) -> List[Tuple[Path, Path]]:
+    """
+    Get the files of a batch and their outputs. A directory stands for
+    the files under it, which are not encrypted yet to encrypt or are
+    encrypted to decrypt. An encrypted file has the `.enc` suffix.
+
+    :param patterns: The files, directories or glob patterns.
+    :type patterns: List[str]
+    :param decrypt: Decrypt the files instead of encrypting them.
+    :type decrypt: bool
+    :param output_dir: The directory to write the outputs to, keeping the
+        paths under a directory. None writes them next to the files.
+    :type output_dir: :class:`Path`
+
+    :return: The files and their outputs.
+    :rtype: List[Tuple[:class:`Path`, :class:`Path`]]
+    """
+
+    batch: Dict[Path, Path] = dict()
+    for pattern in patterns:
+        if Path(pattern).is_dir():
+            base_path = Path(pattern)
+            paths = [path for path in sorted(base_path.rglob("*"))
+                     if path.is_file() and (path.suffix == ENCRYPTED_SUFFIX) == decrypt]
+        else:
+            base_path = None
+            paths = [Path(path) for path in sorted(glob.glob(pattern, recursive=True)) if Path(path).is_file()]
+            if not paths and not glob.has_magic(pattern):
+                raise FileNotFoundError(f"{pattern} does not exist.")
+
+        for path in paths:
+            if decrypt:
+                name = path.stem if path.suffix == ENCRYPTED_SUFFIX else f"{path.name}.dec"
+            else:
+                name = f"{path.name}{ENCRYPTED_SUFFIX}"
+            if output_dir is None:
+                output_path = path.with_name(name)
+            elif base_path is not None:
+                output_path = output_dir.joinpath(path.relative_to(base_path).with_name(name))
+            else:
+                output_path = output_dir.joinpath(name)
+            batch[path] = output_path
+
+    outputs = list(batch.values())
+    if len(set(outputs)) < len(outputs):
+        raise ValueError("Some files of the batch would be written to the same output.")
+
+    return list(batch.items())
+
+
+def crypt_batch(args: argparse.Namespace, key: bytes) -> int:
+    """
+    Encrypt or decrypt the files of a batch with a pool of processes,
+    reporting the progress and the throughput to stderr.
+
+    :param args: The arguments.
+    :type args: :class:`argparse.Namespace`
+    :param key: Key to use.
+    :type key: bytes
+
+    :return: The exit code, which is 1 if any file failed.
+    :rtype: int
+    """
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    batch = get_batch_files(patterns=args.batch,
+                            decrypt=args.decrypt,
+                            output_dir=Path(args.output_dir) if args.output_dir else None)
+    tasks = [(source_path, output_path, args.decrypt, args.chunk_size, args.overwrite)
+             for source_path, output_path in batch]
+
+    start_time = time.perf_counter()
+    last_report = start_time
+    done = failed = total_bytes = 0
+
+    def report(results: Iterable[Tuple[Path, int, str]]) -> None:
+        nonlocal done, failed, total_bytes, last_report
+        for source_path, size, error in results:
+            done += 1
+            total_bytes += size
+            if error:
+                failed += 1
+                print(f"Failed to {'decrypt' if args.decrypt else 'encrypt'} {source_path}: {error}",
+                      file=sys.stderr)
+            now = time.perf_counter()
+            if now - last_report >= 1 or done == len(tasks):
+                last_report = now
+                print(f"{done}/{len(tasks)} files, {total_bytes / 1e6:.1f} MB, "
+                      f"{total_bytes / 1e6 / max(now - start_time, 1e-9):.1f} MB/s",
+                      file=sys.stderr)
+
+    if args.jobs <= 1 or len(tasks) <= 1:
+        _init_worker(key)
+        report(crypt_file(*task) for task in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs,
+                                 initializer=_init_worker,
+                                 initargs=(key,)) as executor:
+            futures = [executor.submit(crypt_file, *task) for task in tasks]
+            report(future.result() for future in as_completed(futures))
+
+    print(f"{'Decrypted' if args.decrypt else 'Encrypted'} {done - failed} of {len(tasks)} files, "
+          f"{total_bytes / 1e6:.1f} MB in {time.perf_counter() - start_time:.2f}s, {failed} failed",
+          file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+def get_key(args: argparse.Namespace) -> bytes:
+    """
+    Load the key from the key file, or prompt for it.
+
+    :param args: The arguments.
+    :type args: :class:`argparse.Namespace`
+
+    :return: The key.
+    :rtype: bytes
+    """
+
+    if args.key_file:
+        return load_key(Path(args.key_file))
+
+    from axolpy.util import prompt as axolpy_prompt
+    from prompt_toolkit import prompt
+
+    key_input = prompt(
+        message="Key: ",
+        validator=axolpy_prompt.CryptographyKeyValidator())
+    return key_input.encode()
+
+
+def crypt_message(args: argparse.Namespace, key: bytes) -> None:
+    """
+    Encrypt or decrypt the message given by the arguments, or prompt for
+    it, and print the result.
+
+    :param args: The arguments.
+    :type args: :class:`argparse.Namespace`
+    :param key: Key to use.
+    :type key: bytes
+    """
+
+    message = args.message
+    if not message:
+        from prompt_toolkit import prompt
+
+        print("Start typing the message to be encrypted or decrypted. Press Escape+Enter to submit.")
+        message = prompt(multiline=True)
+
+    if args.decrypt:
+        message = decrypt_message(
+            encrypted_message=message,
+            key=key)
+        print(message.decode())
+    else:
+        message = encrypt_message(
+            message=message,
+            key=key)
+        print(message.decode())
 
 
 def main() -> int:
@@ -15,6 +372,10 @@ def main() -> int:
             Encrypt or decrypt a message. The output is written to stdout.
 
             By default, encryption is executed. To decrypt, use the --decrypt.
+
+            A file given by --input, or stdin if it is a pipe, is encrypted or
+            decrypted as a stream, in chunks, with constant memory. Many files
+            are encrypted or decrypted at once by --batch.
             '''))
     parser.add_argument("-g", "--generate-key-file",
                         action="store_true",
@@ -30,36 +391,56 @@ def main() -> int:
     parser.add_argument("-m", "--message",
                         required=False,
                         help="Message to encrypt or decrypt. If not specified, read from stdin.")
+    parser.add_argument("-i", "--input",
+                        required=False,
+                        help="The file to encrypt or decrypt as a stream.")
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        help="The file to write the stream to. Default is stdout.")
+    parser.add_argument("-b", "--batch",
+                        nargs="+",
+                        required=False,
+                        help="Files, directories or glob patterns of the files to encrypt into <file>.enc, "
+                        "or to decrypt from <file>.enc, with a pool of processes.")
+    parser.add_argument("--output-dir",
+                        required=False,
+                        help="The directory to write the files of a batch to. Default is next to each file.")
+    parser.add_argument("--overwrite",
+                        action="store_true",
+                        help="Overwrite the existing outputs of a batch.")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=os.cpu_count(),
+                        help="Number of processes of a batch. Default is the number of CPU cores.")
+    parser.add_argument("--chunk-size",
+                        type=int,
+                        default=STREAM_CHUNK_SIZE,
+                        help=f"The size of a chunk of a stream to encrypt in bytes. Default is {STREAM_CHUNK_SIZE}.")
     args = parser.parse_args()
 
     if args.generate_key_file:
         generate_key_file()
         return
 
-    key: bytes = None
-    if args.key_file:
-        key = load_key(args.key_file)
-    else:
-        key_input = prompt(
-            message="Key: ",
-            validator=axolpy_prompt.CryptographyKeyValidator())
-        key = key_input.encode()
+    if args.batch and (args.message or args.input or args.output):
+        parser.error("A batch cannot be given with a message, an input or an output.")
+    streaming = not args.batch and (bool(args.input or args.output)
+                                    or (not args.message and not sys.stdin.isatty()))
+    if (streaming or args.batch) and not args.key_file:
+        parser.error("A key file is required to encrypt or decrypt a stream or a batch.")
+    if args.chunk_size <= 0:
+        parser.error("The chunk size must be positive.")
 
-    message = args.message
-    if not message:
-        print("Start typing the message to be encrypted or decrypted. Press Escape+Enter to submit.")
-        message = prompt(multiline=True)
+    key = get_key(args=args)
+    if args.batch:
+        try:
+            return crypt_batch(args=args, key=key)
+        except (FileNotFoundError, ValueError) as e:
+            parser.error(str(e))
+    if streaming:
+        return crypt_stream(args=args, key=key)
 
-    if args.decrypt:
-        message = decrypt_message(
-            encrypted_message=message,
-            key=key)
-        print(message.decode())
-    else:
-        message = encrypt_message(
-            message=message,
-            key=key)
-        print(message.decode())
+    crypt_message(args=args, key=key)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,45 @@
+import argparse
+import asyncio
+import binascii
+import csv
+import itertools
+import json
+import math
+import os
 import random
+import selectors
+import sqlite3
+import subprocess
+import sys
+import textwrap
 import time
-from typing import Any
-
-from axolpy import configuration
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import (Any, Callable, Coroutine, Deque, Dict, Iterator, List,
+                    Set, Tuple)
+
+import gevent
+import gevent.event
+import gevent.pool
+import psutil
+import yaml
+from gevent import GreenletExit
+from axolpy import configuration, logging
 from axolpy.util.helper.string import generate_random_string
 from locust import User, events, tag, task
-from rediscluster import RedisCluster
+from locust.runners import CPU_MONITOR_INTERVAL, MasterRunner, WorkerRunner
+from redis import Redis
+from redis.exceptions import RedisError, ResponseError
+from rediscluster import (ClusterBlockingConnectionPool,
+                          ClusterConnectionPool, RedisCluster)
+from rediscluster.exceptions import MovedError, RedisClusterException
+from rediscluster.nodemanager import NodeManager
+
+REDIS_CLUSTER_HASH_SLOTS = 16384
 
 
 def random_LDP(length: int = 10) -> str:
@@ -27,412 +61,2356 @@ def random_LDP(length: int = 10) -> str:
     )
 
 
-def get_response_time_in_ms(start_time: float, end_time: float) -> int:
+class PayloadPool(object):
+    """
+    A pool of random payloads generated once per process, so that the load
+    test doesn't spend its time on generating random strings. The pool holds
+    one buffer of random letters, digits and punctuation, and arrays of
+    random offsets, lengths and numbers. A payload is a slice of the buffer
+    at the next offset, so drawing one involves no random generation.
+    """
+
+    def __init__(self,
+                 size: int = 65536,
+                 min_length: int = 10,
+                 max_length: int = 10,
+                 max_slice_length: int = 64) -> None:
+        """
+        Initialize the payload pool.
+
+        :param size: Number of precomputed offsets, lengths and numbers. It
+            is also the number of distinct payloads of each length.
+            Default is 65536.
+        :type size: int
+        :param min_length: Minimum length of values. Default is 10.
+        :type min_length: int
+        :param max_length: Maximum length of values. Default is 10.
+        :type max_length: int
+        :param max_slice_length: Maximum length of any payload drawn from the
+            pool. Default is 64.
+        :type max_slice_length: int
+        """
+
+        assert size > 0, "size must be positive"
+        assert 0 < min_length <= max_length, \
+            "min_length must be positive and not larger than max_length"
+
+        self.size = size
+        self.max_slice_length = max(max_length, max_slice_length)
+
+        rnd = random.Random()
+        self._text: str = random_LDP(length=size + self.max_slice_length)
+        self._offsets = array("I", (rnd.randrange(size) for _ in range(size)))
+        self._lengths = array("I", (rnd.randint(min_length, max_length)
+                                    for _ in range(size)))
+        self._numbers = array("I", (rnd.getrandbits(32) for _ in range(size)))
+        self._index = 0
+
+    def _next_index(self) -> int:
+        self._index += 1
+        if self._index == self.size:
+            self._index = 0
+
+        return self._index
+
+    def number(self, low: int, high: int) -> int:
+        """
+        Draw a number between *low* and *high*, both inclusive.
+
+        :param low: The lower bound.
+        :type low: int
+        :param high: The upper bound.
+        :type high: int
+
+        :return: The number.
+        :rtype: int
+        """
+
+        return low + self._numbers[self._next_index()] % (high - low + 1)
+
+    def text(self, min_length: int = None, max_length: int = None) -> str:
+        """
+        Draw a random string. Its length is between *min_length* and
+        *max_length* if they are given, or follows the value length
+        distribution of the pool otherwise.
+
+        :param min_length: Minimum length of the string.
+        :type min_length: int
+        :param max_length: Maximum length of the string. Default is
+            *min_length*.
+        :type max_length: int
+
+        :return: The random string.
+        :rtype: str
+        """
+
+        i = self._next_index()
+        if min_length is None:
+            length = self._lengths[i]
+        elif max_length is None or max_length == min_length:
+            length = min_length
+        else:
+            length = min_length + self._numbers[i] % (max_length - min_length + 1)
+        if length > self.max_slice_length:
+            raise ValueError(
+                f"Length {length} is larger than the pool supports ({self.max_slice_length})")
+
+        offset = self._offsets[i]
+        return self._text[offset:offset + length]
+
+
+def get_key_slot(key: str) -> int:
     """
-    Get the response time in milliseconds.
+    Get the hash slot of a key in redis cluster. Only the hash tag of the
+    key, the part between the first `{` and the following `}`, is hashed
+    if it is not empty.
 
-    :param start_time: Start time.
-    :type start_time: float
-    :param end_time: End time.
-    :type end_time: float
+    :param key: The name of the key.
+    :type key: str
 
-    :return: Response time in milliseconds.
+    :return: The hash slot of the key.
     :rtype: int
     """
 
-    return int((end_time - start_time) * 1000)
+    k = key.encode()
+    start = k.find(b"{")
+    if start > -1:
+        end = k.find(b"}", start + 1)
+        if end > -1 and end != start + 1:
+            k = k[start + 1:end]
 
+    return binascii.crc_hqx(k, 0) % REDIS_CLUSTER_HASH_SLOTS
 
-class RedisClient(object):
+
+def parse_slots(value: str) -> List[int]:
     """
-    A redis client to perform load test on redis cluster.
+    Parse a comma separated list of hash slots and ranges of hash slots,
+    such as `0-99,5000`.
+
+    :param value: The list of slots.
+    :type value: str
+
+    :return: The slots in the given order.
+    :rtype: List[int]
     """
 
-    def __init__(
-            self,
-            host="localhost",
-            port=6379,
-            password=None):
+    slots = list()
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        low, _, high = part.partition("-")
+        low = int(low)
+        high = int(high) if high else low
+        if not 0 <= low <= high < REDIS_CLUSTER_HASH_SLOTS:
+            raise ValueError(f"Invalid hash slot range {part}")
+        slots.extend(range(low, high + 1))
+
+    return slots
+
+
+def find_slot_tags(slots: List[int]) -> Dict[int, str]:
+    """
+    Find a short hash tag for each of the hash slots, so that a key with
+    the hash tag falls into the slot.
+
+    :param slots: The hash slots.
+    :type slots: List[int]
+
+    :return: The hash tag of each slot.
+    :rtype: Dict[int, str]
+    """
+
+    wanted = set(slots)
+    tags = dict()
+    for n in itertools.count():
+        if not wanted:
+            break
+        tag = f"{n:x}"
+        slot = get_key_slot(tag)
+        if slot in wanted:
+            tags[slot] = tag
+            wanted.discard(slot)
+
+    return tags
+
+
+class KeyGenerator(object):
+    """
+    Generate key names with control over the hash slots that they fall
+    into. The keys are spread over groups. The keys of a group share a hash
+    tag, so they are in the same slot. When target slots are given, the
+    groups take turns on them. Without a key space, every key is a new
+    random string. With a key space, the keys are drawn from a fixed set of
+    keys either uniformly or following a Zipfian distribution, where the
+    first key is the hottest one and it is in the first target slot. Every
+    key starts with the prefix, so that the keys can be found by
+    :func:`cleanup_keys`.
+    """
+
+    def __init__(self,
+                 payloads: PayloadPool,
+                 key_space: int = 0,
+                 slots: List[int] = None,
+                 hash_tags: int = 0,
+                 distribution: str = "uniform",
+                 zipf_exponent: float = 0.99,
+                 size: int = 65536,
+                 prefix: str = "lt") -> None:
+        """
+        Initialize the key generator.
+
+        :param payloads: The pool to draw random keys from.
+        :type payloads: :class:`PayloadPool`
+        :param key_space: Number of distinct keys. 0 makes every key a new
+            random string. Default is 0.
+        :type key_space: int
+        :param slots: The hash slots to put the keys into. Default is all.
+        :type slots: List[int]
+        :param hash_tags: Number of hash tagged groups of keys. 0 makes one
+            group per target slot, or no hash tag without target slots.
+            Default is 0.
+        :type hash_tags: int
+        :param distribution: `uniform` or `zipf`. Default is `uniform`.
+        :type distribution: str
+        :param zipf_exponent: The exponent of the Zipfian distribution.
+            Default is 0.99.
+        :type zipf_exponent: float
+        :param size: Number of precomputed draws from the key space.
+            Default is 65536.
+        :type size: int
+        :param prefix: The prefix of the keys. Default is `lt`.
+        :type prefix: str
         """
-        Initialize the redis client.
 
-        :param host: The host of the redis server.
-        :type host: str
-        :param port: The port of the redis server.
-        :type port: int
-        :param password: The password of the redis server.
-        :type password: str
+        if distribution not in ("uniform", "zipf"):
+            raise ValueError(f"Unknown key distribution {distribution}")
+        if distribution == "zipf" and key_space <= 0:
+            raise ValueError("Zipfian distribution requires a key space")
+
+        self._payloads = payloads
+        self.key_space = key_space
+        self.prefix = prefix
+
+        if slots:
+            slot_tags = find_slot_tags(slots)
+            groups = max(hash_tags, len(slots))
+            self._group_tags = [f"{{{slot_tags[slots[g % len(slots)]]}}}"
+                                for g in range(groups)]
+        elif hash_tags > 0:
+            self._group_tags = [f"{{{prefix}{g}}}" for g in range(hash_tags)]
+        else:
+            self._group_tags = [""]
+
+        if key_space > 0:
+            rnd = random.Random()
+            population = range(key_space)
+            if distribution == "zipf":
+                cum_weights = list(itertools.accumulate(
+                    1.0 / (i + 1) ** zipf_exponent for i in population))
+                draws = rnd.choices(population, cum_weights=cum_weights, k=size)
+            else:
+                draws = rnd.choices(population, k=size)
+            self._draws = array("I", draws)
+            self._index = 0
+
+    def key(self, namespace: str = None) -> str:
         """
+        Draw a key.
 
-        self.rc = RedisCluster(startup_nodes=[{"host": host, "port": port}],
-                               password=password,
-                               decode_responses=True)
+        :param namespace: The namespace of the key in the key space, such
+            as the data type, so that the keys of different namespaces don't
+            collide.
+        :type namespace: str
 
-    def set_string(self, event_name: str, key_name: str) -> str:
+        :return: The name of the key.
+        :rtype: str
         """
-        Set a string value to the redis server.
 
-        :param event_name: The name of the event.
-        :type event_name: str
-        :param key_name: The name of the key.
-        :tye key_name: str
+        if self.key_space <= 0:
+            tags = self._group_tags
+            tag = tags[self._payloads.number(0, len(tags) - 1)] if len(tags) > 1 else tags[0]
+            if namespace:
+                return f"{self.prefix}:{tag}{namespace}:{self._payloads.text()}"
+            return f"{self.prefix}:{tag}{self._payloads.text()}"
 
-        :return: The value of the string set.
+        self._index += 1
+        if self._index == len(self._draws):
+            self._index = 0
+
+        return self.key_of(self._draws[self._index], namespace)
+
+    def key_of(self, index: int, namespace: str = None) -> str:
+        """
+        Get the key at *index* of the key space.
+
+        :param index: The index of the key.
+        :type index: int
+        :param namespace: The namespace of the key.
+        :type namespace: str
+
+        :return: The name of the key.
         :rtype: str
         """
 
-        request_type = "SET"
-        result: str = None
-        value = random_LDP()
+        tag = self._group_tags[index % len(self._group_tags)]
+        if namespace:
+            return f"{self.prefix}:{tag}{namespace}:{index}"
 
-        start_time = time.time()
-        try:
-            result = self.rc.set(name=key_name, value=value)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        return f"{self.prefix}:{tag}{index}"
 
-        return result
 
-    def get_string(self, event_name: str, key_name: str) -> str:
+class WorkloadProfile(object):
+    """
+    A workload declared in a YAML profile: the weights of the operations,
+    the ratio of reads to writes, the distribution of the value sizes, the
+    number of elements per write, the key space, the TTL of the keys and
+    pipelining. Each operation works on one key and is made of one or more
+    commands.
+    """
+
+    READ_OPERATIONS = ("get", "lrange", "smembers", "hget", "hgetall", "zrange")
+    WRITE_OPERATIONS = ("set", "incr", "del", "lpush", "sadd", "hset", "hdel", "zadd")
+
+    # The namespace of the keys of each operation, by data type
+    NAMESPACES = {"get": "string", "set": "string", "del": "string",
+                  "incr": "counter", "lpush": "list", "lrange": "list",
+                  "sadd": "set", "smembers": "set", "hset": "hash",
+                  "hget": "hash", "hgetall": "hash", "hdel": "hash",
+                  "zadd": "sorted_set", "zrange": "sorted_set"}
+    # The operation that populates the keys of each namespace
+    POPULATE_OPERATIONS = {"string": "set", "counter": "incr", "list": "lpush",
+                           "set": "sadd", "hash": "hset", "sorted_set": "zadd"}
+    # The command and the arguments after the key of the operations which
+    # take no value
+    FIXED_COMMANDS = {"get": ("GET",), "lrange": ("LRANGE", 0, 99), "smembers": ("SMEMBERS",),
+                      "hgetall": ("HGETALL",), "zrange": ("ZRANGE", 0, 99), "del": ("DEL",)}
+
+    # The profile used without --workload, with the commands of the other users
+    DEFAULT = {
+        "operations": {"set": 1, "get": 1, "lpush": 1, "sadd": 1, "hset": 1,
+                       "hget": 1, "hdel": 1, "zadd": 1, "zrange": 1},
+        "values": {"sizes": [{"size": 10}]},
+        "elements": [1, 5]}
+
+    def __init__(self, name: str, profile: dict, size: int = 65536) -> None:
+        """
+        Initialize the workload.
+
+        :param name: The name of the profile.
+        :type name: str
+        :param profile: The profile loaded from YAML.
+        :type profile: dict
+        :param size: Number of precomputed draws of operations and value
+            sizes. Default is 65536.
+        :type size: int
         """
-        Get a string value from the redis server.
 
-        :param event_name: The name of the event.
-        :type event_name: str
-        :param key_name: The name of the key.
-        :tye key_name: str
+        self.name = name
+        self.profile = profile
+
+        weights: Dict[str, float] = dict(profile.get("operations") or {})
+        unknown = set(weights) - set(self.READ_OPERATIONS) - set(self.WRITE_OPERATIONS)
+        if not weights or unknown:
+            raise ValueError(f"Workload {name} has no operations or unknown operations "
+                             f"{', '.join(sorted(unknown))}")
+        read_ratio = profile.get("read_ratio")
+        if read_ratio is not None:
+            reads = sum(w for op, w in weights.items() if op in self.READ_OPERATIONS)
+            writes = sum(weights.values()) - reads
+            if not 0 <= read_ratio <= 1 or (read_ratio > 0 and not reads) \
+                    or (read_ratio < 1 and not writes):
+                raise ValueError(f"Workload {name} can't have a read ratio of {read_ratio}")
+            weights = {op: w * (read_ratio / reads if op in self.READ_OPERATIONS
+                                else (1 - read_ratio) / writes)
+                       for op, w in weights.items()}
+        self.operations = list(weights.keys())
+
+        sizes = (profile.get("values") or {}).get("sizes") or [{"size": 10}]
+        size_ranges = [(s["size"], s["size"]) if isinstance(s["size"], int)
+                       else tuple(s["size"]) for s in sizes]
+        self.max_value_size = max(high for _, high in size_ranges)
+
+        elements = profile.get("elements", [1, 5])
+        self.elements = (elements, elements) if isinstance(elements, int) else tuple(elements)
+
+        keys = profile.get("keys") or {}
+        self.key_space: int = keys.get("space")
+        self.ttl: int = keys.get("ttl")
+
+        pipeline = profile.get("pipeline") or {}
+        self.pipeline_depth: int = pipeline.get("depth")
+        self.transaction: bool = pipeline.get("transaction", False)
+
+        rnd = random.Random()
+        self._operation_draws = array("I", rnd.choices(
+            range(len(self.operations)), weights=list(weights.values()), k=size))
+        self._value_size_draws = array("I", (
+            rnd.randint(*size_range) for size_range in rnd.choices(
+                size_ranges, weights=[s.get("weight", 1) for s in sizes], k=size)))
+        self._index = 0
+
+    @classmethod
+    def load(cls, path: Path, name: str) -> "WorkloadProfile":
+        """
+        Load a workload profile from a YAML file of profiles keyed by name.
 
-        :return: The value of the string obtained.
-        :rtype: str
+        :param path: The path of the file.
+        :type path: :class:`pathlib.Path`
+        :param name: The name of the profile.
+        :type name: str
+
+        :return: The workload.
+        :rtype: :class:`WorkloadProfile`
         """
 
-        request_type = "GET"
-        result: str = None
+        profiles = yaml.safe_load(path.read_text()) or {}
+        if name not in profiles:
+            raise ValueError(f"Workload {name} is not found in {path}")
 
-        start_time = time.time()
-        try:
-            result = self.rc.get(name=key_name)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        return cls(name=name, profile=profiles[name])
 
-        return result
+    def _next_index(self) -> int:
+        self._index += 1
+        if self._index == len(self._operation_draws):
+            self._index = 0
 
-    def push_list_elements(self, event_name: str, key_name: str) -> int:
+        return self._index
+
+    def operation(self) -> str:
         """
-        Push a list of elements to the redis server.
+        Draw an operation.
 
-        :param event_name: The name of the event.
-        :type event_name: str
-        :param key_name: The name of the list.
+        :return: The name of the operation.
+        :rtype: str
+        """
+
+        return self.operations[self._operation_draws[self._next_index()]]
+
+    def commands(self,
+                 operation: str,
+                 key_name: str,
+                 payloads: PayloadPool) -> List[tuple]:
+        """
+        Build the commands of an operation on a key. A write is followed by
+        an EXPIRE if the profile has a TTL.
+
+        :param operation: The name of the operation.
+        :type operation: str
+        :param key_name: The name of the key.
         :type key_name: str
+        :param payloads: The pool to draw the values from.
+        :type payloads: :class:`PayloadPool`
 
-        :return: The number of elements pushed to the list.
+        :return: The commands, each as a tuple of arguments.
+        :rtype: List[tuple]
+        """
+
+        if operation in self.FIXED_COMMANDS:
+            command_name, *args = self.FIXED_COMMANDS[operation]
+            return [(command_name, key_name, *args)]
+        if operation in ("hget", "hdel"):
+            return [(operation.upper(), key_name, payloads.number(0, self.elements[1] - 1))]
+        if operation == "set":
+            value = payloads.text(self._value_size_draws[self._next_index()])
+            return [("SET", key_name, value, "EX", self.ttl) if self.ttl else ("SET", key_name, value)]
+
+        command = self._elements_command(operation, key_name, payloads)
+        return [command, ("EXPIRE", key_name, self.ttl)] if self.ttl else [command]
+
+    def _elements_command(self, operation: str, key_name: str, payloads: PayloadPool) -> tuple:
+        def value() -> str:
+            return payloads.text(self._value_size_draws[self._next_index()])
+
+        n = payloads.number(*self.elements)
+        if operation == "incr":
+            return ("INCR", key_name)
+        if operation == "lpush":
+            return ("LPUSH", key_name, *(value() for _ in range(n)))
+        if operation == "sadd":
+            return ("SADD", key_name, *(value() for _ in range(n)))
+        if operation == "hset":
+            return ("HSET", key_name, *itertools.chain.from_iterable((i, value()) for i in range(n)))
+
+        return ("ZADD", key_name,
+                *itertools.chain.from_iterable((payloads.number(0, 1000), value()) for _ in range(n)))
+
+
+class LatencyHistogram(object):
+    """
+    A histogram of latencies in microseconds with log-scaled buckets, in the
+    manner of HdrHistogram. Values below 2^SIGNIFICANT_BITS have their own
+    bucket, and larger values share a bucket with values that agree in the
+    SIGNIFICANT_BITS most significant bits, so the relative error is below
+    0.2%. Histograms can be merged by adding the counts of their buckets.
+    """
+
+    SIGNIFICANT_BITS = 10
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty histogram.
+        """
+
+        self.counts: Dict[int, int] = dict()
+        self.total: int = 0
+        self.max: int = 0
+
+    @classmethod
+    def bucket_of(cls, value: int) -> int:
+        """
+        Get the index of the bucket of *value*.
+
+        :param value: The value.
+        :type value: int
+
+        :return: The index of the bucket.
         :rtype: int
         """
 
-        request_type = "LPUSH"
-        result: int = -1
-        # Create a list of random length with random elements.
-        elements = [random_LDP(
-            length=random.randint(5, 10)
-        )] * random.randint(1, 5)
+        shift = value.bit_length() - cls.SIGNIFICANT_BITS
+        if shift <= 0:
+            return value
 
-        start_time = time.time()
-        try:
-            result = self.rc.lpush(key_name, *elements)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = result.bit_length()
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        return (shift << (cls.SIGNIFICANT_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def highest_value_of(cls, bucket: int) -> int:
+        """
+        Get the highest value that falls into *bucket*.
+
+        :param bucket: The index of the bucket.
+        :type bucket: int
+
+        :return: The highest value of the bucket.
+        :rtype: int
+        """
+
+        if bucket < (1 << cls.SIGNIFICANT_BITS):
+            return bucket
+
+        shift = (bucket >> (cls.SIGNIFICANT_BITS - 1)) - 1
+        return ((bucket - (shift << (cls.SIGNIFICANT_BITS - 1)) + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        """
+        Record *value* *count* times.
+
+        :param value: The value in microseconds.
+        :type value: int
+        :param count: Number of times to record. Default is 1.
+        :type count: int
+        """
+
+        value = max(0, value)
+        bucket = self.bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Add the counts of *other* to this histogram.
+
+        :param other: The histogram to merge.
+        :type other: :class:`LatencyHistogram`
+        """
+
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """
+        Get the value at *percentile*.
+
+        :param percentile: The percentile between 0 and 100.
+        :type percentile: float
+
+        :return: The highest value of the bucket holding the percentile, or
+            0 if the histogram is empty.
+        :rtype: int
+        """
+
+        if self.total == 0:
+            return 0
+
+        rank = max(1, math.ceil(self.total * percentile / 100))
+        seen = 0
+        for bucket in sorted(self.counts.keys()):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.highest_value_of(bucket), self.max)
+
+        return self.max
+
+    def to_list(self) -> list:
+        """
+        Serialize the histogram into a list, which can be sent by locust
+        between the workers and the master.
+
+        :return: The serialized histogram.
+        :rtype: list
+        """
+
+        return [self.max, [[bucket, count] for bucket, count in self.counts.items()]]
+
+    @classmethod
+    def from_list(cls, data: list) -> "LatencyHistogram":
+        """
+        Deserialize a histogram from :meth:`to_list`.
+
+        :param data: The serialized histogram.
+        :type data: list
+
+        :return: The histogram.
+        :rtype: :class:`LatencyHistogram`
+        """
+
+        histogram = cls()
+        histogram.max = data[0]
+        for bucket, count in data[1]:
+            histogram.counts[bucket] = count
+            histogram.total += count
+
+        return histogram
+
+
+class LatencyRecorder(object):
+    """
+    Record latencies in a :class:`LatencyHistogram` per request type and
+    event name.
+    """
+
+    PERCENTILES = (50, 99, 99.9)
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty recorder.
+        """
+
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = dict()
+
+    def record(self, request_type: str, name: str, value: int) -> None:
+        """
+        Record a latency.
+
+        :param request_type: The request type.
+        :type request_type: str
+        :param name: The event name.
+        :type name: str
+        :param value: The latency in microseconds.
+        :type value: int
+        """
+
+        key = (request_type, name)
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram()
+        self.histograms[key].record(value)
+
+    def serialize(self, reset: bool = False) -> list:
+        """
+        Serialize the histograms.
+
+        :param reset: Whether to clear the histograms after serialization.
+            Default is False.
+        :type reset: bool
+
+        :return: The serialized histograms.
+        :rtype: list
+        """
+
+        data = [[request_type, name, histogram.to_list()]
+                for (request_type, name), histogram in self.histograms.items()]
+        if reset:
+            self.histograms = dict()
+
+        return data
+
+    def merge(self, data: list) -> None:
+        """
+        Merge histograms serialized by :meth:`serialize`.
+
+        :param data: The serialized histograms.
+        :type data: list
+        """
+
+        for request_type, name, histogram_data in data:
+            key = (request_type, name)
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge(LatencyHistogram.from_list(histogram_data))
+
+    def summary(self) -> List[dict]:
+        """
+        Summarize the histograms, with the aggregation of all of them at the
+        end.
+
+        :return: Rows of request type, name, count, percentiles and max in
+            microseconds.
+        :rtype: List[dict]
+        """
+
+        aggregated = LatencyHistogram()
+        rows = list()
+        for (request_type, name), histogram in sorted(self.histograms.items()):
+            aggregated.merge(histogram)
+            rows.append(self._summary_row(request_type, name, histogram))
+        rows.append(self._summary_row("", "Aggregated", aggregated))
+
+        return rows
+
+    def _summary_row(self,
+                     request_type: str,
+                     name: str,
+                     histogram: LatencyHistogram) -> dict:
+        row = {"type": request_type, "name": name, "count": histogram.total}
+        for percentile in self.PERCENTILES:
+            row[f"p{percentile}"] = histogram.percentile(percentile)
+        row["max"] = histogram.max
+
+        return row
+
+
+latencies = LatencyRecorder()
+
+
+class RequestTrace(object):
+    """
+    Where a request went in the cluster: the hash slot of its key, the node
+    that served it and the redirections that it incurred.
+    """
+
+    __slots__ = ("slot", "node", "moved", "asked")
+
+    def __init__(self, slot: int = None, node: str = None) -> None:
+        """
+        Initialize a trace.
+
+        :param slot: The hash slot of the key.
+        :type slot: int
+        :param node: The node that the request is sent to, as `host:port`.
+        :type node: str
+        """
+
+        self.slot = slot
+        self.node = node
+        self.moved = 0
+        self.asked = 0
+
+
+class NodeStatsRecorder(object):
+    """
+    Record the requests per node and request type, with their failures,
+    redirections and latencies, and the requests per hash slot.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty recorder.
+        """
+
+        # [count, failures, moved, asked, histogram] per node and request type
+        self.entries: Dict[Tuple[str, str], list] = dict()
+        self.slots: Dict[int, int] = dict()
+
+    def _entry(self, node: str, request_type: str) -> list:
+        key = (node, request_type)
+        if key not in self.entries:
+            self.entries[key] = [0, 0, 0, 0, LatencyHistogram()]
+
+        return self.entries[key]
+
+    def record(self,
+               trace: RequestTrace,
+               request_type: str,
+               value: int,
+               failed: bool = False) -> None:
+        """
+        Record a request.
+
+        :param trace: The trace of the request.
+        :type trace: :class:`RequestTrace`
+        :param request_type: The request type.
+        :type request_type: str
+        :param value: The latency in microseconds.
+        :type value: int
+        :param failed: Whether the request failed. Default is False.
+        :type failed: bool
+        """
+
+        entry = self._entry(trace.node or "unknown", request_type)
+        entry[0] += 1
+        entry[1] += failed
+        entry[2] += trace.moved
+        entry[3] += trace.asked
+        entry[4].record(value)
+        if trace.slot is not None:
+            self.slots[trace.slot] = self.slots.get(trace.slot, 0) + 1
+
+    def serialize(self, reset: bool = False) -> dict:
+        """
+        Serialize the records.
+
+        :param reset: Whether to clear the records after serialization.
+            Default is False.
+        :type reset: bool
+
+        :return: The serialized records.
+        :rtype: dict
+        """
+
+        data = {
+            "nodes": [[node, request_type, *entry[:4], entry[4].to_list()]
+                      for (node, request_type), entry in self.entries.items()],
+            "slots": [[slot, count] for slot, count in self.slots.items()]}
+        if reset:
+            self.entries = dict()
+            self.slots = dict()
+
+        return data
+
+    def merge(self, data: dict) -> None:
+        """
+        Merge records serialized by :meth:`serialize`.
+
+        :param data: The serialized records.
+        :type data: dict
+        """
+
+        for node, request_type, *counts, histogram_data in data.get("nodes", []):
+            entry = self._entry(node, request_type)
+            for i, count in enumerate(counts):
+                entry[i] += count
+            entry[4].merge(LatencyHistogram.from_list(histogram_data))
+        for slot, count in data.get("slots", []):
+            self.slots[slot] = self.slots.get(slot, 0) + count
+
+    def summary(self, duration: float) -> List[dict]:
+        """
+        Summarize the records per node and request type, with the
+        aggregation of each node after its request types.
+
+        :param duration: The duration of the test in seconds, to compute the
+            throughput.
+        :type duration: float
+
+        :return: Rows of node, request type, count, failures, redirections,
+            requests per second, percentiles and max in microseconds.
+        :rtype: List[dict]
+        """
+
+        rows = list()
+        nodes = sorted({node for node, _ in self.entries})
+        for node in nodes:
+            aggregated = [0, 0, 0, 0, LatencyHistogram()]
+            for (entry_node, request_type), entry in sorted(self.entries.items()):
+                if entry_node != node:
+                    continue
+                for i in range(4):
+                    aggregated[i] += entry[i]
+                aggregated[4].merge(entry[4])
+                rows.append(self._summary_row(node, request_type, entry, duration))
+            rows.append(self._summary_row(node, "Aggregated", aggregated, duration))
+
+        return rows
+
+    def _summary_row(self,
+                     node: str,
+                     request_type: str,
+                     entry: list,
+                     duration: float) -> dict:
+        row = {"node": node,
+               "type": request_type,
+               "count": entry[0],
+               "failures": entry[1],
+               "moved": entry[2],
+               "asked": entry[3],
+               "rps": round(entry[0] / duration, 2) if duration > 0 else 0}
+        for percentile in LatencyRecorder.PERCENTILES:
+            row[f"p{percentile}"] = entry[4].percentile(percentile)
+        row["max"] = entry[4].max
+
+        return row
+
+
+node_stats = NodeStatsRecorder()
+
+
+class CpuUsageRecorder(object):
+    """
+    Record the CPU usage of the processes of the load test, the master and
+    each worker, or the single process of a local run. 100% is one core
+    busy, which saturates a process since the users share one core.
+    """
+
+    SATURATION_THRESHOLD = 90
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty recorder.
+        """
+
+        self.samples: Dict[str, List[float]] = dict()
+        self._process = psutil.Process()
+        # The first measurement starts the interval of the next one
+        self._process.cpu_percent()
+
+    def sample(self) -> float:
+        """
+        Measure the CPU usage of this process since the last sample.
+
+        :return: The CPU usage in percent of one core.
+        :rtype: float
+        """
+
+        return self._process.cpu_percent()
+
+    def record(self, process: str, usage: float) -> None:
+        """
+        Record a sample of the CPU usage of a process.
+
+        :param process: The name of the process.
+        :type process: str
+        :param usage: The CPU usage in percent of one core.
+        :type usage: float
+        """
+
+        self.samples.setdefault(process, list()).append(usage)
+
+    def summary(self) -> List[dict]:
+        """
+        Summarize the samples per process.
+
+        :return: Rows of process, number of samples, mean and max CPU usage,
+            and the share of the samples at or above the saturation
+            threshold.
+        :rtype: List[dict]
+        """
+
+        return [{"process": process,
+                 "samples": len(samples),
+                 "mean": sum(samples) / len(samples),
+                 "max": max(samples),
+                 "saturated": sum(s >= self.SATURATION_THRESHOLD for s in samples) / len(samples)}
+                for process, samples in self.samples.items() if samples]
+
+
+cpu_usage = CpuUsageRecorder()
+
+
+class DropRecorder(object):
+    """
+    Count the arrivals of :class:`RedisUserOpenLoop` dropped because too
+    many commands are in flight, per event name. They are counted apart
+    from the requests, since a dropped arrival has no latency and recording
+    one would pull the percentiles down when the cluster is saturated.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty recorder.
+        """
+
+        self.counts: Dict[str, int] = dict()
+
+    def record(self, name: str) -> None:
+        """
+        Count a dropped arrival.
+
+        :param name: The event name.
+        :type name: str
+        """
+
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def serialize(self, reset: bool = False) -> Dict[str, int]:
+        """
+        Serialize the counts.
+
+        :param reset: Whether to clear the counts after serialization.
+            Default is False.
+        :type reset: bool
+
+        :return: The dropped arrivals per event name.
+        :rtype: Dict[str, int]
+        """
+
+        data = dict(self.counts)
+        if reset:
+            self.counts = dict()
+
+        return data
+
+    def merge(self, data: Dict[str, int]) -> None:
+        """
+        Merge counts serialized by :meth:`serialize`.
+
+        :param data: The serialized counts.
+        :type data: Dict[str, int]
+        """
+
+        for name, count in data.items():
+            self.counts[name] = self.counts.get(name, 0) + count
+
+
+dropped = DropRecorder()
+
+
+def report_request(request_type: str,
+                   name: str,
+                   response_time: int,
+                   response_length: int = 0,
+                   exception: Exception = None,
+                   trace: RequestTrace = None) -> None:
+    """
+    Record the latency of a request in :data:`latencies` and, if it is
+    traced, in :data:`node_stats`, and report it to locust.
+
+    :param request_type: The request type.
+    :type request_type: str
+    :param name: The event name.
+    :type name: str
+    :param response_time: The response time in nanoseconds.
+    :type response_time: int
+    :param response_length: The response length. Default is 0.
+    :type response_length: int
+    :param exception: The exception if the request failed.
+    :type exception: Exception
+    :param trace: Where the request went in the cluster.
+    :type trace: :class:`RequestTrace`
+    """
+
+    latencies.record(request_type, name, response_time // 1000)
+    if trace is not None:
+        node_stats.record(trace, request_type, response_time // 1000,
+                          failed=exception is not None)
+    if exception is None:
+        events.request_success.fire(
+            request_type=request_type,
+            name=name,
+            response_time=response_time / 1_000_000,
+            response_length=response_length
+        )
+    else:
+        events.request_failure.fire(
+            request_type=request_type,
+            name=name,
+            response_time=response_time / 1_000_000,
+            response_length=response_length,
+            exception=exception
+        )
+
+
+def length_of_string(result: Any) -> int:
+    """
+    Get the response length of a result as the length of its string form.
+
+    :param result: Result returned by redis.
+    :type result: Any
+
+    :return: Response length.
+    :rtype: int
+    """
+
+    return len(str(result))
+
+
+class PipelineCommand(object):
+    """
+    A command queued in a pipeline batch of :class:`RedisClient`.
+    """
+
+    def __init__(self,
+                 request_type: str,
+                 response_length: Callable[[Any], int],
+                 trace: RequestTrace = None) -> None:
+        """
+        Initialize a queued command.
+
+        :param request_type: The request type reported to locust.
+        :type request_type: str
+        :param response_length: Function to compute the response length
+            from the result of the command.
+        :type response_length: Callable[[Any], int]
+        :param trace: Where the command goes in the cluster.
+        :type trace: :class:`RequestTrace`
+        """
+
+        self.request_type = request_type
+        self.response_length = response_length
+        self.trace = trace
+
+
+class TracingRedisCluster(RedisCluster):
+    """
+    A :class:`RedisCluster` that fills in :attr:`trace`, if it is set, with
+    the node that served the last command and the MOVED/ASK redirections
+    that it incurred.
+    """
+
+    trace: RequestTrace = None
+
+    def parse_response(self, connection, command_name, **options):
+        trace = self.trace
+        if trace is not None:
+            trace.node = f"{connection.host}:{connection.port}"
+            if command_name == "ASKING":
+                trace.asked += 1
+        try:
+            return super().parse_response(connection, command_name, **options)
+        except MovedError:
+            if trace is not None:
+                trace.moved += 1
+            raise
+
+
+class RedisClient(object):
+    """
+    A redis client to perform load test on redis cluster.
+
+    When *pipeline_depth* is larger than 1, commands issued inside
+    :meth:`batch` are queued in a cluster pipeline instead of being sent one
+    by one. The pipeline is executed once any slot-owning node has
+    *pipeline_depth* commands queued, or when the batch ends.
+    """
+
+    def __init__(
+            self,
+            host="localhost",
+            port=6379,
+            password=None,
+            pipeline_depth: int = 1,
+            connection_pool: ClusterConnectionPool = None,
+            payloads: PayloadPool = None,
+            ttl: int = 0):
+        """
+        Initialize the redis client.
+
+        :param host: The host of the redis server.
+        :type host: str
+        :param port: The port of the redis server.
+        :type port: int
+        :param password: The password of the redis server.
+        :type password: str
+        :param pipeline_depth: Number of commands to pipeline per node.
+            Default is 1 which means no pipelining.
+        :type pipeline_depth: int
+        :param connection_pool: A connection pool shared with other clients.
+            If it is given, *host*, *port* and *password* are ignored.
+        :type connection_pool: :class:`ClusterConnectionPool`
+        :param payloads: The pool to draw the values from. A small pool is
+            created if it is not given.
+        :type payloads: :class:`PayloadPool`
+        :param ttl: Seconds to expire the keys written in. Default is 0
+            which means no expiry.
+        :type ttl: int
+        """
+
+        if connection_pool is not None:
+            self.rc = TracingRedisCluster(connection_pool=connection_pool)
+        else:
+            self.rc = TracingRedisCluster(startup_nodes=[{"host": host, "port": port}],
+                                          password=password,
+                                          decode_responses=True)
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.payloads = payloads if payloads is not None else PayloadPool(size=1024)
+        self.ttl = ttl
+
+        self._pipe = None
+        self._pipe_event_name: str = None
+        self._pipe_commands: List[PipelineCommand] = list()
+        self._pipe_node_counts: Dict[str, int] = dict()
+
+    @contextmanager
+    def batch(self, event_name: str) -> Iterator["RedisClient"]:
+        """
+        Queue the commands issued in the context into cluster pipelines. It
+        has no effect if pipelining is disabled.
+
+        :param event_name: The name of the event reported for the batches.
+        :type event_name: str
+        """
+
+        if self.pipeline_depth <= 1 or self._pipe is not None:
+            yield self
+            return
+
+        self._pipe = self.rc.pipeline()
+        self._pipe_event_name = event_name
+        try:
+            yield self
+            self.flush()
+        finally:
+            self._pipe = None
+            self._pipe_event_name = None
+            self._pipe_commands = list()
+            self._pipe_node_counts = dict()
+
+    def flush(self) -> List[Any]:
+        """
+        Execute the commands queued in the current pipeline. One batch event
+        of request type `PIPELINE` is reported, followed by one event per
+        command with the batch response time amortized over the commands.
+
+        :return: The results of the queued commands.
+        :rtype: List[Any]
+        """
+
+        if self._pipe is None or not self._pipe_commands:
+            return []
+
+        commands = self._pipe_commands
+        self._pipe_commands = list()
+        self._pipe_node_counts = dict()
+
+        event_name = self._pipe_event_name
+        results: List[Any] = None
+
+        start_time = time.perf_counter_ns()
+        try:
+            results = self._pipe.execute(raise_on_error=False)
+        except Exception as e:
+            if isinstance(e.__context__, GreenletExit):
+                raise e.__context__
+            response_time = time.perf_counter_ns() - start_time
+            report_request(request_type="PIPELINE",
+                           name=event_name,
+                           response_time=response_time,
+                           exception=e)
+            for command in commands:
+                report_request(request_type=command.request_type,
+                               name=event_name,
+                               response_time=response_time // len(commands),
+                               exception=e,
+                               trace=command.trace)
+            return [e] * len(commands)
+
+        response_time = time.perf_counter_ns() - start_time
+        report_request(request_type="PIPELINE",
+                       name=event_name,
+                       response_time=response_time,
+                       response_length=len(commands))
+        slots = self.rc.connection_pool.nodes.slots
+        for command, result in zip(commands, results):
+            # The pipeline updates the slot table when a command is moved
+            trace = command.trace
+            nodes = slots.get(trace.slot)
+            if nodes and nodes[0]["name"] != trace.node:
+                trace.node = nodes[0]["name"]
+                trace.moved += 1
+            if isinstance(result, Exception):
+                report_request(request_type=command.request_type,
+                               name=event_name,
+                               response_time=response_time // len(commands),
+                               exception=result,
+                               trace=command.trace)
+            else:
+                report_request(request_type=command.request_type,
+                               name=event_name,
+                               response_time=response_time // len(commands),
+                               response_length=command.response_length(result),
+                               trace=command.trace)
+
+        return results
+
+    def _queue(self,
+               request_type: str,
+               key_name: str,
+               command: str,
+               *args,
+               response_length: Callable[[Any], int] = length_of_string,
+               **kwargs) -> None:
+        """
+        Queue a command in the current pipeline and flush the pipeline once
+        the node owning *key_name* has enough commands.
+        """
+
+        trace = self._trace(key_name)
+        getattr(self._pipe, command)(*args, **kwargs)
+        self._pipe_commands.append(PipelineCommand(
+            request_type=request_type,
+            response_length=response_length,
+            trace=trace))
+
+        node_name = trace.node
+        self._pipe_node_counts[node_name] = \
+            self._pipe_node_counts.get(node_name, 0) + 1
+        if self._pipe_node_counts[node_name] >= self.pipeline_depth:
+            self.flush()
+
+    def _trace(self, key_name: str) -> RequestTrace:
+        """
+        Start the trace of a command on *key_name* with the node owning its
+        slot in the slot table.
+        """
+
+        slot = get_key_slot(key_name)
+        nodes = self.rc.connection_pool.nodes.slots.get(slot)
+
+        return RequestTrace(slot=slot, node=nodes[0]["name"] if nodes else None)
+
+    def _execute(self,
+                 request_type: str,
+                 event_name: str,
+                 key_name: str,
+                 command: str,
+                 *args,
+                 response_length: Callable[[Any], int] = length_of_string,
+                 **kwargs) -> Any:
+        """
+        Execute a command and report the result to locust. The command is
+        queued instead if a pipeline batch is in progress, and None is
+        returned.
+
+        :param request_type: The request type reported to locust.
+        :type request_type: str
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key the command works on.
+        :type key_name: str
+        :param command: The method name of the command in the redis client.
+        :type command: str
+        :param response_length: Function to compute the response length
+            from the result of the command.
+        :type response_length: Callable[[Any], int]
+
+        :return: The result of the command.
+        :rtype: Any
+        """
+
+        if self._pipe is not None:
+            self._queue(request_type, key_name, command, *args,
+                        response_length=response_length, **kwargs)
+            return None
+
+        result: Any = None
+        trace = self.rc.trace = self._trace(key_name)
+
+        start_time = time.perf_counter_ns()
+        try:
+            result = getattr(self.rc, command)(*args, **kwargs)
+        except Exception as e:
+            # rediscluster masks the GreenletExit raised while waiting for a
+            # free connection in the pool, so that the user can't be stopped
+            if isinstance(e.__context__, GreenletExit):
+                raise e.__context__
+            report_request(request_type=request_type,
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           exception=e,
+                           trace=trace)
+        else:
+            report_request(request_type=request_type,
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           response_length=response_length(result),
+                           trace=trace)
+        finally:
+            self.rc.trace = None
+
+        return result
+
+    def command(self, event_name: str, key_name: str, *args) -> Any:
+        """
+        Execute a command given as its arguments, such as `GET key`.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key the command works on.
+        :type key_name: str
+
+        :return: The result of the command.
+        :rtype: Any
+        """
+
+        return self._execute(args[0], event_name, key_name,
+                             "execute_command", *args)
+
+    def transaction(self,
+                    event_name: str,
+                    key_name: str,
+                    commands: List[tuple]) -> List[Any]:
+        """
+        Execute commands on a key in a MULTI/EXEC transaction, reported to
+        locust as one `MULTI` request. Transactions are not pipelined.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key the commands work on.
+        :type key_name: str
+        :param commands: The commands, each as a tuple of arguments.
+        :type commands: List[tuple]
+
+        :return: The results of the commands.
+        :rtype: List[Any]
+        """
+
+        pool = self.rc.connection_pool
+        trace = self._trace(key_name)
+        connection = None
+        result: List[Any] = None
+
+        start_time = time.perf_counter_ns()
+        try:
+            connection = pool.get_connection_by_node(
+                pool.get_master_node_by_slot(trace.slot))
+            trace.node = f"{connection.host}:{connection.port}"
+            connection.send_packed_command(connection.pack_commands(
+                [("MULTI",), *commands, ("EXEC",)]))
+            for _ in range(len(commands) + 1):
+                connection.read_response()
+            result = connection.read_response()
+        except Exception as e:
+            if connection is not None:
+                connection.disconnect()
+            report_request(request_type="MULTI",
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           exception=e,
+                           trace=trace)
+        except BaseException:
+            # Don't leave the replies unread on the connection
+            if connection is not None:
+                connection.disconnect()
+            raise
+        else:
+            report_request(request_type="MULTI",
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           response_length=length_of_string(result),
+                           trace=trace)
+        finally:
+            if connection is not None:
+                pool.release(connection)
+
+        return result
+
+    def _expire(self, event_name: str, key_name: str) -> None:
+        """
+        Expire a key written in the TTL of the client, if it has one.
+        """
+
+        if self.ttl:
+            self._execute("EXPIRE", event_name, key_name,
+                          "expire", name=key_name, time=self.ttl)
+
+    def set_string(self, event_name: str, key_name: str) -> str:
+        """
+        Set a string value to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key.
+        :tye key_name: str
+
+        :return: The value of the string set.
+        :rtype: str
+        """
+
+        value = self.payloads.text()
+
+        return self._execute("SET", event_name, key_name,
+                             "set", name=key_name, value=value, ex=self.ttl or None)
+
+    def get_string(self, event_name: str, key_name: str) -> str:
+        """
+        Get a string value from the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key.
+        :tye key_name: str
+
+        :return: The value of the string obtained.
+        :rtype: str
+        """
+
+        return self._execute("GET", event_name, key_name,
+                             "get", name=key_name)
+
+    def push_list_elements(self, event_name: str, key_name: str) -> int:
+        """
+        Push a list of elements to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the list.
+        :type key_name: str
+
+        :return: The number of elements pushed to the list.
+        :rtype: int
+        """
+
+        # Create a list of random length with random elements.
+        elements = [self.payloads.text(5, 10)] * self.payloads.number(1, 5)
+
+        result = self._execute("LPUSH", event_name, key_name,
+                               "lpush", key_name, *elements,
+                               response_length=lambda r: r.bit_length())
+        self._expire(event_name, key_name)
+
+        return -1 if result is None else result
+
+    def add_set_members(self, event_name: str, key_name: str) -> int:
+        """
+        Add a set of members to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name:str
+        :param key_name: The name of the set.
+        :type key_name: str
+
+        :return: The number of members added to the set.
+        :rtype: int
+        """
+
+        # Create a set of random length with random members.
+        size = self.payloads.number(1, 5)
+        members = set()
+        for _ in range(size):
+            members.add(self.payloads.text(5, 10))
+
+        result = self._execute("SADD", event_name, key_name,
+                               "sadd", key_name, *members)
+        self._expire(event_name, key_name)
+
+        return -1 if result is None else result
+
+    def set_hash_elements(self, event_name: str, key_name: str) -> int:
+        """
+        Set a hash of elements to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the hash.
+        :type key_name: str
+
+        :return: The number of elements set to the hash.
+        :rtype: int
+        """
+
+        elements = dict()
+        for i in range(4):
+            elements[str(i)] = self.payloads.text(5, 10)
+
+        result = self._execute("HSET", event_name, key_name,
+                               "hset", name=key_name, mapping=elements)
+        self._expire(event_name, key_name)
+
+        return -1 if result is None else result
+
+    def get_hash_element(self, event_name: str, key_name: str) -> Any | None:
+        """
+        Get an element of a hash from the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the hash.
+        :type key_name: str
+
+        :return: The value of the element.
+        :rtype: Any | None
+        """
+
+        return self._execute("HGET", event_name, key_name,
+                             "hget", name=key_name, key=self.payloads.number(0, 3))
+
+    def del_hash_element(self, event_name: str, key_name: str) -> int:
+        """
+        Delete an element of a hash from the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the hash.
+        :type key_name: str
+
+        :return: The number of elements deleted from the hash.
+        :rtype: int
+        """
+
+        result = self._execute("HDEL", event_name, key_name,
+                               "hdel", key_name, self.payloads.number(0, 3))
+
+        return -1 if result is None else result
+
+    def add_sorted_set_member(self, event_name: str, key_name: str) -> int:
+        """
+        Add elements to a sorted set.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the sorted set.
+        :type key_name: str
+
+        :return: The number of members added to the sorted set.
+        :rtype: int
+        """
+
+        member = self.payloads.text(5)
+        score = self.payloads.number(1, 100)
+
+        result = self._execute("ZADD", event_name, key_name,
+                               "zadd", name=key_name,
+                               mapping={member: score}, nx=False,
+                               response_length=lambda r: r)
+        self._expire(event_name, key_name)
+
+        return -1 if result is None else result
+
+    def get_sorted_set_range(
+            self,
+            event_name: str,
+            key_name: str,
+            start: int = 0,
+            end: int = -1) -> list:
+        """
+        Get a range of members from a sorted set.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the sorted set.
+        :type key_name: str
+        :param start: The start index of the sorted set. Default is 0.
+        :type start: int
+        :param end: The end index of the sorted set. Default is -1.
+        :type end: int
+
+        :return: The members of the sorted set.
+        :rtype: list
+        """
+
+        return self._execute("ZRANGE", event_name, key_name,
+                             "zrange", name=key_name, start=start, end=end)
+
+
+def encode_command(*args) -> bytes:
+    """
+    Encode a command in the redis serialization protocol.
+
+    :return: The encoded command.
+    :rtype: bytes
+    """
+
+    output = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        arg = arg if isinstance(arg, bytes) else str(arg).encode()
+        output.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+
+    return b"".join(output)
+
+
+class AsyncRedisConnection(object):
+    """
+    A connection to a redis node using asyncio. Commands are written as
+    soon as they are executed and the replies are read in order by a
+    background task, so that many commands can be in flight on one
+    connection at the same time.
+    """
+
+    def __init__(self, host: str, port: int, password: str = None) -> None:
+        """
+        Initialize the connection.
+
+        :param host: The host of the redis node.
+        :type host: str
+        :param port: The port of the redis node.
+        :type port: int
+        :param password: The password of the redis node.
+        :type password: str
+        """
+
+        self.host = host
+        self.port = port
+        self.password = password
+
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+        self._pending: Deque[asyncio.Future] = deque()
+        self._read_task: asyncio.Task = None
+
+    async def connect(self) -> None:
+        """
+        Open the connection and authenticate if a password is given.
+        """
+
+        self._reader, self._writer = await asyncio.open_connection(
+            host=self.host, port=self.port)
+        self._read_task = asyncio.get_running_loop().create_task(
+            self._read_replies())
+        if self.password:
+            reply = await self.execute("AUTH", self.password)
+            if isinstance(reply, Exception):
+                raise reply
+
+    def close(self) -> None:
+        """
+        Close the connection. Commands in flight fail with
+        :class:`ConnectionError`.
+        """
+
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+        self._fail_pending(ConnectionError(
+            f"Connection to {self.host}:{self.port} is closed"))
+
+    def execute_many(self, *commands: tuple) -> List[asyncio.Future]:
+        """
+        Write *commands* back to back and return the futures of their
+        replies. Error replies are set as results, not raised.
+
+        :return: Futures of the replies in the same order as *commands*.
+        :rtype: List[:class:`asyncio.Future`]
+        """
+
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError(
+                f"Connection to {self.host}:{self.port} is closed")
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        self._writer.write(b"".join(encode_command(*c) for c in commands))
+        self._pending.extend(futures)
+
+        return futures
+
+    async def execute(self, *args) -> Any:
+        """
+        Execute a command and wait for the reply. Error replies are returned
+        as :class:`ResponseError`.
+
+        :return: The reply of the command.
+        :rtype: Any
+        """
+
+        return await self.execute_many(args)[0]
+
+    async def _read_replies(self) -> None:
+        try:
+            while True:
+                reply = await self._read_reply()
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(reply)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            self._fail_pending(ConnectionError(
+                f"Connection to {self.host}:{self.port} is lost: {e}"))
+            self._writer.close()
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readuntil(b"\r\n")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            return ResponseError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode(errors="replace")
+        if prefix == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+
+        raise ConnectionError(f"Unknown reply from {self.host}:{self.port}")
+
+    def _fail_pending(self, exception: Exception) -> None:
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(exception)
+
+
+class AsyncRedisClusterClient(object):
+    """
+    A minimal redis cluster client using asyncio. Each node is served by a
+    small number of connections shared by all the commands, and MOVED/ASK
+    redirections are followed.
+    """
+
+    MAX_REDIRECTIONS = 5
+
+    def __init__(self,
+                 startup_nodes: List[dict],
+                 password: str = None,
+                 connections_per_node: int = 2) -> None:
+        """
+        Initialize the cluster client.
+
+        :param startup_nodes: Nodes to discover the cluster from. Each node is
+            a dict with `host` and `port`.
+        :type startup_nodes: List[dict]
+        :param password: The password of the redis cluster.
+        :type password: str
+        :param connections_per_node: Number of connections to each node.
+            Default is 2.
+        :type connections_per_node: int
+        """
+
+        self.startup_nodes = startup_nodes
+        self.password = password
+        self.connections_per_node = max(1, connections_per_node)
+
+        self._slots: List[str] = [None] * REDIS_CLUSTER_HASH_SLOTS
+        self._connections: Dict[str, List[AsyncRedisConnection]] = dict()
+        self._next_connection: Dict[str, int] = dict()
+        self._connecting: Dict[str, asyncio.Task] = dict()
+        self._initializing: asyncio.Task = None
+
+    async def initialize(self) -> None:
+        """
+        Load the slot table of the cluster from the first reachable startup
+        node.
+        """
+
+        if self._initializing is None:
+            self._initializing = asyncio.get_running_loop().create_task(
+                self._load_slots())
+        initializing = self._initializing
+        try:
+            await initializing
+        finally:
+            if self._initializing is initializing:
+                self._initializing = None
+
+    async def _load_slots(self) -> None:
+        error: Exception = None
+        for node in self.startup_nodes:
+            connection = AsyncRedisConnection(
+                host=node["host"], port=node["port"], password=self.password)
+            try:
+                await connection.connect()
+                slots = await connection.execute("CLUSTER", "SLOTS")
+            except (ConnectionError, OSError, ResponseError) as e:
+                error = e
+                continue
+            finally:
+                connection.close()
+            if isinstance(slots, Exception):
+                error = slots
+                continue
+
+            for slot_range in slots:
+                host, port = slot_range[2][0], slot_range[2][1]
+                name = f"{host or node['host']}:{port}"
+                for slot in range(slot_range[0], slot_range[1] + 1):
+                    self._slots[slot] = name
+            return
+
+        raise ConnectionError(
+            f"Unable to load the slots of redis cluster: {error}")
+
+    async def _get_connection(self, node_name: str) -> AsyncRedisConnection:
+        if node_name not in self._connections:
+            if node_name not in self._connecting:
+                self._connecting[node_name] = asyncio.get_running_loop().create_task(
+                    self._connect_node(node_name))
+            try:
+                await self._connecting[node_name]
+            finally:
+                self._connecting.pop(node_name, None)
+
+        connections = self._connections[node_name]
+        i = self._next_connection[node_name]
+        self._next_connection[node_name] = (i + 1) % len(connections)
+
+        return connections[i]
+
+    async def _connect_node(self, node_name: str) -> None:
+        host, port = node_name.rsplit(":", 1)
+        connections = [AsyncRedisConnection(host=host,
+                                            port=int(port),
+                                            password=self.password)
+                       for _ in range(self.connections_per_node)]
+        await asyncio.gather(*[c.connect() for c in connections])
+        self._connections[node_name] = connections
+        self._next_connection[node_name] = 0
+
+    def _drop_node(self, node_name: str) -> None:
+        for connection in self._connections.pop(node_name, []):
+            connection.close()
+
+    async def _send(self, node_name: str, args: tuple, asking: bool) -> Any:
+        # Send a command to a node, after ASKING if it is redirected by ASK.
+        # A node which can't be reached is dropped
+        try:
+            connection = await self._get_connection(node_name)
+            if asking:
+                reply = await connection.execute_many(("ASKING",), args)[1]
+            else:
+                reply = await connection.execute(*args)
+        except OSError as e:
+            self._drop_node(node_name)
+            raise ConnectionError(
+                f"Unable to connect to {node_name}: {e}") from e
+        if isinstance(reply, ConnectionError):
+            self._drop_node(node_name)
+            raise reply
+
+        return reply
+
+    async def execute(self,
+                      key_name: str,
+                      *args,
+                      trace: RequestTrace = None) -> Any:
+        """
+        Execute a command on the node owning *key_name*.
+
+        :param key_name: The name of the key the command works on.
+        :type key_name: str
+        :param trace: The trace to fill in with the slot, the node that
+            served the command and the redirections.
+        :type trace: :class:`RequestTrace`
+
+        :return: The reply of the command.
+        :rtype: Any
+
+        :raises: :class:`ResponseError` if redis replies an error.
+        """
+
+        slot = get_key_slot(key_name)
+        if self._slots[slot] is None:
+            await self.initialize()
+        node_name = self._slots[slot]
+        asking = False
+        if trace is None:
+            trace = RequestTrace()
+        trace.slot = slot
+
+        for _ in range(self.MAX_REDIRECTIONS):
+            trace.node = node_name
+            reply = await self._send(node_name, args, asking=asking)
+            if not isinstance(reply, ResponseError):
+                return reply
+
+            # Follow the redirection, e.g. "MOVED 3999 127.0.0.1:6381"
+            redirection = str(reply).split(" ")
+            if redirection[0] == "MOVED":
+                node_name = redirection[2]
+                self._slots[int(redirection[1])] = node_name
+                asking = False
+                trace.moved += 1
+            elif redirection[0] == "ASK":
+                node_name = redirection[2]
+                asking = True
+                trace.asked += 1
+            else:
+                raise reply
+
+        raise ResponseError(
+            f"Too many redirections for slot {slot}: {reply}")
+
+    def close(self) -> None:
+        """
+        Close all the connections.
+        """
+
+        for node_name in list(self._connections.keys()):
+            self._drop_node(node_name)
+
+
+_async_loop: asyncio.AbstractEventLoop = None
+
+
+def get_async_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the asyncio event loop shared by this process. The loop is created
+    and started in a greenlet on first call. Since locust monkey patches the
+    selectors with gevent, the loop yields to the other greenlets while it
+    waits for I/O.
+
+    :return: The event loop.
+    :rtype: :class:`asyncio.AbstractEventLoop`
+    """
+
+    global _async_loop
+    if _async_loop is None:
+        _async_loop = asyncio.SelectorEventLoop(selectors.DefaultSelector())
+        gevent.spawn(_async_loop.run_forever)
+
+    return _async_loop
+
+
+def run_coroutine(coro: Coroutine) -> Any:
+    """
+    Run *coro* in the shared event loop and block the current greenlet until
+    it is done.
+
+    :param coro: The coroutine to run.
+    :type coro: Coroutine
+
+    :return: The result of *coro*.
+    :rtype: Any
+    """
+
+    loop = get_async_loop()
+    done = gevent.event.Event()
+    task: asyncio.Task = None
+
+    def schedule() -> None:
+        nonlocal task
+        task = loop.create_task(coro)
+        task.add_done_callback(lambda _: done.set())
+
+    loop.call_soon_threadsafe(schedule)
+    try:
+        done.wait()
+    except GreenletExit:
+        # The user is stopped, so stop the coroutine as well
+        loop.call_soon_threadsafe(lambda: task.cancel())
+        raise
+
+    return task.result()
+
+
+intended_start_time: ContextVar[int] = ContextVar("intended_start_time",
+                                                  default=None)
+"""
+The time in nanoseconds, from :func:`time.perf_counter_ns`, that the
+command being executed by :class:`AsyncRedisClient` should have been sent
+at. The response time is measured from it if it is set, so that a delayed
+send is counted in the latency.
+"""
+
+
+class ArrivalSchedule(object):
+    """
+    The intended send times of an open-loop load at a target arrival rate.
+    The `constant` profile sends at fixed intervals, the `poisson` profile
+    at exponentially distributed intervals, and the `step` profile at fixed
+    intervals with the rate raised to the target in *steps* equal steps of
+    *step_duration* seconds.
+    """
+
+    PROFILES = ("constant", "poisson", "step")
+
+    def __init__(self,
+                 rate: float,
+                 profile: str = "constant",
+                 steps: int = 5,
+                 step_duration: float = 60.0) -> None:
+        """
+        Initialize the schedule.
+
+        :param rate: The target number of arrivals per second.
+        :type rate: float
+        :param profile: `constant`, `poisson` or `step`. Default is
+            `constant`.
+        :type profile: str
+        :param steps: Number of steps of the `step` profile. Default is 5.
+        :type steps: int
+        :param step_duration: Seconds of each step of the `step` profile.
+            Default is 60.
+        :type step_duration: float
+        """
+
+        if rate <= 0:
+            raise ValueError("Arrival rate must be positive")
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown arrival profile {profile}")
+
+        self.rate = rate
+        self.profile = profile
+        self.steps = max(1, steps)
+        self.step_duration = step_duration
+        self._random = random.Random()
+
+    def rate_at(self, elapsed: float) -> float:
+        """
+        Get the arrival rate at a time.
+
+        :param elapsed: Seconds since the start of the schedule.
+        :type elapsed: float
+
+        :return: The number of arrivals per second.
+        :rtype: float
+        """
+
+        if self.profile != "step":
+            return self.rate
+
+        step = min(self.steps, int(elapsed // self.step_duration) + 1)
+        return self.rate * step / self.steps
+
+    def next_arrival(self, elapsed: float) -> float:
+        """
+        Get the time of the arrival following the one at *elapsed*.
+
+        :param elapsed: Seconds since the start of the schedule of the
+            current arrival.
+        :type elapsed: float
+
+        :return: Seconds since the start of the schedule of the next
+            arrival.
+        :rtype: float
+        """
+
+        rate = self.rate_at(elapsed)
+        if self.profile == "poisson":
+            return elapsed + self._random.expovariate(rate)
+
+        return elapsed + 1 / rate
+
+
+class AsyncRedisClient(object):
+    """
+    A redis client to perform load test on redis cluster using asyncio. All
+    the clients in a process share one :class:`AsyncRedisClusterClient`.
+    """
+
+    def __init__(self,
+                 cluster: AsyncRedisClusterClient,
+                 payloads: PayloadPool = None,
+                 ttl: int = 0) -> None:
+        """
+        Initialize the redis client.
+
+        :param cluster: The cluster client to send the commands with.
+        :type cluster: :class:`AsyncRedisClusterClient`
+        :param payloads: The pool to draw the values from. A small pool is
+            created if it is not given.
+        :type payloads: :class:`PayloadPool`
+        :param ttl: Seconds to expire the keys written in. Default is 0
+            which means no expiry.
+        :type ttl: int
+        """
+
+        self.cluster = cluster
+        self.payloads = payloads if payloads is not None else PayloadPool(size=1024)
+        self.ttl = ttl
+
+    async def _execute(self,
+                       request_type: str,
+                       event_name: str,
+                       key_name: str,
+                       *args,
+                       response_length: Callable[[Any], int] = length_of_string) -> Any:
+        """
+        Execute a command and report the result to locust.
+
+        :param request_type: The request type reported to locust.
+        :type request_type: str
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key the command works on.
+        :type key_name: str
+        :param response_length: Function to compute the response length
+            from the result of the command.
+        :type response_length: Callable[[Any], int]
+
+        :return: The result of the command.
+        :rtype: Any
+        """
+
+        result: Any = None
+        trace = RequestTrace()
+
+        start_time = intended_start_time.get() or time.perf_counter_ns()
+        try:
+            result = await self.cluster.execute(key_name, request_type, *args,
+                                                trace=trace)
+        except Exception as e:
+            report_request(request_type=request_type,
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           exception=e,
+                           trace=trace)
+        else:
+            report_request(request_type=request_type,
+                           name=event_name,
+                           response_time=time.perf_counter_ns() - start_time,
+                           response_length=response_length(result),
+                           trace=trace)
+
+        return result
+
+    async def command(self, event_name: str, key_name: str, *args) -> Any:
+        """
+        Execute a command given as its arguments, such as `GET key`.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key the command works on.
+        :type key_name: str
+
+        :return: The result of the command.
+        :rtype: Any
+        """
+
+        return await self._execute(args[0], event_name, key_name, *args[1:])
+
+    async def _expire(self, event_name: str, key_name: str) -> None:
+        """
+        Expire a key written in the TTL of the client, if it has one.
+        """
+
+        if self.ttl:
+            await self._execute("EXPIRE", event_name, key_name,
+                                key_name, self.ttl)
+
+    async def set_string(self, event_name: str, key_name: str) -> str:
+        """
+        Set a string value to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key.
+        :type key_name: str
+
+        :return: The value of the string set.
+        :rtype: str
+        """
+
+        if self.ttl:
+            return await self._execute("SET", event_name, key_name,
+                                       key_name, self.payloads.text(), "EX", self.ttl)
+
+        return await self._execute("SET", event_name, key_name,
+                                   key_name, self.payloads.text())
+
+    async def get_string(self, event_name: str, key_name: str) -> str:
+        """
+        Get a string value from the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key.
+        :type key_name: str
+
+        :return: The value of the string obtained.
+        :rtype: str
+        """
+
+        return await self._execute("GET", event_name, key_name, key_name)
+
+    async def push_list_elements(self, event_name: str, key_name: str) -> int:
+        """
+        Push a list of elements to the redis server.
+
+        :param event_name: The name of the event.
+        :type event_name: str
+        :param key_name: The name of the key.
+        :type key_name: str
+
+        :return: The number of elements pushed to the list.
+        :rtype: int
+        """
+
+        elements = [self.payloads.text(5, 10)] * self.payloads.number(1, 5)
+
+        result = await self._execute("LPUSH", event_name, key_name,
+                                     key_name, *elements,
+                                     response_length=lambda r: r.bit_length())
+        await self._expire(event_name, key_name)
 
         return result
 
-    def add_set_members(self, event_name: str, key_name: str) -> int:
+    async def add_set_members(self, event_name: str, key_name: str) -> int:
         """
         Add a set of members to the redis server.
 
         :param event_name: The name of the event.
-        :type event_name:str
-        :param key_name: The name of the set.
+        :type event_name: str
+        :param key_name: The name of the key.
         :type key_name: str
 
         :return: The number of members added to the set.
         :rtype: int
         """
 
-        request_type = "SADD"
-        result: int = -1
-        # Create a set of random length with random members.
-        size = random.randint(1, 5)
         members = set()
-        for _ in range(size):
-            members.add(random_LDP(
-                length=random.randint(5, 10),
-            ))
+        for _ in range(self.payloads.number(1, 5)):
+            members.add(self.payloads.text(5, 10))
 
-        start_time = time.time()
-        try:
-            result = self.rc.sadd(key_name, *members)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        result = await self._execute("SADD", event_name, key_name,
+                                     key_name, *members)
+        await self._expire(event_name, key_name)
 
         return result
 
-    def set_hash_elements(self, event_name: str, key_name: str) -> int:
+    async def set_hash_elements(self, event_name: str, key_name: str) -> int:
         """
         Set a hash of elements to the redis server.
 
         :param event_name: The name of the event.
         :type event_name: str
-        :param key_name: The name of the hash.
+        :param key_name: The name of the key.
         :type key_name: str
 
         :return: The number of elements set to the hash.
         :rtype: int
         """
 
-        request_type = "HSET"
-        result: int = -1
-        elements = dict()
+        elements = list()
         for i in range(4):
-            elements[str(i)] = random_LDP(length=random.randint(5, 10))
+            elements.extend([i, self.payloads.text(5, 10)])
 
-        start_time = time.time()
-        try:
-            result = self.rc.hset(name=key_name, mapping=elements)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        result = await self._execute("HSET", event_name, key_name,
+                                     key_name, *elements)
+        await self._expire(event_name, key_name)
 
         return result
 
-    def get_hash_element(self, event_name: str, key_name: str) -> Any | None:
+    async def get_hash_element(self, event_name: str, key_name: str) -> Any | None:
         """
         Get an element of a hash from the redis server.
 
         :param event_name: The name of the event.
         :type event_name: str
-        :param key_name: The name of the hash.
+        :param key_name: The name of the key.
         :type key_name: str
 
         :return: The value of the element.
         :rtype: Any | None
         """
 
-        request_type = "HGET"
-        result: Any | None = None
-
-        start_time = time.time()
-        try:
-            result = self.rc.hget(name=key_name, key=random.randint(0, 3))
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
-
-        return result
+        return await self._execute("HGET", event_name, key_name,
+                                   key_name, self.payloads.number(0, 3))
 
-    def del_hash_element(self, event_name: str, key_name: str) -> int:
+    async def del_hash_element(self, event_name: str, key_name: str) -> int:
         """
         Delete an element of a hash from the redis server.
 
         :param event_name: The name of the event.
         :type event_name: str
-        :param key_name: The name of the hash.
+        :param key_name: The name of the key.
         :type key_name: str
 
         :return: The number of elements deleted from the hash.
         :rtype: int
         """
 
-        request_type = "HDEL"
-        result: int = -1
-
-        start_time = time.time()
-        try:
-            result = self.rc.hdel(key_name, random.randint(0, 3))
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
-
-        return result
+        return await self._execute("HDEL", event_name, key_name,
+                                   key_name, self.payloads.number(0, 3))
 
-    def add_sorted_set_member(self, event_name: str, key_name: str) -> int:
+    async def add_sorted_set_member(self, event_name: str, key_name: str) -> int:
         """
         Add elements to a sorted set.
 
         :param event_name: The name of the event.
         :type event_name: str
-        :param key_name: The name of the sorted set.
+        :param key_name: The name of the key.
         :type key_name: str
 
         :return: The number of members added to the sorted set.
         :rtype: int
         """
 
-        request_type = "ZADD"
-        result: int = -1
-        member = random_LDP(length=5)
-        score = random.randint(1, 100)
-
-        start_time = time.time()
-        try:
-            result = self.rc.zadd(
-                name=key_name,
-                mapping={member: score}, nx=False
-            )
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
-        else:
-            length = result
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+        result = await self._execute("ZADD", event_name, key_name,
+                                     key_name, self.payloads.number(1, 100), self.payloads.text(5),
+                                     response_length=lambda r: r)
+        await self._expire(event_name, key_name)
 
         return result
 
-    def get_sorted_set_range(
+    async def get_sorted_set_range(
             self,
             event_name: str,
             key_name: str,
@@ -443,7 +2421,7 @@ class RedisClient(object):
 
         :param event_name: The name of the event.
         :type event_name: str
-        :param key_name: The name of the sorted set.
+        :param key_name: The name of the key.
         :type key_name: str
         :param start: The start index of the sorted set. Default is 0.
         :type start: int
@@ -454,38 +2432,863 @@ class RedisClient(object):
         :rtype: list
         """
 
-        request_type = "ZRANGE"
-        result: list = None
+        return await self._execute("ZRANGE", event_name, key_name,
+                                   key_name, start, end)
 
-        start_time = time.time()
-        try:
-            result = self.rc.zrange(name=key_name, start=start, end=end)
-        except Exception as e:
-            events.request_failure.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                exception=e
-            )
+
+config = configuration.AxolpyConfigManager.get_context(name="redis")
+
+logger = logging.get_logger(name=Path(__file__).name)
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--startup-nodes",
+                        env_var="LOCUST_STARTUP_NODES",
+                        default=config.get("load-test", "startup.nodes", fallback=""),
+                        help="Comma separated host:port of the nodes to discover the cluster from, "
+                        "such as the nodes of redis-cluster-stand-in.py, instead of the masters in the configuration.")
+    parser.add_argument("--pipeline-depth",
+                        type=int,
+                        env_var="LOCUST_PIPELINE_DEPTH",
+                        default=config.getint("load-test", "pipeline.depth",
+                                              fallback=1),
+                        help="Number of commands to pipeline per slot-owning node in each batch. "
+                        "1 disables pipelining.")
+    parser.add_argument("--async-concurrency",
+                        type=int,
+                        env_var="LOCUST_ASYNC_CONCURRENCY",
+                        default=config.getint("load-test", "async.concurrency",
+                                              fallback=100),
+                        help="Number of commands in flight in each task of RedisUserAsync.")
+    parser.add_argument("--async-connections-per-node",
+                        type=int,
+                        env_var="LOCUST_ASYNC_CONNECTIONS_PER_NODE",
+                        default=config.getint("load-test", "async.connections.per.node",
+                                              fallback=2),
+                        help="Number of connections to each node shared by all RedisUserAsync in a process.")
+    parser.add_argument("--max-connections-per-node",
+                        type=int,
+                        env_var="LOCUST_MAX_CONNECTIONS_PER_NODE",
+                        default=config.getint("load-test", "pool.max.connections.per.node",
+                                              fallback=16),
+                        help="Maximum number of connections to each node shared by all "
+                        "RedisUserStaticKey and RedisUserRandomKey in a process.")
+    parser.add_argument("--latency-report",
+                        env_var="LOCUST_LATENCY_REPORT",
+                        default=None,
+                        help="Path of a JSON file to write the latency percentiles and histograms "
+                        "in microseconds to when the test ends.")
+    parser.add_argument("--results-db",
+                        env_var="LOCUST_RESULTS_DB",
+                        default=config.get("load-test", "results.db", fallback=""),
+                        help="Path of a SQLite database to store the results of the run in, to compare runs "
+                        "with redis-load-test-results.py.")
+    parser.add_argument("--run-label",
+                        env_var="LOCUST_RUN_LABEL",
+                        default=config.get("load-test", "run.label", fallback=""),
+                        help="Label of the run in the results database, such as the redis version or the "
+                        "configuration change under test.")
+    parser.add_argument("--workload",
+                        env_var="LOCUST_WORKLOAD",
+                        default=config.get("load-test", "workload.profile", fallback=""),
+                        help="Name of the workload profile of RedisUserWorkload and RedisUserOpenLoop "
+                        "in --workload-file.")
+    parser.add_argument("--workload-file",
+                        env_var="LOCUST_WORKLOAD_FILE",
+                        default=config.get("load-test", "workload.file",
+                                           fallback="redis-workload.yaml"),
+                        help="YAML file of workload profiles, relative to the configuration directory.")
+    parser.add_argument("--arrival-rate",
+                        type=float,
+                        env_var="LOCUST_ARRIVAL_RATE",
+                        default=config.getfloat("load-test", "arrival.rate",
+                                                fallback=100),
+                        help="Number of commands sent per second by each RedisUserOpenLoop.")
+    parser.add_argument("--arrival-profile",
+                        choices=ArrivalSchedule.PROFILES,
+                        env_var="LOCUST_ARRIVAL_PROFILE",
+                        default=config.get("load-test", "arrival.profile",
+                                           fallback="constant"),
+                        help="Intervals between the commands sent by RedisUserOpenLoop. "
+                        "step raises the rate to --arrival-rate in --arrival-steps steps.")
+    parser.add_argument("--arrival-steps",
+                        type=int,
+                        env_var="LOCUST_ARRIVAL_STEPS",
+                        default=config.getint("load-test", "arrival.steps",
+                                              fallback=5),
+                        help="Number of steps of the step arrival profile.")
+    parser.add_argument("--arrival-step-duration",
+                        type=float,
+                        env_var="LOCUST_ARRIVAL_STEP_DURATION",
+                        default=config.getfloat("load-test", "arrival.step.duration",
+                                                fallback=60),
+                        help="Seconds of each step of the step arrival profile.")
+    parser.add_argument("--arrival-max-in-flight",
+                        type=int,
+                        env_var="LOCUST_ARRIVAL_MAX_IN_FLIGHT",
+                        default=config.getint("load-test", "arrival.max.in.flight",
+                                              fallback=10000),
+                        help="Maximum number of commands in flight of each RedisUserOpenLoop. "
+                        "Arrivals beyond it are dropped and counted apart from the latencies.")
+    parser.add_argument("--key-prefix",
+                        env_var="LOCUST_KEY_PREFIX",
+                        default=config.get("load-test", "key.prefix", fallback="lt"),
+                        help="Prefix of the keys of RedisUserRandomKey, RedisUserAsync, RedisUserOpenLoop "
+                        "and RedisUserWorkload, by which they are cleaned up.")
+    parser.add_argument("--key-ttl",
+                        type=int,
+                        env_var="LOCUST_KEY_TTL",
+                        default=config.getint("load-test", "key.ttl", fallback=0),
+                        help="Seconds to expire the keys written by RedisUserRandomKey, RedisUserAsync, "
+                        "RedisUserOpenLoop and RedisUserWorkload in. 0 means no expiry.")
+    parser.add_argument("--preload",
+                        env_var="LOCUST_PRELOAD",
+                        default=config.get("load-test", "preload", fallback=""),
+                        help="Comma separated data types, of string, counter, list, set, hash and "
+                        "sorted_set, to populate the key space with before the test.")
+    parser.add_argument("--cleanup",
+                        choices=["none", "before", "after", "both"],
+                        env_var="LOCUST_CLEANUP",
+                        default=config.get("load-test", "cleanup", fallback="none"),
+                        help="Unlink the keys of the load test before or after the test, or both.")
+    parser.add_argument("--key-space-size",
+                        type=int,
+                        env_var="LOCUST_KEY_SPACE_SIZE",
+                        default=config.getint("load-test", "key.space.size",
+                                              fallback=0),
+                        help="Number of distinct keys of RedisUserRandomKey, RedisUserAsync and RedisUserOpenLoop. "
+                        "0 makes every key a new random string.")
+    parser.add_argument("--key-distribution",
+                        choices=["uniform", "zipf"],
+                        env_var="LOCUST_KEY_DISTRIBUTION",
+                        default=config.get("load-test", "key.distribution",
+                                           fallback="uniform"),
+                        help="Distribution of the keys drawn from the key space.")
+    parser.add_argument("--key-zipf-exponent",
+                        type=float,
+                        env_var="LOCUST_KEY_ZIPF_EXPONENT",
+                        default=config.getfloat("load-test", "key.zipf.exponent",
+                                                fallback=0.99),
+                        help="Exponent of the Zipfian key distribution. The larger, the hotter the hot keys.")
+    parser.add_argument("--key-slots",
+                        env_var="LOCUST_KEY_SLOTS",
+                        default=config.get("load-test", "key.slots", fallback=""),
+                        help="Comma separated hash slots or ranges of hash slots, such as 0-99,5000, "
+                        "to put the keys into.")
+    parser.add_argument("--key-masters",
+                        env_var="LOCUST_KEY_MASTERS",
+                        default=config.get("load-test", "key.masters", fallback=""),
+                        help="Comma separated numbers of the masters in the configuration, or of the startup nodes, "
+                        "such as 1,3, to put the keys into.")
+    parser.add_argument("--key-hash-tags",
+                        type=int,
+                        env_var="LOCUST_KEY_HASH_TAGS",
+                        default=config.getint("load-test", "key.hash.tags",
+                                              fallback=0),
+                        help="Number of hash tagged groups of keys. The keys of a group are in the same slot.")
+    parser.add_argument("--payload-pool-size",
+                        type=int,
+                        env_var="LOCUST_PAYLOAD_POOL_SIZE",
+                        default=config.getint("load-test", "payload.pool.size",
+                                              fallback=65536),
+                        help="Number of random payloads generated in each process before the test.")
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    # Send the latencies recorded since the last report, so that the master
+    # can merge the reports of all the workers
+    data["latency_histograms"] = latencies.serialize(reset=True)
+    data["node_stats"] = node_stats.serialize(reset=True)
+    data["cpu_usage"] = cpu_usage.sample()
+    data["dropped"] = dropped.serialize(reset=True)
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    latencies.merge(data.get("latency_histograms", []))
+    node_stats.merge(data.get("node_stats", {}))
+    if "cpu_usage" in data:
+        cpu_usage.record(client_id, data["cpu_usage"])
+    dropped.merge(data.get("dropped", {}))
+
+
+@events.quitting.add_listener
+def _(environment, **_kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    rows = latencies.summary()
+    logger.info("Latency percentiles (microseconds)")
+    logger.info(f"{'Type':<8} {'Name':<40} {'# reqs':>10} {'50%':>10} {'99%':>10} {'99.9%':>10} {'100%':>10}")
+    for row in rows:
+        logger.info(f"{row['type']:<8} {row['name']:<40} {row['count']:>10} {row['p50']:>10} "
+                    f"{row['p99']:>10} {row['p99.9']:>10} {row['max']:>10}")
+    for name, count in sorted(dropped.counts.items()):
+        logger.warning(f"{count} arrivals of {name} are dropped as too many commands are in flight, "
+                       "and are not in the latencies")
+
+    report_path = getattr(environment.parsed_options, "latency_report", None)
+    if report_path:
+        Path(report_path).write_text(json.dumps({
+            "percentiles": rows,
+            "histograms": latencies.serialize(),
+            "dropped": dropped.serialize()}))
+        logger.info(f"Latency report is written to {report_path}")
+
+    write_node_stats(environment)
+    log_cpu_usage(environment)
+    store_results(environment)
+
+
+def log_cpu_usage(environment) -> None:
+    """
+    Log the CPU usage of each process of the load test, and warn if any of
+    them is saturated, in which case the load generator rather than the
+    cluster limits the throughput.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    """
+
+    rows = cpu_usage.summary()
+    if not rows:
+        return
+
+    logger.info("CPU usage per process (percent of one core)")
+    logger.info(f"{'Process':<48} {'Samples':>8} {'Mean':>7} {'Max':>7} {'Saturated':>10}")
+    saturated = list()
+    for row in rows:
+        process = row["process"]
+        if isinstance(environment.runner, MasterRunner) and process != "master":
+            process = f"worker {environment.runner.get_worker_index(process)} ({process})"
+        logger.info(f"{process:<48} {row['samples']:>8} {row['mean']:>7.1f} {row['max']:>7.1f} "
+                    f"{row['saturated']:>10.0%}")
+        if row["saturated"] >= 0.5:
+            saturated.append(process)
+    if saturated:
+        logger.warning(f"{', '.join(saturated)} used at least {CpuUsageRecorder.SATURATION_THRESHOLD}% CPU "
+                       "most of the time, so the load generator may limit the throughput. "
+                       "Run more workers with --workers.")
+
+
+def write_node_stats(environment) -> None:
+    """
+    Log the requests per node, and write them to `<prefix>_nodes.csv` and
+    `<prefix>_nodes.json`, with the requests per hash slot in the latter,
+    if locust writes its stats to CSV files with `--csv <prefix>`.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    """
+
+    total = environment.stats.total
+    duration = (total.last_request_timestamp or total.start_time) - total.start_time
+    rows = node_stats.summary(duration=duration)
+
+    logger.info("Requests per node (latencies in microseconds)")
+    logger.info(f"{'Node':<22} {'Type':<10} {'# reqs':>10} {'# fails':>8} {'MOVED':>7} {'ASK':>7} "
+                f"{'req/s':>10} {'50%':>8} {'99%':>8} {'99.9%':>8} {'100%':>8}")
+    for row in rows:
+        logger.info(f"{row['node']:<22} {row['type']:<10} {row['count']:>10} {row['failures']:>8} "
+                    f"{row['moved']:>7} {row['asked']:>7} {row['rps']:>10} {row['p50']:>8} "
+                    f"{row['p99']:>8} {row['p99.9']:>8} {row['max']:>8}")
+
+    csv_prefix = getattr(environment.parsed_options, "csv_prefix", None)
+    if not csv_prefix:
+        return
+
+    with open(f"{csv_prefix}_nodes.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["node"])
+        writer.writeheader()
+        writer.writerows(rows)
+    Path(f"{csv_prefix}_nodes.json").write_text(json.dumps({
+        "duration": duration,
+        "nodes": rows,
+        "slots": sorted(node_stats.slots.items())}))
+    logger.info(f"Requests per node are written to {csv_prefix}_nodes.csv and {csv_prefix}_nodes.json")
+
+
+RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT,
+    started_at TEXT,
+    duration REAL,
+    user_classes TEXT,
+    options TEXT,
+    workload TEXT,
+    topology TEXT
+);
+CREATE TABLE IF NOT EXISTS requests (
+    run_id INTEGER REFERENCES runs (id),
+    type TEXT,
+    name TEXT,
+    count INTEGER,
+    failures INTEGER,
+    histogram TEXT,
+    throughput TEXT
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    run_id INTEGER REFERENCES runs (id),
+    node TEXT,
+    type TEXT,
+    count INTEGER,
+    failures INTEGER,
+    moved INTEGER,
+    asked INTEGER,
+    histogram TEXT
+);
+CREATE TABLE IF NOT EXISTS dropped (
+    run_id INTEGER REFERENCES runs (id),
+    name TEXT,
+    count INTEGER
+);
+"""
+
+
+def histogram_to_json(histogram: LatencyHistogram) -> str:
+    """
+    Serialize a histogram into JSON with the highest value of each bucket
+    instead of its index, so that it can be read without
+    :class:`LatencyHistogram`.
+
+    :param histogram: The histogram.
+    :type histogram: :class:`LatencyHistogram`
+
+    :return: The JSON of the max and the sorted `[highest value, count]`
+        of the buckets in microseconds.
+    :rtype: str
+    """
+
+    return json.dumps({
+        "max": histogram.max,
+        "buckets": [[min(LatencyHistogram.highest_value_of(bucket), histogram.max), count]
+                    for bucket, count in sorted(histogram.counts.items())]})
+
+
+def get_topology(environment) -> dict:
+    """
+    Get the masters of the cluster with the number of hash slots they serve
+    and their redis version.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The slot count and version by master, as `host:port`.
+    :rtype: dict
+    """
+
+    startup_nodes, password = get_startup_nodes(environment)
+    node_manager = NodeManager(startup_nodes=startup_nodes, password=password)
+    node_manager.initialize()
+    topology = dict()
+    for nodes in node_manager.slots.values():
+        master = topology.setdefault(nodes[0]["name"], {"slots": 0, "replicas": len(nodes) - 1})
+        master["slots"] += 1
+    for name, master in topology.items():
+        host, _, port = name.rpartition(":")
+        r = Redis(host=host, port=int(port), password=password, socket_timeout=5)
+        master["version"] = r.info("server").get("redis_version")
+        r.close()
+
+    return topology
+
+
+def store_results(environment) -> None:
+    """
+    Store the results of the run in the SQLite database of `--results-db`,
+    with the options, the workload profile, the topology of the cluster and
+    the latency histograms, so that runs can be compared by
+    `redis-load-test-results.py`.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    """
+
+    path = get_option(environment, "results_db", "results.db", "", type=str)
+    if not path:
+        return
+
+    total = environment.stats.total
+    duration = (total.last_request_timestamp or total.start_time) - total.start_time
+    options = {name: value for name, value in vars(environment.parsed_options).items()
+               if isinstance(value, (str, int, float, bool, list, type(None)))}
+    workload = get_workload(environment)
+    try:
+        topology = get_topology(environment)
+    except (RedisError, RedisClusterException, OSError) as e:
+        logger.warning(f"Topology of the cluster is not stored: {e}")
+        topology = None
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript(RESULTS_SCHEMA)
+        run_id = connection.execute(
+            "INSERT INTO runs (label, started_at, duration, user_classes, options, workload, topology) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (get_option(environment, "run_label", "run.label", "", type=str),
+             datetime.fromtimestamp(total.start_time).isoformat(timespec="seconds"),
+             duration,
+             ",".join(sorted(cls.__name__ for cls in environment.user_classes)),
+             json.dumps(options),
+             json.dumps({"name": workload.name, "profile": workload.profile}),
+             json.dumps(topology))).lastrowid
+
+        aggregated = LatencyHistogram()
+        rows = list()
+        for (request_type, name), histogram in sorted(latencies.histograms.items()):
+            aggregated.merge(histogram)
+            entry = environment.stats.entries.get((name, request_type))
+            rows.append((run_id, request_type, name, histogram.total,
+                         entry.num_failures if entry else 0,
+                         histogram_to_json(histogram),
+                         json.dumps(sorted(entry.num_reqs_per_sec.items())) if entry else "[]"))
+        rows.append((run_id, "", "Aggregated", aggregated.total, total.num_failures,
+                     histogram_to_json(aggregated), json.dumps(sorted(total.num_reqs_per_sec.items()))))
+        connection.executemany("INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany(
+            "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, node, request_type, *entry[:4], histogram_to_json(entry[4]))
+             for (node, request_type), entry in sorted(node_stats.entries.items())])
+        connection.executemany("INSERT INTO dropped VALUES (?, ?, ?)",
+                               [(run_id, name, count) for name, count in sorted(dropped.counts.items())])
+    connection.close()
+    logger.info(f"Results are stored in {path} as run {run_id}")
+
+
+def get_option(environment,
+               name: str,
+               option: str,
+               fallback: Any,
+               type: Callable = int) -> Any:
+    """
+    Get an option from the command line, or from the `load-test` section of
+    the configuration if locust is not started from the command line.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    :param name: The name of the command line option.
+    :type name: str
+    :param option: The name of the option in the configuration.
+    :type option: str
+    :param fallback: The value if the option is not configured.
+    :type fallback: Any
+    :param type: The type of the option, `int`, `float` or `str`.
+        Default is `int`.
+    :type type: Callable
+
+    :return: The value of the option.
+    :rtype: Any
+    """
+
+    getter = {int: config.getint, float: config.getfloat}.get(type, config.get)
+    return getattr(environment.parsed_options, name,
+                   getter("load-test", option, fallback=fallback))
+
+
+def get_startup_nodes(environment) -> Tuple[List[dict], str]:
+    """
+    Get the startup nodes given by `--startup-nodes` or `startup.nodes`,
+    such as the nodes of `redis-cluster-stand-in.py`, with the password
+    `startup.nodes.auth`, or else all the masters in the configuration,
+    and the password of the cluster.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The startup nodes and the password.
+    :rtype: Tuple[List[dict], str]
+    """
+
+    nodes = get_option(environment, "startup_nodes", "startup.nodes", "", type=str)
+    if nodes:
+        startup_nodes = list()
+        for node in nodes.split(","):
+            host, _, port = node.strip().rpartition(":")
+            startup_nodes.append({"host": host, "port": int(port)})
+        return startup_nodes, config.get("load-test", "startup.nodes.auth", fallback=None)
+
+    cluster_nodes = config["cluster-nodes"]
+    startup_nodes = list()
+    password: str = None
+    master_no = 1
+    while f"master.{master_no}.ip" in cluster_nodes:
+        startup_nodes.append({
+            "host": cluster_nodes[f"master.{master_no}.ip"],
+            "port": cluster_nodes.getint(f"master.{master_no}.port")})
+        password = password or cluster_nodes.get(f"master.{master_no}.auth")
+        master_no += 1
+
+    return startup_nodes, password
+
+
+_connection_pool: ClusterBlockingConnectionPool = None
+
+
+def get_connection_pool(environment) -> ClusterBlockingConnectionPool:
+    """
+    Get the connection pool shared by all the :class:`RedisClient` in this
+    process. The slot table is discovered once, when the first user is
+    spawned, and is refreshed by the clients after redirections. The number
+    of connections to each node is bounded and the users wait for a free
+    connection when all of them are in use.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The connection pool.
+    :rtype: :class:`ClusterBlockingConnectionPool`
+    """
+
+    global _connection_pool
+    if _connection_pool is None:
+        startup_nodes, password = get_startup_nodes(environment)
+        _connection_pool = ClusterBlockingConnectionPool(
+            startup_nodes=startup_nodes,
+            max_connections=get_option(environment,
+                                       "max_connections_per_node",
+                                       "pool.max.connections.per.node",
+                                       16),
+            max_connections_per_node=True,
+            timeout=config.getint("load-test", "pool.timeout", fallback=20),
+            password=password,
+            decode_responses=True)
+
+    return _connection_pool
+
+
+_workload: WorkloadProfile = None
+
+
+def get_workload(environment) -> WorkloadProfile:
+    """
+    Get the :class:`WorkloadProfile` selected by `--workload` or
+    `workload.profile`, loaded when the first user is spawned, or the
+    default profile if none is selected. The keys expire in `--key-ttl` if
+    the profile has no TTL.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The workload.
+    :rtype: :class:`WorkloadProfile`
+    """
+
+    global _workload
+    if _workload is None:
+        name = get_option(environment, "workload", "workload.profile", "", type=str)
+        if name:
+            path = configuration.AxolpyConfigManager.get_config_path() / get_option(
+                environment, "workload_file", "workload.file", "redis-workload.yaml", type=str)
+            _workload = WorkloadProfile.load(path=path, name=name)
+            logger.info(f"Workload {name} is loaded from {path}")
         else:
-            length = len(str(result))
-            events.request_success.fire(
-                request_type=request_type,
-                name=event_name,
-                response_time=get_response_time_in_ms(
-                    start_time=start_time,
-                    end_time=time.time()
-                ),
-                response_length=length
-            )
+            _workload = WorkloadProfile(name="default", profile=WorkloadProfile.DEFAULT)
+        if _workload.ttl is None:
+            _workload.ttl = get_option(environment, "key_ttl", "key.ttl", 0)
 
-        return result
+    return _workload
 
 
-config = configuration.AxolpyConfigManager.get_context(name="redis")
+def is_workload_selected(environment) -> bool:
+    """
+    Check if a workload profile is selected by `--workload` or
+    `workload.profile`.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: True if a profile is selected.
+    :rtype: bool
+    """
+
+    return bool(get_option(environment, "workload", "workload.profile", "", type=str))
+
+
+_payload_pool: PayloadPool = None
+
+
+def get_payload_pool(environment) -> PayloadPool:
+    """
+    Get the :class:`PayloadPool` shared by this process. It is generated
+    when the first user is spawned.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The payload pool.
+    :rtype: :class:`PayloadPool`
+    """
+
+    global _payload_pool
+    if _payload_pool is None:
+        workload = get_workload(environment)
+        _payload_pool = PayloadPool(
+            size=get_option(environment,
+                            "payload_pool_size",
+                            "payload.pool.size",
+                            65536),
+            min_length=config.getint("load-test", "payload.value.length.min",
+                                     fallback=10),
+            max_length=config.getint("load-test", "payload.value.length.max",
+                                     fallback=10),
+            max_slice_length=max(64, workload.max_value_size))
+
+    return _payload_pool
+
+
+def get_master_slots(environment, masters: List[int]) -> List[int]:
+    """
+    Get the hash slots served by the masters, numbered as the startup nodes
+    from 1. The slot table is discovered from the cluster.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    :param masters: The numbers of the masters.
+    :type masters: List[int]
+
+    :return: The hash slots.
+    :rtype: List[int]
+    """
+
+    startup_nodes, password = get_startup_nodes(environment)
+    names = set()
+    for master_no in masters:
+        if not 1 <= master_no <= len(startup_nodes):
+            raise ValueError(f"master.{master_no} is not configured")
+        node = startup_nodes[master_no - 1]
+        names.add(f"{node['host']}:{node['port']}")
+
+    node_manager = NodeManager(startup_nodes=startup_nodes, password=password)
+    node_manager.initialize()
+    slots = [slot for slot, nodes in sorted(node_manager.slots.items())
+             if nodes[0]["name"] in names]
+    if not slots:
+        raise ValueError(f"No hash slot is served by {', '.join(sorted(names))}")
+
+    return slots
+
+
+_key_generator: KeyGenerator = None
+
+
+def get_key_generator(environment) -> KeyGenerator:
+    """
+    Get the :class:`KeyGenerator` shared by this process. It is created
+    when the first user is spawned.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The key generator.
+    :rtype: :class:`KeyGenerator`
+    """
+
+    global _key_generator
+    if _key_generator is None:
+        slots = parse_slots(get_option(environment, "key_slots", "key.slots",
+                                       "", type=str))
+        masters = get_option(environment, "key_masters", "key.masters",
+                             "", type=str)
+        if masters:
+            master_slots = set(get_master_slots(
+                environment,
+                [int(m) for m in masters.split(",") if m.strip()]))
+            slots = [slot for slot in slots if slot in master_slots] \
+                if slots else sorted(master_slots)
+            if not slots:
+                raise ValueError("None of the key slots is served by the key masters")
+
+        workload = get_workload(environment)
+        key_space = get_option(environment, "key_space_size", "key.space.size", 0)
+        if workload.key_space is not None:
+            key_space = workload.key_space
+
+        _key_generator = KeyGenerator(
+            payloads=get_payload_pool(environment),
+            key_space=key_space,
+            slots=slots,
+            hash_tags=get_option(environment, "key_hash_tags",
+                                 "key.hash.tags", 0),
+            distribution=get_option(environment, "key_distribution",
+                                    "key.distribution", "uniform", type=str),
+            zipf_exponent=get_option(environment, "key_zipf_exponent",
+                                     "key.zipf.exponent", 0.99, type=float),
+            prefix=get_option(environment, "key_prefix", "key.prefix", "lt", type=str))
+        logger.info(f"Keys are put into {len(slots) or REDIS_CLUSTER_HASH_SLOTS} hash slot(s)")
+
+    return _key_generator
+
+
+_async_cluster: AsyncRedisClusterClient = None
+
+
+def get_async_cluster(environment) -> AsyncRedisClusterClient:
+    """
+    Get the :class:`AsyncRedisClusterClient` shared by this process. All the
+    masters in the configuration are used as the startup nodes.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The cluster client.
+    :rtype: :class:`AsyncRedisClusterClient`
+    """
+
+    global _async_cluster
+    if _async_cluster is None:
+        startup_nodes, password = get_startup_nodes(environment)
+        _async_cluster = AsyncRedisClusterClient(
+            startup_nodes=startup_nodes,
+            password=password,
+            connections_per_node=get_option(environment,
+                                            "async_connections_per_node",
+                                            "async.connections.per.node",
+                                            2))
+
+    return _async_cluster
+
+
+def preload_keys(environment, namespaces: List[str]) -> int:
+    """
+    Populate every key of the key space in each of the namespaces with
+    pipelined writes, so that the reads of the test don't hit missing keys.
+    The keys are written as the workload writes them, with its TTL.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+    :param namespaces: The namespaces, such as `string` and `hash`.
+    :type namespaces: List[str]
+
+    :return: The number of keys written.
+    :rtype: int
+    """
+
+    keys = get_key_generator(environment)
+    if keys.key_space <= 0:
+        raise ValueError("Preload requires a key space")
+    unknown = set(namespaces) - set(WorkloadProfile.POPULATE_OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown namespaces {', '.join(sorted(unknown))} to preload")
+
+    payloads = get_payload_pool(environment)
+    workload = get_workload(environment)
+    rc = RedisCluster(connection_pool=get_connection_pool(environment))
+    batch_size = config.getint("load-test", "preload.batch.size", fallback=1000)
+
+    def preload(start: int) -> int:
+        pipe = rc.pipeline()
+        for index in range(start, min(start + batch_size, keys.key_space)):
+            for namespace in namespaces:
+                operation = WorkloadProfile.POPULATE_OPERATIONS[namespace]
+                for args in workload.commands(operation, keys.key_of(index, namespace), payloads):
+                    pipe.execute_command(*args)
+        pipe.execute()
+
+        return min(batch_size, keys.key_space - start) * len(namespaces)
+
+    start_time = time.perf_counter()
+    pool = gevent.pool.Pool(config.getint("load-test", "preload.concurrency", fallback=8))
+    count = sum(pool.imap_unordered(preload, range(0, keys.key_space, batch_size)))
+    logger.info(f"Preloaded {count} keys in {time.perf_counter() - start_time:.1f}s")
+
+    return count
+
+
+def cleanup_keys(environment) -> int:
+    """
+    Unlink the keys of the load test, which start with the key prefix, and
+    the static keys. Each master is scanned in parallel.
+
+    :param environment: The locust environment.
+    :type environment: :class:`locust.env.Environment`
+
+    :return: The number of keys unlinked.
+    :rtype: int
+    """
+
+    prefix = get_option(environment, "key_prefix", "key.prefix", "lt", type=str)
+    patterns = [f"{prefix}:*", "*_lt_static"]
+    batch_size = config.getint("load-test", "preload.batch.size", fallback=1000)
+
+    startup_nodes, password = get_startup_nodes(environment)
+    node_manager = NodeManager(startup_nodes=startup_nodes, password=password)
+    node_manager.initialize()
+    masters = {nodes[0]["name"]: nodes[0] for nodes in node_manager.slots.values()}
+
+    def cleanup(node: dict) -> int:
+        r = Redis(host=node["host"], port=node["port"], password=password)
+        count = 0
+        for pattern in patterns:
+            cursor = None
+            while cursor != 0:
+                cursor, keys = r.scan(cursor=cursor or 0, match=pattern, count=batch_size)
+                if keys:
+                    # The keys are in different slots, so unlink them one by one.
+                    # A key whose slot is being migrated is redirected, and is
+                    # left for the next cleanup rather than failing this one
+                    pipe = r.pipeline(transaction=False)
+                    for key in keys:
+                        pipe.unlink(key)
+                    count += sum(result for result in pipe.execute(raise_on_error=False)
+                                 if isinstance(result, int))
+        r.close()
+
+        return count
+
+    start_time = time.perf_counter()
+    greenlets = [gevent.spawn(cleanup, node) for node in masters.values()]
+    gevent.joinall(greenlets, raise_error=True)
+    count = sum(g.value for g in greenlets)
+    logger.info(f"Unlinked {count} keys from {len(masters)} master(s) in "
+                f"{time.perf_counter() - start_time:.1f}s")
+
+    return count
+
+
+@events.test_start.add_listener
+def _(environment, **_kwargs):
+    # Prepare the cluster once, before the users are spawned
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    if get_option(environment, "cleanup", "cleanup", "none", type=str) in ("before", "both"):
+        cleanup_keys(environment)
+    namespaces = get_option(environment, "preload", "preload", "", type=str)
+    if namespaces:
+        preload_keys(environment, [n.strip() for n in namespaces.split(",") if n.strip()])
+
+
+_cpu_sampler: gevent.Greenlet = None
+
+
+@events.test_start.add_listener
+def _(environment, **_kwargs):
+    # The workers send their CPU usage with their reports, and the master or
+    # the local process samples its own
+    global _cpu_sampler
+    if isinstance(environment.runner, WorkerRunner) or _cpu_sampler is not None:
+        return
+
+    process = "master" if isinstance(environment.runner, MasterRunner) else "local"
+
+    def sample() -> None:
+        while True:
+            gevent.sleep(CPU_MONITOR_INTERVAL)
+            cpu_usage.record(process, cpu_usage.sample())
+
+    _cpu_sampler = gevent.spawn(sample)
+
+
+@events.test_stop.add_listener
+def _(environment, **_kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    if get_option(environment, "cleanup", "cleanup", "none", type=str) in ("after", "both"):
+        cleanup_keys(environment)
 
 
 class RedisUserStaticKey(User):
@@ -495,111 +3298,445 @@ class RedisUserStaticKey(User):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        rc_args = {"host": config["cluster-nodes"]["master.1.ip"],
-                   "port": config["cluster-nodes"]["master.1.port"]}
-        if "master.1.auth" in config["cluster-nodes"]:
-            rc_args["password"] = config["cluster-nodes"]["master.1.auth"]
-        self._client = RedisClient(rc_args)
+        self._payloads = get_payload_pool(environment=self.environment)
+        self._client = RedisClient(
+            connection_pool=get_connection_pool(environment=self.environment),
+            pipeline_depth=get_option(self.environment,
+                                      "pipeline_depth",
+                                      "pipeline.depth",
+                                      1),
+            payloads=self._payloads)
 
     @task
     @tag("string")
     def string(self):
         name = "string_lt_static"
-        self._client.set_string(event_name=name, key_name=name)
-        self._client.get_string(event_name=name, key_name=name)
+        with self._client.batch(event_name=name):
+            for _ in range(self._client.pipeline_depth):
+                self._client.set_string(event_name=name, key_name=name)
+                self._client.get_string(event_name=name, key_name=name)
 
     @task
     @tag("list")
     def list(self):
         name = "list_lt_static"
-        self._client.push_list_elements(event_name=name, key_name=name)
+        with self._client.batch(event_name=name):
+            for _ in range(self._client.pipeline_depth):
+                self._client.push_list_elements(event_name=name, key_name=name)
 
     @task
     @tag("set")
     def set(self):
         name = "set_lt_static"
-        self._client.add_set_members(event_name=name, key_name=name)
+        with self._client.batch(event_name=name):
+            for _ in range(self._client.pipeline_depth):
+                self._client.add_set_members(event_name=name, key_name=name)
 
     @task
     @tag("hash")
     def hash(self):
         name = "hash_lt_static"
-        self._client.set_hash_elements(event_name=name, key_name=name)
-        self._client.get_hash_element(event_name=name, key_name=name)
-        self._client.del_hash_element(event_name=name, key_name=name)
+        with self._client.batch(event_name=name):
+            for _ in range(self._client.pipeline_depth):
+                self._client.set_hash_elements(event_name=name, key_name=name)
+                self._client.get_hash_element(event_name=name, key_name=name)
+                self._client.del_hash_element(event_name=name, key_name=name)
 
     @task
     @tag("sorted-set")
     def sorted_set(self):
         name = "sorted_set_lt_static"
-        self._client.add_sorted_set_member(event_name=name, key_name=name)
-        self._client.get_sorted_set_range(
-            event_name=name,
-            key_name=name,
-            end=100
-        )
+        with self._client.batch(event_name=name):
+            for _ in range(self._client.pipeline_depth):
+                self._client.add_sorted_set_member(
+                    event_name=name, key_name=name)
+                self._client.get_sorted_set_range(
+                    event_name=name,
+                    key_name=name,
+                    end=100
+                )
 
 
 class RedisUserRandomKey(User):
     """
-    A user that uses random keys.
+    A user that uses random keys from the :class:`KeyGenerator`.
     """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        rc_args = {"host": config["cluster-nodes"]["master.2.ip"],
-                   "port": config["cluster-nodes"]["master.2.port"]}
-        if "master.2.auth" in config["cluster-nodes"]:
-            rc_args["password"] = config["cluster-nodes"]["master.2.auth"]
-        self._client = RedisClient(rc_args)
+        self._payloads = get_payload_pool(environment=self.environment)
+        self._keys = get_key_generator(environment=self.environment)
+        self._client = RedisClient(
+            connection_pool=get_connection_pool(environment=self.environment),
+            pipeline_depth=get_option(self.environment,
+                                      "pipeline_depth",
+                                      "pipeline.depth",
+                                      1),
+            payloads=self._payloads,
+            ttl=get_option(self.environment, "key_ttl", "key.ttl", 0))
 
     @task
     @tag("string")
     def string(self):
         event_name = "string_lt_dynamic"
-        key_name = random_LDP()
-        self._client.set_string(event_name=event_name, key_name=key_name)
-        self._client.get_string(event_name=event_name, key_name=key_name)
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                key_name = self._keys.key("string")
+                self._client.set_string(
+                    event_name=event_name, key_name=key_name)
+                self._client.get_string(
+                    event_name=event_name, key_name=key_name)
 
     @task
     @tag("list")
     def list(self):
         event_name = "list_lt_dynamic"
-        key_name = random_LDP()
-        self._client.push_list_elements(
-            event_name=event_name,
-            key_name=key_name
-        )
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                key_name = self._keys.key("list")
+                self._client.push_list_elements(
+                    event_name=event_name,
+                    key_name=key_name
+                )
 
     @task
     @tag("set")
     def set(self):
         event_name = "set_lt_dynamic"
-        key_name = random_LDP()
-        self._client.add_set_members(event_name=event_name, key_name=key_name)
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                key_name = self._keys.key("set")
+                self._client.add_set_members(
+                    event_name=event_name, key_name=key_name)
 
     @task
     @tag("hash")
     def hash(self):
         event_name = "hash_lt_dynamic"
-        key_name = random_LDP()
-        self._client.set_hash_elements(
-            event_name=event_name,
-            key_name=key_name
-        )
-        self._client.get_hash_element(event_name=event_name, key_name=key_name)
-        self._client.del_hash_element(event_name=event_name, key_name=key_name)
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                key_name = self._keys.key("hash")
+                self._client.set_hash_elements(
+                    event_name=event_name,
+                    key_name=key_name
+                )
+                self._client.get_hash_element(
+                    event_name=event_name, key_name=key_name)
+                self._client.del_hash_element(
+                    event_name=event_name, key_name=key_name)
 
     @task
     @tag("sorted-set")
     def sorted_set(self):
         event_name = "sorted_set_lt_dynamic"
-        key_name = random_LDP()
-        self._client.add_sorted_set_member(
-            event_name=event_name,
-            key_name=key_name
-        )
-        self._client.get_sorted_set_range(
-            event_name=event_name,
-            key_name=key_name
-        )
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                key_name = self._keys.key("sorted_set")
+                self._client.add_sorted_set_member(
+                    event_name=event_name,
+                    key_name=key_name
+                )
+                self._client.get_sorted_set_range(
+                    event_name=event_name,
+                    key_name=key_name
+                )
+
+
+class RedisUserAsync(User):
+    """
+    A user that uses random keys from the :class:`KeyGenerator` and keeps
+    many commands in flight through a shared asyncio cluster client.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._payloads = get_payload_pool(environment=self.environment)
+        self._keys = get_key_generator(environment=self.environment)
+        self._client = AsyncRedisClient(
+            cluster=get_async_cluster(environment=self.environment),
+            payloads=self._payloads,
+            ttl=get_option(self.environment, "key_ttl", "key.ttl", 0))
+        self._concurrency = max(1, get_option(self.environment,
+                                              "async_concurrency",
+                                              "async.concurrency",
+                                              100))
+
+    def _gather(self, coro_func: Callable[[], Coroutine]) -> List[Any]:
+        """
+        Run *coro_func* concurrently as many times as the concurrency.
+        """
+
+        async def gather() -> List[Any]:
+            return await asyncio.gather(
+                *[coro_func() for _ in range(self._concurrency)])
+
+        return run_coroutine(gather())
+
+    @task
+    @tag("string")
+    def string(self):
+        event_name = "string_lt_async"
+
+        async def string():
+            key_name = self._keys.key("string")
+            await self._client.set_string(
+                event_name=event_name, key_name=key_name)
+            await self._client.get_string(
+                event_name=event_name, key_name=key_name)
+
+        self._gather(string)
+
+    @task
+    @tag("list")
+    def list(self):
+        event_name = "list_lt_async"
+
+        async def list():
+            await self._client.push_list_elements(
+                event_name=event_name, key_name=self._keys.key("list"))
+
+        self._gather(list)
+
+    @task
+    @tag("set")
+    def set(self):
+        event_name = "set_lt_async"
+
+        async def set():
+            await self._client.add_set_members(
+                event_name=event_name, key_name=self._keys.key("set"))
+
+        self._gather(set)
+
+    @task
+    @tag("hash")
+    def hash(self):
+        event_name = "hash_lt_async"
+
+        async def hash():
+            key_name = self._keys.key("hash")
+            await self._client.set_hash_elements(
+                event_name=event_name, key_name=key_name)
+            await self._client.get_hash_element(
+                event_name=event_name, key_name=key_name)
+            await self._client.del_hash_element(
+                event_name=event_name, key_name=key_name)
+
+        self._gather(hash)
+
+    @task
+    @tag("sorted-set")
+    def sorted_set(self):
+        event_name = "sorted_set_lt_async"
+
+        async def sorted_set():
+            key_name = self._keys.key("sorted_set")
+            await self._client.add_sorted_set_member(
+                event_name=event_name, key_name=key_name)
+            await self._client.get_sorted_set_range(
+                event_name=event_name, key_name=key_name)
+
+        self._gather(sorted_set)
+
+
+class RedisUserOpenLoop(User):
+    """
+    A user that sends commands from the :class:`ArrivalSchedule` whatever
+    the response time, like real traffic which doesn't back off when redis
+    slows down. Each arrival sends one command chosen at random. The
+    response time is measured from the intended send time, so that the
+    queueing behind a slow command is not hidden.
+    """
+
+    # Seconds of arrivals sent in each run of the task
+    WINDOW = 1.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._payloads = get_payload_pool(environment=self.environment)
+        self._keys = get_key_generator(environment=self.environment)
+        self._client = AsyncRedisClient(
+            cluster=get_async_cluster(environment=self.environment),
+            payloads=self._payloads,
+            ttl=get_option(self.environment, "key_ttl", "key.ttl", 0))
+        self._schedule = ArrivalSchedule(
+            rate=get_option(self.environment, "arrival_rate",
+                            "arrival.rate", 100, type=float),
+            profile=get_option(self.environment, "arrival_profile",
+                               "arrival.profile", "constant", type=str),
+            steps=get_option(self.environment, "arrival_steps",
+                             "arrival.steps", 5),
+            step_duration=get_option(self.environment, "arrival_step_duration",
+                                     "arrival.step.duration", 60, type=float))
+        self._max_in_flight = get_option(self.environment,
+                                         "arrival_max_in_flight",
+                                         "arrival.max.in.flight",
+                                         10000)
+        self._operations = [
+            ("string_lt_open_loop", "string", self._client.set_string),
+            ("string_lt_open_loop", "string", self._client.get_string),
+            ("list_lt_open_loop", "list", self._client.push_list_elements),
+            ("set_lt_open_loop", "set", self._client.add_set_members),
+            ("hash_lt_open_loop", "hash", self._client.set_hash_elements),
+            ("hash_lt_open_loop", "hash", self._client.get_hash_element),
+            ("hash_lt_open_loop", "hash", self._client.del_hash_element),
+            ("sorted_set_lt_open_loop", "sorted_set", self._client.add_sorted_set_member),
+            ("sorted_set_lt_open_loop", "sorted_set", self._client.get_sorted_set_range),
+        ]
+        self._workload = get_workload(environment=self.environment) \
+            if is_workload_selected(environment=self.environment) else None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._start_time: int = None
+        self._next_arrival = 0.0
+
+    async def _send(self,
+                    event_name: str,
+                    namespace: str,
+                    operation: Callable,
+                    start_time: int) -> None:
+        intended_start_time.set(start_time)
+        if self._workload is None:
+            await operation(event_name=event_name, key_name=self._keys.key(namespace))
+            return
+
+        # Only the first command of an operation waits for the schedule
+        operation = self._workload.operation()
+        key_name = self._keys.key(WorkloadProfile.NAMESPACES[operation])
+        for args in self._workload.commands(operation, key_name, self._payloads):
+            await self._client.command(event_name, key_name, *args)
+            intended_start_time.set(None)
+
+    async def _arrive(self, window: float) -> None:
+        """
+        Send the commands of the arrivals in the next *window* seconds
+        without waiting for their responses. Arrivals that are already
+        late are sent at once.
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._start_time is None:
+            self._start_time = time.perf_counter_ns()
+        end = (time.perf_counter_ns() - self._start_time) / 1e9 + window
+
+        while self._next_arrival < end:
+            start_time = self._start_time + int(self._next_arrival * 1e9)
+            delay = start_time - time.perf_counter_ns()
+            if delay > 0:
+                await asyncio.sleep(delay / 1e9)
+
+            if self._workload is None:
+                event_name, namespace, operation = self._operations[
+                    self._payloads.number(0, len(self._operations) - 1)]
+            else:
+                event_name, namespace, operation = self._workload.name, None, None
+            if len(self._in_flight) < self._max_in_flight:
+                t = loop.create_task(self._send(event_name, namespace, operation, start_time))
+                self._in_flight.add(t)
+                t.add_done_callback(self._in_flight.discard)
+            else:
+                dropped.record(event_name)
+            self._next_arrival = self._schedule.next_arrival(self._next_arrival)
+
+    async def _cancel_in_flight(self) -> None:
+        tasks = list(self._in_flight)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def on_stop(self):
+        # The commands in flight would otherwise keep reporting to the
+        # shared loop after the user is stopped
+        if self._in_flight:
+            run_coroutine(self._cancel_in_flight())
+
+    @task
+    def arrive(self):
+        run_coroutine(self._arrive(self.WINDOW))
+
+
+class RedisUserWorkload(User):
+    """
+    A user that runs the operations of the :class:`WorkloadProfile`
+    selected by `--workload`, or of the default profile, on keys from the
+    :class:`KeyGenerator`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._workload = get_workload(environment=self.environment)
+        self._payloads = get_payload_pool(environment=self.environment)
+        self._keys = get_key_generator(environment=self.environment)
+        self._client = RedisClient(
+            connection_pool=get_connection_pool(environment=self.environment),
+            pipeline_depth=self._workload.pipeline_depth or get_option(self.environment,
+                                                                       "pipeline_depth",
+                                                                       "pipeline.depth",
+                                                                       1),
+            payloads=self._payloads)
+
+    @task
+    def workload(self):
+        event_name = self._workload.name
+        with self._client.batch(event_name=event_name):
+            for _ in range(self._client.pipeline_depth):
+                operation = self._workload.operation()
+                key_name = self._keys.key(WorkloadProfile.NAMESPACES[operation])
+                commands = self._workload.commands(operation, key_name, self._payloads)
+                if self._workload.transaction:
+                    self._client.transaction(event_name, key_name, commands)
+                else:
+                    for args in commands:
+                        self._client.command(event_name, key_name, *args)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        allow_abbrev=False,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent('''\
+            Run the load test with a locust master and workers on this machine, one
+            worker per CPU core by default, since a locust process uses one core only.
+            The users are split across the workers and their latency histograms, node
+            stats and CPU usage are merged by the master. The other arguments are
+            passed to the master, such as:
+
+              --headless -u 1000 -r 100 --run-time 5m RedisUserRandomKey
+            '''))
+    parser.add_argument("-w", "--workers",
+                        type=int,
+                        default=config.getint("load-test", "workers", fallback=0) or os.cpu_count(),
+                        help="Number of workers. Default is the number of CPU cores.")
+    parser.add_argument("--master-bind-port",
+                        type=int,
+                        default=config.getint("load-test", "master.bind.port", fallback=5557),
+                        help="Port of the master to listen to the workers on.")
+    args, locust_args = parser.parse_known_args()
+
+    locust_command = [sys.executable, "-m", "locust", "-f", str(Path(__file__).resolve())]
+    master = subprocess.Popen(locust_command + [
+        "--master",
+        "--master-bind-host", "127.0.0.1",
+        "--master-bind-port", str(args.master_bind_port),
+        "--expect-workers", str(args.workers)] + locust_args)
+    workers = [subprocess.Popen(locust_command + [
+        "--worker",
+        "--master-host", "127.0.0.1",
+        "--master-port", str(args.master_bind_port)]) for _ in range(args.workers)]
+
+    try:
+        returncode = master.wait()
+    except KeyboardInterrupt:
+        # The master, which got the interrupt too, stops the workers
+        returncode = master.wait()
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.terminate()
+
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
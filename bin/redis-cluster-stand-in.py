@@ -0,0 +1,1092 @@
+import argparse
+import asyncio
+import binascii
+import fnmatch
+import heapq
+import random
+import signal
+import sys
+import textwrap
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from axolpy import logging
+
+logging.load_config()
+logger = logging.get_logger(name=Path(__file__).name)
+
+REDIS_CLUSTER_HASH_SLOTS = 16384
+
+OK = "OK"
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+class RedisError(Exception):
+    """
+    An error replied to the client.
+    """
+
+
+class SortedSet(dict):
+    """
+    A sorted set as a mapping of members to scores.
+    """
+
+
+def get_key_slot(key: bytes) -> int:
+    """
+    Get the hash slot of a key in redis cluster. Only the hash tag of the
+    key, the part between the first `{` and the following `}`, is hashed
+    if it is not empty.
+
+    :param key: The name of the key.
+    :type key: bytes
+
+    :return: The hash slot of the key.
+    :rtype: int
+    """
+
+    start = key.find(b"{")
+    if start > -1:
+        end = key.find(b"}", start + 1)
+        if end > -1 and end != start + 1:
+            key = key[start + 1:end]
+
+    return binascii.crc_hqx(key, 0) % REDIS_CLUSTER_HASH_SLOTS
+
+
+def parse_commands(buffer: bytearray) -> Tuple[List[List[bytes]], int]:
+    """
+    Parse the complete commands in a buffer of the redis serialization
+    protocol. Inline commands are supported as well.
+
+    :param buffer: The data received.
+    :type buffer: bytearray
+
+    :return: The commands, each as a list of arguments, and the number of
+        bytes parsed.
+    :rtype: Tuple[List[List[bytes]], int]
+    """
+
+    commands = list()
+    pos = 0
+    n = len(buffer)
+    while pos < n:
+        end = buffer.find(b"\r\n", pos)
+        if end < 0:
+            break
+        if buffer[pos] != ord("*"):
+            args = bytes(buffer[pos:end]).split()
+            pos = end + 2
+            if args:
+                commands.append(args)
+            continue
+
+        count = int(buffer[pos + 1:end])
+        p = end + 2
+        args = list()
+        for _ in range(count):
+            end = buffer.find(b"\r\n", p)
+            if end < 0:
+                break
+            length = int(buffer[p + 1:end])
+            start = end + 2
+            if start + length + 2 > n:
+                break
+            args.append(bytes(buffer[start:start + length]))
+            p = start + length + 2
+        if len(args) < count:
+            break
+        commands.append(args)
+        pos = p
+
+    return commands, pos
+
+
+def encode_reply(reply: Any) -> bytes:
+    """
+    Encode a reply in the redis serialization protocol. A str is a simple
+    string and bytes is a bulk string.
+
+    :param reply: The reply.
+    :type reply: Any
+
+    :return: The encoded reply.
+    :rtype: bytes
+    """
+
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, bool):
+        return b":%d\r\n" % reply
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, RedisError):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, float):
+        return encode_reply(format_score(reply))
+
+    return b"*%d\r\n%s" % (len(reply), b"".join(encode_reply(r) for r in reply))
+
+
+def format_score(score: float) -> bytes:
+    return (b"%d" % score) if score.is_integer() else repr(score).encode()
+
+
+class Store(object):
+    """
+    The key space shared by all the nodes. The keys are kept per hash slot
+    so that a node can scan its own keys, and the keys with a TTL are
+    expired lazily on access and actively by :meth:`expire_keys`.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty store.
+        """
+
+        self.slots: List[Dict[bytes, Any]] = [dict() for _ in range(REDIS_CLUSTER_HASH_SLOTS)]
+        self.expires: Dict[bytes, float] = dict()
+        self._expiry_heap: List[Tuple[float, bytes]] = list()
+
+    def get(self, key: bytes, kind: type = None) -> Any:
+        """
+        Get the value of a key.
+
+        :param key: The name of the key.
+        :type key: bytes
+        :param kind: The type the value must be of.
+        :type kind: type
+
+        :return: The value, or None if the key doesn't exist.
+        :rtype: Any
+
+        :raises: :class:`RedisError` if the value is of another type.
+        """
+
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.delete(key)
+            return None
+
+        value = self.slots[get_key_slot(key)].get(key)
+        if value is not None and kind is not None and type(value) is not kind:
+            raise RedisError(WRONGTYPE)
+
+        return value
+
+    def get_or_create(self, key: bytes, kind: type) -> Any:
+        """
+        Get the value of a key, or create an empty value of *kind*.
+        """
+
+        value = self.get(key, kind)
+        if value is None:
+            value = kind()
+            self.slots[get_key_slot(key)][key] = value
+
+        return value
+
+    def set(self, key: bytes, value: Any, ttl: float = None) -> None:
+        """
+        Set the value of a key and clear its TTL, or set it to *ttl*
+        seconds.
+        """
+
+        self.slots[get_key_slot(key)][key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expire(key, ttl)
+
+    def expire(self, key: bytes, ttl: float) -> None:
+        deadline = time.monotonic() + ttl
+        self.expires[key] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, key))
+
+    def delete(self, key: bytes) -> int:
+        self.expires.pop(key, None)
+        return int(self.slots[get_key_slot(key)].pop(key, None) is not None)
+
+    def expire_keys(self) -> int:
+        """
+        Delete the keys whose TTL has passed.
+
+        :return: The number of keys deleted.
+        :rtype: int
+        """
+
+        count = 0
+        now = time.monotonic()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            if self.expires.get(key) == deadline:
+                count += self.delete(key)
+
+        return count
+
+    def remove_empty(self, key: bytes, value: Any) -> None:
+        if not value:
+            self.delete(key)
+
+
+class ConnectionState(object):
+    """
+    The state of a client connection.
+    """
+
+    def __init__(self) -> None:
+        self.asking = False
+        self.multi: List[List[bytes]] = None
+
+
+COMMANDS: Dict[bytes, Tuple[Callable, int]] = dict()
+
+
+def command(name: str, keys: int = 1) -> Callable:
+    """
+    Register the handler of a command. *keys* is the number of keys the
+    command starts with, where -1 means all the arguments are keys, and 0
+    means the command doesn't work on keys.
+    """
+
+    def register(handler: Callable) -> Callable:
+        COMMANDS[name.encode()] = (handler, keys)
+        return handler
+
+    return register
+
+
+class StandInNode(object):
+    """
+    A node of the stand-in cluster, serving the slots it owns and
+    redirecting the others.
+    """
+
+    def __init__(self,
+                 cluster: "StandInCluster",
+                 index: int,
+                 host: str,
+                 port: int,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0) -> None:
+        """
+        Initialize a node.
+
+        :param cluster: The cluster the node is in.
+        :type cluster: :class:`StandInCluster`
+        :param index: The index of the node in the cluster.
+        :type index: int
+        :param host: The host to listen on.
+        :type host: str
+        :param port: The port to listen on.
+        :type port: int
+        :param latency: Milliseconds to delay each reply in.
+        :type latency: float
+        :param error_rate: Share of the commands to fail.
+        :type error_rate: float
+        """
+
+        self.cluster = cluster
+        self.index = index
+        self.host = host
+        self.port = port
+        self.address = f"{host}:{port}"
+        self.id = f"{index:040x}"
+        self.latency = latency
+        self.error_rate = error_rate
+        self.commands = 0
+        self.errors = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve a client connection. The commands received together are
+        replied together, after the injected latency.
+        """
+
+        cluster = self.cluster
+        state = ConnectionState()
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buffer += data
+                commands, parsed = parse_commands(buffer)
+                del buffer[:parsed]
+                if not commands:
+                    continue
+
+                if cluster.disconnect_rate and random.random() < cluster.disconnect_rate:
+                    break
+                delay = self.latency + (random.uniform(0, cluster.jitter) if cluster.jitter else 0)
+                if delay > 0:
+                    await asyncio.sleep(delay / 1000)
+
+                writer.write(b"".join(encode_reply(self.execute(state, args))
+                                      for args in commands))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, state: ConnectionState, args: List[bytes], keys: int) -> Optional[RedisError]:
+        # Check that the keys of a command are in one slot served by this
+        # node, or else get the error or the redirection to reply
+        if len(args) < 2:
+            return RedisError(f"ERR wrong number of arguments for '{args[0].decode()}' command")
+        slots = {get_key_slot(key) for key in (args[1:] if keys < 0 else args[1:1 + keys])}
+        if len(slots) > 1:
+            return RedisError("CROSSSLOT Keys in request don't hash to the same slot")
+        slot = slots.pop()
+        owner = self.cluster.owners[slot]
+        asking, state.asking = state.asking, False
+        if owner is not self and not asking:
+            return RedisError(f"MOVED {slot} {owner.address}")
+        if not asking and self.cluster.ask_rate and len(self.cluster.nodes) > 1 \
+                and random.random() < self.cluster.ask_rate:
+            target = self.cluster.nodes[(self.index + 1) % len(self.cluster.nodes)]
+            return RedisError(f"ASK {slot} {target.address}")
+
+        return None
+
+    def execute(self, state: ConnectionState, args: List[bytes]) -> Any:
+        """
+        Execute a command, or queue it in a transaction.
+
+        :param state: The state of the connection.
+        :type state: :class:`ConnectionState`
+        :param args: The arguments of the command.
+        :type args: List[bytes]
+
+        :return: The reply.
+        :rtype: Any
+        """
+
+        self.commands += 1
+        name = args[0].upper()
+        if name not in COMMANDS:
+            return RedisError(f"ERR unknown command '{args[0].decode()}'")
+        handler, keys = COMMANDS[name]
+
+        if keys:
+            redirection = self._route(state, args, keys)
+            if redirection is not None:
+                return redirection
+
+        if state.multi is not None and name not in (b"EXEC", b"DISCARD", b"MULTI"):
+            state.multi.append(args)
+            return "QUEUED"
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return RedisError("ERR injected failure")
+
+        try:
+            return handler(self, state, args)
+        except RedisError as e:
+            return e
+        except (IndexError, ValueError):
+            return RedisError(f"ERR syntax error or wrong number of arguments for '{args[0].decode()}'")
+
+
+class StandInCluster(object):
+    """
+    A redis cluster stand-in made of nodes in one process, sharing one
+    :class:`Store`. The slots are split evenly over the nodes, and can be
+    migrated between them to cause MOVED redirections.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 7001,
+                 nodes: int = 3,
+                 password: str = None,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 disconnect_rate: float = 0.0,
+                 ask_rate: float = 0.0) -> None:
+        """
+        Initialize the cluster.
+
+        :param host: The host to listen on. Default is 127.0.0.1.
+        :type host: str
+        :param port: The port of the first node. The other nodes listen on
+            the following ports. Default is 7001.
+        :type port: int
+        :param nodes: Number of nodes. Default is 3.
+        :type nodes: int
+        :param password: The password required by AUTH.
+        :type password: str
+        :param latency: Milliseconds to delay each reply in. Default is 0.
+        :type latency: float
+        :param jitter: Milliseconds of random delay added to the latency.
+            Default is 0.
+        :type jitter: float
+        :param error_rate: Share of the commands to fail. Default is 0.
+        :type error_rate: float
+        :param disconnect_rate: Share of the reads to close the connection
+            on instead of replying. Default is 0.
+        :type disconnect_rate: float
+        :param ask_rate: Share of the commands to redirect with ASK.
+            Default is 0.
+        :type ask_rate: float
+        """
+
+        self.store = Store()
+        self.password = password
+        self.jitter = jitter
+        self.disconnect_rate = disconnect_rate
+        self.ask_rate = ask_rate
+        self.nodes = [StandInNode(cluster=self,
+                                  index=i,
+                                  host=host,
+                                  port=port + i,
+                                  latency=latency,
+                                  error_rate=error_rate)
+                      for i in range(nodes)]
+        self.owners: List[StandInNode] = [
+            self.nodes[slot * nodes // REDIS_CLUSTER_HASH_SLOTS]
+            for slot in range(REDIS_CLUSTER_HASH_SLOTS)]
+        self._servers: List[asyncio.AbstractServer] = list()
+
+    async def start(self) -> None:
+        """
+        Start listening on the ports of the nodes.
+        """
+
+        for node in self.nodes:
+            self._servers.append(await asyncio.start_server(node.handle, node.host, node.port))
+
+    def close(self) -> None:
+        """
+        Stop listening.
+        """
+
+        for server in self._servers:
+            server.close()
+
+    def slot_ranges(self) -> List[Tuple[int, int, StandInNode]]:
+        """
+        Get the ranges of slots served by the nodes.
+
+        :return: The first slot, the last slot and the node of each range.
+        :rtype: List[Tuple[int, int, StandInNode]]
+        """
+
+        ranges = list()
+        start = 0
+        for slot in range(1, REDIS_CLUSTER_HASH_SLOTS + 1):
+            if slot == REDIS_CLUSTER_HASH_SLOTS or self.owners[slot] is not self.owners[start]:
+                ranges.append((start, slot - 1, self.owners[start]))
+                start = slot
+
+        return ranges
+
+    def migrate_slot(self) -> Tuple[int, StandInNode]:
+        """
+        Move a random slot to the next node.
+
+        :return: The slot and the node it is moved to.
+        :rtype: Tuple[int, StandInNode]
+        """
+
+        slot = random.randrange(REDIS_CLUSTER_HASH_SLOTS)
+        node = self.nodes[(self.owners[slot].index + 1) % len(self.nodes)]
+        self.owners[slot] = node
+
+        return slot, node
+
+
+# Connection and cluster commands
+
+
+@command("PING", keys=0)
+def ping(node, state, args):
+    return args[1] if len(args) > 1 else "PONG"
+
+
+@command("ECHO", keys=0)
+def echo(node, state, args):
+    return args[1]
+
+
+@command("AUTH", keys=0)
+def auth(node, state, args):
+    if node.cluster.password is not None and args[-1].decode() != node.cluster.password:
+        raise RedisError("WRONGPASS invalid username-password pair")
+    return OK
+
+
+@command("SELECT", keys=0)
+@command("READONLY", keys=0)
+@command("READWRITE", keys=0)
+@command("CLIENT", keys=0)
+def ok(node, state, args):
+    return OK
+
+
+@command("ASKING", keys=0)
+def asking(node, state, args):
+    state.asking = True
+    return OK
+
+
+@command("COMMAND", keys=0)
+def command_info(node, state, args):
+    return []
+
+
+@command("CONFIG", keys=0)
+def config(node, state, args):
+    if args[1].upper() == b"GET":
+        pattern = args[2].decode()
+        if fnmatch.fnmatchcase("cluster-require-full-coverage", pattern):
+            return [b"cluster-require-full-coverage", b"yes"]
+        return []
+    return OK
+
+
+@command("INFO", keys=0)
+def info(node, state, args):
+    return (f"# Server\r\nredis_version:6.2.0\r\nredis_mode:cluster\r\ntcp_port:{node.port}\r\n"
+            f"# Stats\r\ntotal_commands_processed:{node.commands}\r\n").encode()
+
+
+@command("CLUSTER", keys=0)
+def cluster(node, state, args):
+    subcommand = args[1].upper()
+    cluster = node.cluster
+    if subcommand == b"SLOTS":
+        return [[start, end, [n.host.encode(), n.port, n.id.encode()]]
+                for start, end, n in cluster.slot_ranges()]
+    if subcommand == b"NODES":
+        ranges: Dict[StandInNode, List[str]] = {n: [] for n in cluster.nodes}
+        for start, end, n in cluster.slot_ranges():
+            ranges[n].append(f"{start}-{end}" if start != end else str(start))
+        return "".join(
+            f"{n.id} {n.address}@{n.port + 10000} {'myself,' if n is node else ''}master - 0 0 "
+            f"{n.index + 1} connected {' '.join(ranges[n])}\n" for n in cluster.nodes).encode()
+    if subcommand == b"INFO":
+        return (f"cluster_state:ok\r\ncluster_slots_assigned:{REDIS_CLUSTER_HASH_SLOTS}\r\n"
+                f"cluster_known_nodes:{len(cluster.nodes)}\r\ncluster_size:{len(cluster.nodes)}\r\n").encode()
+    if subcommand == b"KEYSLOT":
+        return get_key_slot(args[2])
+    if subcommand == b"MYID":
+        return node.id.encode()
+    raise RedisError(f"ERR unknown subcommand '{args[1].decode()}'")
+
+
+@command("MULTI", keys=0)
+def multi(node, state, args):
+    if state.multi is not None:
+        raise RedisError("ERR MULTI calls can not be nested")
+    state.multi = list()
+    return OK
+
+
+@command("EXEC", keys=0)
+def exec_(node, state, args):
+    if state.multi is None:
+        raise RedisError("ERR EXEC without MULTI")
+    commands, state.multi = state.multi, None
+    return [node.execute(state, c) for c in commands]
+
+
+@command("DISCARD", keys=0)
+def discard(node, state, args):
+    if state.multi is None:
+        raise RedisError("ERR DISCARD without MULTI")
+    state.multi = None
+    return OK
+
+
+@command("DBSIZE", keys=0)
+def dbsize(node, state, args):
+    store = node.cluster.store
+    return sum(len(store.slots[slot]) for slot in range(REDIS_CLUSTER_HASH_SLOTS)
+               if node.cluster.owners[slot] is node)
+
+
+@command("FLUSHALL", keys=0)
+@command("FLUSHDB", keys=0)
+def flushall(node, state, args):
+    store = node.cluster.store
+    for slot in range(REDIS_CLUSTER_HASH_SLOTS):
+        if node.cluster.owners[slot] is node:
+            for key in list(store.slots[slot]):
+                store.delete(key)
+    return OK
+
+
+@command("SCAN", keys=0)
+def scan(node, state, args):
+    # The cursor is the next slot to scan plus one, or 0 when it is done
+    cursor = int(args[1])
+    options = {args[i].upper(): args[i + 1] for i in range(2, len(args) - 1, 2)}
+    pattern = options.get(b"MATCH", b"*").decode()
+    count = int(options.get(b"COUNT", 10))
+    cluster = node.cluster
+    store = cluster.store
+
+    keys = list()
+    slot = cursor - 1 if cursor else 0
+    while slot < REDIS_CLUSTER_HASH_SLOTS and len(keys) < count:
+        if cluster.owners[slot] is node:
+            keys.extend(key for key in list(store.slots[slot])
+                        if store.get(key) is not None
+                        and fnmatch.fnmatchcase(key.decode(errors="replace"), pattern))
+        slot += 1
+
+    return [b"%d" % (slot + 1 if slot < REDIS_CLUSTER_HASH_SLOTS else 0), keys]
+
+
+# Key commands
+
+
+@command("DEL", keys=-1)
+@command("UNLINK", keys=-1)
+def delete(node, state, args):
+    store = node.cluster.store
+    return sum(store.delete(key) for key in args[1:] if store.get(key) is not None)
+
+
+@command("EXISTS", keys=-1)
+def exists(node, state, args):
+    store = node.cluster.store
+    return sum(store.get(key) is not None for key in args[1:])
+
+
+@command("TYPE")
+def type_(node, state, args):
+    value = node.cluster.store.get(args[1])
+    return {bytes: "string", deque: "list", set: "set", dict: "hash",
+            SortedSet: "zset"}.get(type(value), "none")
+
+
+@command("EXPIRE")
+@command("PEXPIRE")
+def expire(node, state, args):
+    store = node.cluster.store
+    if store.get(args[1]) is None:
+        return 0
+    ttl = int(args[2])
+    store.expire(args[1], ttl / 1000 if args[0].upper() == b"PEXPIRE" else ttl)
+    return 1
+
+
+@command("TTL")
+@command("PTTL")
+def ttl(node, state, args):
+    store = node.cluster.store
+    if store.get(args[1]) is None:
+        return -2
+    deadline = store.expires.get(args[1])
+    if deadline is None:
+        return -1
+    remaining = deadline - time.monotonic()
+    return int(remaining * 1000) if args[0].upper() == b"PTTL" else round(remaining)
+
+
+# String commands
+
+
+@command("GET")
+def get(node, state, args):
+    return node.cluster.store.get(args[1], bytes)
+
+
+@command("SET")
+def set_(node, state, args):
+    store = node.cluster.store
+    ttl: float = None
+    keep_ttl = nx = xx = False
+    i = 3
+    while i < len(args):
+        option = args[i].upper()
+        if option == b"EX":
+            ttl = int(args[i + 1])
+            i += 1
+        elif option == b"PX":
+            ttl = int(args[i + 1]) / 1000
+            i += 1
+        elif option == b"NX":
+            nx = True
+        elif option == b"XX":
+            xx = True
+        elif option == b"KEEPTTL":
+            keep_ttl = True
+        else:
+            raise RedisError("ERR syntax error")
+        i += 1
+
+    exists = store.get(args[1]) is not None
+    if (nx and exists) or (xx and not exists):
+        return None
+    if keep_ttl and ttl is None and args[1] in store.expires:
+        store.slots[get_key_slot(args[1])][args[1]] = args[2]
+    else:
+        store.set(args[1], args[2], ttl)
+    return OK
+
+
+@command("INCR")
+@command("INCRBY")
+@command("DECR")
+@command("DECRBY")
+def incr(node, state, args):
+    store = node.cluster.store
+    name = args[0].upper()
+    by = int(args[2]) if name in (b"INCRBY", b"DECRBY") else 1
+    if name.startswith(b"DECR"):
+        by = -by
+    value = store.get(args[1], bytes)
+    try:
+        number = int(value or 0) + by
+    except ValueError:
+        raise RedisError("ERR value is not an integer or out of range")
+    store.slots[get_key_slot(args[1])][args[1]] = b"%d" % number
+    return number
+
+
+# List commands
+
+
+@command("LPUSH")
+@command("RPUSH")
+def push(node, state, args):
+    elements = node.cluster.store.get_or_create(args[1], deque)
+    if args[0].upper() == b"LPUSH":
+        elements.extendleft(args[2:])
+    else:
+        elements.extend(args[2:])
+    return len(elements)
+
+
+@command("LPOP")
+@command("RPOP")
+def pop(node, state, args):
+    store = node.cluster.store
+    elements = store.get(args[1], deque)
+    if not elements:
+        return None
+    element = elements.popleft() if args[0].upper() == b"LPOP" else elements.pop()
+    store.remove_empty(args[1], elements)
+    return element
+
+
+@command("LLEN")
+def llen(node, state, args):
+    return len(node.cluster.store.get(args[1], deque) or ())
+
+
+@command("LRANGE")
+def lrange(node, state, args):
+    elements = node.cluster.store.get(args[1], deque) or deque()
+    start, stop = int(args[2]), int(args[3])
+    n = len(elements)
+    start = max(start + n if start < 0 else start, 0)
+    stop = stop + n if stop < 0 else min(stop, n - 1)
+    return [elements[i] for i in range(start, stop + 1)]
+
+
+# Set commands
+
+
+@command("SADD")
+def sadd(node, state, args):
+    members = node.cluster.store.get_or_create(args[1], set)
+    size = len(members)
+    members.update(args[2:])
+    return len(members) - size
+
+
+@command("SREM")
+def srem(node, state, args):
+    store = node.cluster.store
+    members = store.get(args[1], set) or set()
+    size = len(members)
+    members.difference_update(args[2:])
+    store.remove_empty(args[1], members)
+    return size - len(members)
+
+
+@command("SMEMBERS")
+def smembers(node, state, args):
+    return list(node.cluster.store.get(args[1], set) or ())
+
+
+@command("SCARD")
+def scard(node, state, args):
+    return len(node.cluster.store.get(args[1], set) or ())
+
+
+@command("SISMEMBER")
+def sismember(node, state, args):
+    return args[2] in (node.cluster.store.get(args[1], set) or ())
+
+
+# Hash commands
+
+
+@command("HSET")
+@command("HMSET")
+def hset(node, state, args):
+    fields = node.cluster.store.get_or_create(args[1], dict)
+    if len(args) < 4 or len(args) % 2:
+        raise ValueError()
+    added = 0
+    for i in range(2, len(args), 2):
+        added += args[i] not in fields
+        fields[args[i]] = args[i + 1]
+    return OK if args[0].upper() == b"HMSET" else added
+
+
+@command("HGET")
+def hget(node, state, args):
+    return (node.cluster.store.get(args[1], dict) or {}).get(args[2])
+
+
+@command("HGETALL")
+def hgetall(node, state, args):
+    fields = node.cluster.store.get(args[1], dict) or {}
+    return [item for field in fields.items() for item in field]
+
+
+@command("HDEL")
+def hdel(node, state, args):
+    store = node.cluster.store
+    fields = store.get(args[1], dict) or {}
+    deleted = sum(fields.pop(field, None) is not None for field in args[2:])
+    store.remove_empty(args[1], fields)
+    return deleted
+
+
+@command("HLEN")
+def hlen(node, state, args):
+    return len(node.cluster.store.get(args[1], dict) or ())
+
+
+# Sorted set commands
+
+
+@command("ZADD")
+def zadd(node, state, args):
+    scores = node.cluster.store.get_or_create(args[1], SortedSet)
+    i = 2
+    nx = xx = ch = False
+    while args[i].upper() in (b"NX", b"XX", b"CH", b"GT", b"LT"):
+        option = args[i].upper()
+        nx, xx, ch = nx or option == b"NX", xx or option == b"XX", ch or option == b"CH"
+        i += 1
+    if (len(args) - i) % 2 or i == len(args):
+        raise ValueError()
+
+    changed = 0
+    for j in range(i, len(args), 2):
+        score, member = float(args[j]), args[j + 1]
+        exists = member in scores
+        if (nx and exists) or (xx and not exists):
+            continue
+        if not exists or (ch and scores[member] != score):
+            changed += 1
+        scores[member] = score
+    return changed
+
+
+@command("ZRANGE")
+def zrange(node, state, args):
+    scores = node.cluster.store.get(args[1], SortedSet) or SortedSet()
+    members = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+    start, stop = int(args[2]), int(args[3])
+    n = len(members)
+    start = max(start + n if start < 0 else start, 0)
+    stop = stop + n if stop < 0 else min(stop, n - 1)
+    if any(arg.upper() == b"WITHSCORES" for arg in args[4:]):
+        return [item for member, score in members[start:stop + 1]
+                for item in (member, format_score(score))]
+    return [member for member, _ in members[start:stop + 1]]
+
+
+@command("ZSCORE")
+def zscore(node, state, args):
+    score = (node.cluster.store.get(args[1], SortedSet) or {}).get(args[2])
+    return None if score is None else format_score(score)
+
+
+@command("ZREM")
+def zrem(node, state, args):
+    store = node.cluster.store
+    scores = store.get(args[1], SortedSet) or SortedSet()
+    removed = sum(scores.pop(member, None) is not None for member in args[2:])
+    store.remove_empty(args[1], scores)
+    return removed
+
+
+@command("ZCARD")
+def zcard(node, state, args):
+    return len(node.cluster.store.get(args[1], SortedSet) or ())
+
+
+def parse_node_values(values: List[str], nodes: int) -> Dict[int, float]:
+    """
+    Parse the values of nodes given as `<node number>=<value>`.
+
+    :param values: The values.
+    :type values: List[str]
+    :param nodes: Number of nodes.
+    :type nodes: int
+
+    :return: The value of each node by index.
+    :rtype: Dict[int, float]
+    """
+
+    result = dict()
+    for value in values or []:
+        node_no, _, number = value.partition("=")
+        if not 1 <= int(node_no) <= nodes:
+            raise ValueError(f"Node {node_no} doesn't exist")
+        result[int(node_no) - 1] = float(number)
+
+    return result
+
+
+async def serve(cluster: StandInCluster,
+                report_interval: float,
+                migrate_interval: float) -> None:
+    """
+    Serve until SIGINT or SIGTERM, logging the throughput periodically and
+    migrating slots if requested.
+    """
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await cluster.start()
+    startup_nodes = ",".join(node.address for node in cluster.nodes)
+    logger.info(f"Redis cluster stand-in with {len(cluster.nodes)} nodes is listening on {startup_nodes}")
+    logger.info(f"Run the load test with --startup-nodes {startup_nodes}")
+
+    start_time = last_time = time.monotonic()
+    last_commands = 0
+    next_migration = start_time + migrate_interval if migrate_interval else None
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=min(1.0, report_interval))
+        except asyncio.TimeoutError:
+            pass
+        cluster.store.expire_keys()
+
+        now = time.monotonic()
+        if next_migration is not None and now >= next_migration:
+            slot, node = cluster.migrate_slot()
+            logger.info(f"Slot {slot} is migrated to {node.address}")
+            next_migration = now + migrate_interval
+        if now - last_time >= report_interval or stop.is_set():
+            commands = sum(node.commands for node in cluster.nodes)
+            logger.info(f"{(commands - last_commands) / (now - last_time):.0f} commands/s; "
+                        + "; ".join(f"{node.address}: {node.commands} commands, {node.errors} injected errors"
+                                    for node in cluster.nodes))
+            last_time, last_commands = now, commands
+
+    cluster.close()
+    commands = sum(node.commands for node in cluster.nodes)
+    logger.info(f"Served {commands} commands in {time.monotonic() - start_time:.1f}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent('''\
+            Run a redis cluster stand-in in this process, to benchmark and check the
+            load test without a real cluster. The nodes share one in-memory key space,
+            serve CLUSTER SLOTS and redirect with MOVED and ASK. Latency and failures
+            can be injected.
+            '''))
+    parser.add_argument("--host",
+                        default="127.0.0.1",
+                        help="The host to listen on.")
+    parser.add_argument("-p", "--port",
+                        type=int,
+                        default=7001,
+                        help="The port of the first node. The other nodes listen on the following ports.")
+    parser.add_argument("-n", "--nodes",
+                        type=int,
+                        default=3,
+                        help="Number of nodes.")
+    parser.add_argument("--password",
+                        help="The password required by AUTH.")
+    parser.add_argument("--latency",
+                        type=float,
+                        default=0.0,
+                        help="Milliseconds to delay each reply in.")
+    parser.add_argument("--node-latency",
+                        action="append",
+                        help="Milliseconds to delay each reply of a node in, as <node number>=<ms>, "
+                        "such as 2=5. It can be repeated.")
+    parser.add_argument("--jitter",
+                        type=float,
+                        default=0.0,
+                        help="Milliseconds of random delay added to the latency.")
+    parser.add_argument("--error-rate",
+                        type=float,
+                        default=0.0,
+                        help="Share of the commands to fail.")
+    parser.add_argument("--node-error-rate",
+                        action="append",
+                        help="Share of the commands of a node to fail, as <node number>=<rate>. "
+                        "It can be repeated.")
+    parser.add_argument("--disconnect-rate",
+                        type=float,
+                        default=0.0,
+                        help="Share of the reads to close the connection on instead of replying.")
+    parser.add_argument("--ask-rate",
+                        type=float,
+                        default=0.0,
+                        help="Share of the commands to redirect to the next node with ASK.")
+    parser.add_argument("--migrate-interval",
+                        type=float,
+                        default=0.0,
+                        help="Seconds between the migrations of a random slot to the next node, "
+                        "which cause MOVED redirections. 0 disables migration.")
+    parser.add_argument("--report-interval",
+                        type=float,
+                        default=10.0,
+                        help="Seconds between the logs of the throughput.")
+    args = parser.parse_args()
+
+    cluster = StandInCluster(host=args.host,
+                             port=args.port,
+                             nodes=args.nodes,
+                             password=args.password,
+                             latency=args.latency,
+                             jitter=args.jitter,
+                             error_rate=args.error_rate,
+                             disconnect_rate=args.disconnect_rate,
+                             ask_rate=args.ask_rate)
+    for index, latency in parse_node_values(args.node_latency, args.nodes).items():
+        cluster.nodes[index].latency = latency
+    for index, error_rate in parse_node_values(args.node_error_rate, args.nodes).items():
+        cluster.nodes[index].error_rate = error_rate
+
+    asyncio.run(serve(cluster=cluster,
+                      report_interval=args.report_interval,
+                      migrate_interval=args.migrate_interval))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+import argparse
+import json
+import math
+import sqlite3
+import sys
+import textwrap
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from axolpy import configuration, logging
+
+logging.load_config()
+logger = logging.get_logger(name=Path(__file__).name)
+
+PERCENTILES = (50, 99, 99.9)
+# The seconds of throughput each run needs after the trim for the rates to
+# be tested
+MIN_THROUGHPUT_SAMPLES = 10
+
+
+def resolve_run(connection: sqlite3.Connection, ref: str) -> sqlite3.Row:
+    """
+    Find a run by its id, by `latest`, or by its label, which selects the
+    latest run with the label.
+
+    :param connection: The connection to the results database.
+    :type connection: :class:`sqlite3.Connection`
+    :param ref: The id, `latest` or the label of the run.
+    :type ref: str
+
+    :return: The run.
+    :rtype: :class:`sqlite3.Row`
+    """
+
+    if ref.isdigit():
+        run = connection.execute("SELECT * FROM runs WHERE id = ?", (int(ref),)).fetchone()
+    elif ref == "latest":
+        run = connection.execute("SELECT * FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+    else:
+        run = connection.execute("SELECT * FROM runs WHERE label = ? ORDER BY id DESC LIMIT 1",
+                                 (ref,)).fetchone()
+    if run is None:
+        raise ValueError(f"Run {ref} is not found")
+
+    return run
+
+
+def get_requests(connection: sqlite3.Connection, run_id: int) -> Dict[Tuple[str, str], sqlite3.Row]:
+    return {(row["type"], row["name"]): row
+            for row in connection.execute("SELECT * FROM requests WHERE run_id = ?", (run_id,))}
+
+
+def get_dropped(connection: sqlite3.Connection, run_id: int) -> Dict[str, int]:
+    try:
+        return dict(connection.execute("SELECT name, count FROM dropped WHERE run_id = ?", (run_id,)))
+    except sqlite3.OperationalError:
+        # The database is older than the dropped arrivals
+        return {}
+
+
+def value_at_rank(buckets: List[List[int]], rank: int) -> int:
+    """
+    Get the latency at *rank* in a histogram.
+
+    :param buckets: The sorted `[highest value, count]` of the buckets.
+    :type buckets: List[List[int]]
+    :param rank: The rank from 1.
+    :type rank: int
+
+    :return: The highest value of the bucket holding the rank.
+    :rtype: int
+    """
+
+    seen = 0
+    for value, count in buckets:
+        seen += count
+        if seen >= rank:
+            return value
+
+    return buckets[-1][0] if buckets else 0
+
+
+def percentile_interval(histogram: dict, percentile: float, z: float) -> Tuple[int, int, int]:
+    """
+    Get a percentile of a histogram with its distribution-free confidence
+    interval. The rank of the percentile in *n* samples is binomial, so the
+    bounds are the values at the ranks `n * q ± z * sqrt(n * q * (1 - q))`.
+
+    :param histogram: The histogram stored by the load test.
+    :type histogram: dict
+    :param percentile: The percentile between 0 and 100.
+    :type percentile: float
+    :param z: The z-score of the confidence level.
+    :type z: float
+
+    :return: The lower bound, the percentile and the upper bound in
+        microseconds.
+    :rtype: Tuple[int, int, int]
+    """
+
+    buckets = histogram["buckets"]
+    n = sum(count for _, count in buckets)
+    q = percentile / 100
+    spread = z * math.sqrt(n * q * (1 - q))
+
+    return (value_at_rank(buckets, max(1, math.floor(n * q - spread))),
+            value_at_rank(buckets, max(1, math.ceil(n * q))),
+            value_at_rank(buckets, min(n, math.ceil(n * q + spread))))
+
+
+def throughput_samples(row: sqlite3.Row, trim: int) -> List[int]:
+    """
+    Get the requests of each second of a run, without the first and last
+    *trim* seconds in which the users are spawned and stopped.
+    """
+
+    per_second = dict(json.loads(row["throughput"]))
+    if not per_second:
+        return []
+    first, last = min(per_second) + trim, max(per_second) - trim
+
+    return [per_second.get(second, 0) for second in range(first, last + 1)]
+
+
+def welch_test(a: List[float], b: List[float]) -> float:
+    """
+    Get the two-sided p-value of Welch's t-test of the means of two
+    samples. The t distribution is approximated by the normal distribution,
+    which is close enough from a few dozen samples.
+
+    :param a: The first sample.
+    :type a: List[float]
+    :param b: The second sample.
+    :type b: List[float]
+
+    :return: The p-value.
+    :rtype: float
+    """
+
+    mean_a, mean_b = sum(a) / len(a), sum(b) / len(b)
+    var_a = sum((x - mean_a) ** 2 for x in a) / (len(a) - 1)
+    var_b = sum((x - mean_b) ** 2 for x in b) / (len(b) - 1)
+    se = math.sqrt(var_a / len(a) + var_b / len(b))
+    if se == 0:
+        return 0.0 if mean_a != mean_b else 1.0
+
+    return math.erfc(abs(mean_a - mean_b) / se / math.sqrt(2))
+
+
+def proportion_test(failures_a: int, count_a: int, failures_b: int, count_b: int) -> float:
+    """
+    Get the two-sided p-value of the two-proportion z-test of the failure
+    ratios of two runs.
+    """
+
+    pooled = (failures_a + failures_b) / (count_a + count_b)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / count_a + 1 / count_b))
+    if se == 0:
+        return 1.0
+
+    return math.erfc(abs(failures_a / count_a - failures_b / count_b) / se / math.sqrt(2))
+
+
+def z_score(confidence: float) -> float:
+    """
+    Get the two-sided z-score of a confidence level by bisection of
+    :func:`math.erf`.
+    """
+
+    low, high = 0.0, 10.0
+    while high - low > 1e-6:
+        middle = (low + high) / 2
+        if math.erf(middle / math.sqrt(2)) < confidence:
+            low = middle
+        else:
+            high = middle
+
+    return (low + high) / 2
+
+
+def compare_runs(baseline: Tuple[sqlite3.Row, sqlite3.Row],
+                 candidate: Tuple[sqlite3.Row, sqlite3.Row],
+                 args: argparse.Namespace) -> List[dict]:
+    """
+    Compare the throughput, the failure ratio and the latency percentiles
+    of a request in two runs. A change is a regression or an improvement
+    only if it is beyond its threshold and statistically significant.
+
+    :param baseline: The baseline run and its request.
+    :type baseline: Tuple[sqlite3.Row, sqlite3.Row]
+    :param candidate: The candidate run and its request.
+    :type candidate: Tuple[sqlite3.Row, sqlite3.Row]
+    :param args: The thresholds, confidence and trim of the command line.
+    :type args: :class:`argparse.Namespace`
+
+    :return: Rows of metric, baseline, candidate, relative change and
+        verdict.
+    :rtype: List[dict]
+    """
+
+    (_, base), (_, cand) = baseline, candidate
+    alpha = 1 - args.confidence
+    rows = list()
+
+    def verdict(change: float, threshold: float, significant: bool, higher_is_worse: bool) -> str:
+        if not significant or abs(change) <= threshold:
+            return "no change"
+        return "REGRESSION" if (change > 0) == higher_is_worse else "improvement"
+
+    base_samples = throughput_samples(base, args.trim)
+    cand_samples = throughput_samples(cand, args.trim)
+    if len(base_samples) >= MIN_THROUGHPUT_SAMPLES and len(cand_samples) >= MIN_THROUGHPUT_SAMPLES:
+        significant = welch_test(base_samples, cand_samples) < alpha
+        throughput_verdict = None
+    else:
+        # The rates of the whole runs are shown, but not tested
+        base_samples = throughput_samples(base, 0)
+        cand_samples = throughput_samples(cand, 0)
+        significant = None
+        throughput_verdict = (f"insufficient data: needs {MIN_THROUGHPUT_SAMPLES}s per run after trimming "
+                              f"{args.trim}s from each end, untrimmed means shown")
+    base_rps = sum(base_samples) / len(base_samples) if base_samples else None
+    cand_rps = sum(cand_samples) / len(cand_samples) if cand_samples else None
+    change = (cand_rps - base_rps) / base_rps if base_rps and cand_rps is not None else 0.0
+    rows.append({"metric": "req/s",
+                 "baseline": "-" if base_rps is None else f"{base_rps:.1f}",
+                 "candidate": "-" if cand_rps is None else f"{cand_rps:.1f}",
+                 "change": change,
+                 "verdict": throughput_verdict or verdict(change, args.throughput_threshold, significant, False)})
+
+    if base["count"] and cand["count"]:
+        base_ratio = base["failures"] / base["count"]
+        cand_ratio = cand["failures"] / cand["count"]
+        significant = proportion_test(base["failures"], base["count"],
+                                      cand["failures"], cand["count"]) < alpha
+        change = cand_ratio - base_ratio
+        rows.append({"metric": "fail %", "baseline": f"{base_ratio:.3%}", "candidate": f"{cand_ratio:.3%}",
+                     "change": change,
+                     "verdict": verdict(change, args.failure_threshold, significant, True)})
+
+    z = z_score(args.confidence)
+    base_histogram = json.loads(base["histogram"])
+    cand_histogram = json.loads(cand["histogram"])
+    for percentile in args.percentiles:
+        if not base["count"] or not cand["count"]:
+            break
+        base_low, base_value, base_high = percentile_interval(base_histogram, percentile, z)
+        cand_low, cand_value, cand_high = percentile_interval(cand_histogram, percentile, z)
+        change = (cand_value - base_value) / base_value if base_value else 0.0
+        # Significant when the confidence intervals don't overlap
+        significant = cand_low > base_high or cand_high < base_low
+        rows.append({"metric": f"p{percentile} us",
+                     "baseline": f"{base_value} [{base_low}, {base_high}]",
+                     "candidate": f"{cand_value} [{cand_low}, {cand_high}]",
+                     "change": change,
+                     "verdict": verdict(change, args.latency_threshold, significant, True)})
+
+    return rows
+
+
+def log_differences(title: str, baseline: dict, candidate: dict) -> None:
+    differences = [f"  {key}: {baseline.get(key)} -> {candidate.get(key)}"
+                   for key in sorted(set(baseline) | set(candidate))
+                   if baseline.get(key) != candidate.get(key)]
+    if differences:
+        logger.info(f"{title} differ:")
+        for difference in differences:
+            logger.info(difference)
+
+
+def list_runs(connection: sqlite3.Connection, args: argparse.Namespace) -> int:
+    query = "SELECT * FROM runs"
+    params: tuple = ()
+    if args.label:
+        query += " WHERE label = ?"
+        params = (args.label,)
+    runs = connection.execute(f"{query} ORDER BY id DESC LIMIT ?", (*params, args.limit)).fetchall()
+
+    logger.info(f"{'Run':>5} {'Started at':<20} {'Duration':>9} {'Label':<20} {'Workload':<20} "
+                f"{'# reqs':>10} {'req/s':>10} {'99%':>8}")
+    for run in reversed(runs):
+        request = get_requests(connection, run["id"]).get(("", "Aggregated"))
+        count = request["count"] if request else 0
+        p99 = percentile_interval(json.loads(request["histogram"]), 99, 0)[1] if count else 0
+        logger.info(f"{run['id']:>5} {run['started_at']:<20} {run['duration']:>8.0f}s {run['label'] or '':<20} "
+                    f"{json.loads(run['workload'])['name']:<20} {count:>10} "
+                    f"{count / run['duration'] if run['duration'] else 0:>10.1f} {p99:>8}")
+
+    return 0
+
+
+def show_run(connection: sqlite3.Connection, args: argparse.Namespace) -> int:
+    run = resolve_run(connection, args.run)
+    logger.info(f"Run {run['id']} {run['label'] or ''} started at {run['started_at']} "
+                f"for {run['duration']:.0f}s with {run['user_classes']}")
+    logger.info(f"Workload: {run['workload']}")
+    logger.info(f"Topology: {run['topology']}")
+    logger.info(f"{'Type':<8} {'Name':<40} {'# reqs':>10} {'# fails':>8} "
+                + " ".join(f"{f'{p}%':>8}" for p in PERCENTILES) + f" {'100%':>8}")
+    for (request_type, name), request in sorted(get_requests(connection, run["id"]).items(),
+                                                key=lambda item: item[0][1] == "Aggregated"):
+        histogram = json.loads(request["histogram"])
+        values = [percentile_interval(histogram, p, 0)[1] if request["count"] else 0 for p in PERCENTILES]
+        logger.info(f"{request_type:<8} {name:<40} {request['count']:>10} {request['failures']:>8} "
+                    + " ".join(f"{v:>8}" for v in values) + f" {histogram['max']:>8}")
+    for name, count in sorted(get_dropped(connection, run["id"]).items()):
+        logger.info(f"Dropped {count} arrivals of {name} as too many commands were in flight")
+
+    return 0
+
+
+def compare(connection: sqlite3.Connection, args: argparse.Namespace) -> int:
+    baseline = resolve_run(connection, args.baseline)
+    candidate = resolve_run(connection, args.candidate)
+    logger.info(f"Baseline run {baseline['id']} {baseline['label'] or ''} at {baseline['started_at']}, "
+                f"candidate run {candidate['id']} {candidate['label'] or ''} at {candidate['started_at']}")
+    log_differences("Options", json.loads(baseline["options"]), json.loads(candidate["options"]))
+    log_differences("Workloads", json.loads(baseline["workload"]), json.loads(candidate["workload"]))
+    log_differences("Topologies", json.loads(baseline["topology"]) or {}, json.loads(candidate["topology"]) or {})
+
+    base_requests = get_requests(connection, baseline["id"])
+    cand_requests = get_requests(connection, candidate["id"])
+    keys = sorted(set(base_requests) & set(cand_requests), key=lambda key: (key[1] == "Aggregated", key))
+    if not args.all_requests:
+        keys = [key for key in keys if key[1] == "Aggregated"]
+
+    regressions = 0
+    logger.info(f"{'Type':<8} {'Name':<32} {'Metric':<10} {'Baseline':>24} {'Candidate':>24} "
+                f"{'Change':>9}  Verdict")
+    for key in keys:
+        for row in compare_runs((baseline, base_requests[key]), (candidate, cand_requests[key]), args):
+            change = f"{row['change']:+.2%}" if row["metric"] != "fail %" else f"{row['change'] * 100:+.3f}pp"
+            logger.info(f"{key[0]:<8} {key[1]:<32} {row['metric']:<10} {row['baseline']:>24} "
+                        f"{row['candidate']:>24} {change:>9}  {row['verdict']}")
+            regressions += row["verdict"] == "REGRESSION"
+
+    if regressions:
+        logger.warning(f"{regressions} regression(s) are found")
+        return 1
+    logger.info("No regression is found")
+
+    return 0
+
+
+def main() -> int:
+    config = configuration.AxolpyConfigManager.get_context(name="redis")
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent('''\
+            List, show and compare the runs of redis-cluster-load-test.py stored by
+            --results-db. compare exits with 1 if the candidate run regresses from the
+            baseline run.
+            '''))
+    parser.add_argument("-d", "--db",
+                        default=config.get("load-test", "results.db", fallback="") or None,
+                        required=not config.get("load-test", "results.db", fallback=""),
+                        help="Path of the results database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List the runs.")
+    list_parser.add_argument("--label", help="Only list the runs with this label.")
+    list_parser.add_argument("--limit", type=int, default=20, help="Number of latest runs to list.")
+    list_parser.set_defaults(func=list_runs)
+
+    show_parser = subparsers.add_parser("show", help="Show the requests of a run.")
+    show_parser.add_argument("run", nargs="?", default="latest",
+                             help="Id, label or `latest` of the run. Default is latest.")
+    show_parser.set_defaults(func=show_run)
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Flag the throughput, failure and latency regressions of a run from a baseline run.")
+    compare_parser.add_argument("baseline", help="Id, label or `latest` of the baseline run.")
+    compare_parser.add_argument("candidate", nargs="?", default="latest",
+                                help="Id, label or `latest` of the candidate run. Default is latest.")
+    compare_parser.add_argument("--throughput-threshold", type=float, default=0.05,
+                                help="Relative drop of requests per second to flag. Default is 0.05.")
+    compare_parser.add_argument("--latency-threshold", type=float, default=0.10,
+                                help="Relative rise of a latency percentile to flag. Default is 0.10.")
+    compare_parser.add_argument("--failure-threshold", type=float, default=0.001,
+                                help="Absolute rise of the failure ratio to flag. Default is 0.001.")
+    compare_parser.add_argument("--confidence", type=float, default=0.99,
+                                help="Confidence level of the tests of significance. Default is 0.99.")
+    compare_parser.add_argument("--percentiles", type=lambda v: [float(p) if "." in p else int(p)
+                                                                 for p in v.split(",")],
+                                default=list(PERCENTILES),
+                                help="Comma separated latency percentiles to compare. Default is 50,99,99.9.")
+    compare_parser.add_argument("--trim", type=int, default=5,
+                                help="Seconds at the start and end of the runs to leave out of the "
+                                "throughput. Default is 5.")
+    compare_parser.add_argument("--all-requests", action="store_true",
+                                help="Compare every request type and name, not only the aggregation.")
+    compare_parser.set_defaults(func=compare)
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        logger.error(f"Results database {args.db} doesn't exist")
+        return 2
+    connection = sqlite3.connect(args.db)
+    connection.row_factory = sqlite3.Row
+    try:
+        return args.func(connection, args)
+    except ValueError as e:
+        logger.error(e)
+        return 2
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
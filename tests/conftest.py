@@ -0,0 +1,6 @@
+import os
+from pathlib import Path
+
+# The scripts load their configuration from $AXOLPY_PATH/conf when they are
+# imported, so the one of this repository is used unless another is set
+os.environ.setdefault("AXOLPY_PATH", str(Path(__file__).parent.parent))
@@ -0,0 +1,259 @@
+import asyncio
+import importlib.util
+import shutil
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+from typing import List
+
+import pytest
+
+# The script is not a module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "cloud_maintenance", Path(__file__).parent.parent.joinpath("bin", "cloud-maintenance.py"))
+cloud_maintenance = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cloud_maintenance)
+
+EXAMPLE_PATH = Path(__file__).parent.parent.joinpath("data", "cloud-maintenance-example")
+
+ANCHORED_RESOURCES = """\
+x-owner: &owner platform-team
+x-defaults: &defaults
+  port: 5432
+  engine_type: postgresql
+regions:
+  ap-east-1:
+    unused: &unused
+      - id: archive
+    databases:
+      - id: user
+        host: *owner
+        settings: *defaults
+        archive: *unused
+      - id: address
+        host: address.example.com
+"""
+
+
+def test_pruned_loader_selects_items() -> None:
+    loader = cloud_maintenance.PrunedYAMLLoader(StringIO(ANCHORED_RESOURCES))
+    selector = {"regions": {"ap-east-1": {
+        "databases": cloud_maintenance.ItemFilter(field="id", values={"address"})}}}
+
+    assert loader.load(selector=selector) == {
+        "regions": {"ap-east-1": {"databases": [{"id": "address", "host": "address.example.com"}]}}}
+
+
+def test_pruned_loader_resolves_aliases_of_skipped_nodes() -> None:
+    loader = cloud_maintenance.PrunedYAMLLoader(StringIO(ANCHORED_RESOURCES))
+    selector = {"regions": {"ap-east-1": {
+        "databases": cloud_maintenance.ItemFilter(field="id", values={"user"})}}}
+
+    assert loader.load(selector=selector) == {
+        "regions": {"ap-east-1": {"databases": [{
+            "id": "user",
+            "host": "platform-team",
+            "settings": {"port": 5432, "engine_type": "postgresql"},
+            "archive": [{"id": "archive"}]}]}}}
+
+
+SHARED_OPERATORS = """\
+team-a:
+  ap-east-1:
+    databases:
+      - id: user
+      - id: address
+      - id: favorite
+    ecs:
+      clusters:
+        Production:
+          services:
+          - name: p-authentication-api
+    eks:
+      clusters:
+        p-main:
+          namespaces:
+            p-general:
+              deployments:
+                - name: p-address-api
+team-b:
+  ap-east-1:
+    databases:
+      - id: user
+      - id: audit_log
+    ecs:
+      clusters:
+        Production:
+          services:
+          - name: p-authentication-api
+          - name: p-address-api
+    eks:
+      clusters:
+        p-main:
+          namespaces:
+            p-general:
+              deployments:
+                - name: p-address-api
+                - name: p-audit-log-api
+"""
+
+
+@pytest.fixture(scope="module")
+def operators(tmp_path_factory: pytest.TempPathFactory) -> dict:
+    # Two operators sharing some of the resources of the example
+    data_path = tmp_path_factory.mktemp("data")
+    data_path.joinpath("shared").mkdir()
+    shutil.copy(EXAMPLE_PATH.joinpath("resource.yaml"), data_path.joinpath("shared", "resource.yaml"))
+    data_path.joinpath("shared", "operator.yaml").write_text(SHARED_OPERATORS)
+    _, operators = cloud_maintenance.load_model(data_path=data_path, maintenance_id="shared")
+    return operators
+
+
+class RecordingBackend(cloud_maintenance.FakeStatusBackend):
+    """
+    A fake backend recording its queries and the most queries in flight at a
+    time against each service of a region or cluster.
+    """
+
+    def __init__(self, delay: float = 0.01, omit: str = None) -> None:
+        super().__init__(latency=0)
+        self.delay = delay
+        self.omit = omit
+        self.queried: List[str] = list()
+        self.in_flight: Counter = Counter()
+        self.max_in_flight: Counter = Counter()
+
+    async def _record(self, location: str, names: List[str]) -> None:
+        self.queried.extend(names)
+        self.in_flight[location] += 1
+        self.max_in_flight[location] = max(self.max_in_flight[location], self.in_flight[location])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight[location] -= 1
+
+    async def query_database(self, region, database):
+        await self._record(f"rds/{region}", [database.id])
+        return await super().query_database(region=region, database=database)
+
+    async def query_ecs_services(self, region, cluster, services):
+        await self._record(f"ecs/{region}", [service.name for service in services])
+        return await super().query_ecs_services(region=region, cluster=cluster, services=services)
+
+    async def query_k8s_deployments(self, cluster, namespace, deployments):
+        await self._record(f"eks/{cluster}", [deployment.name for deployment in deployments])
+        statuses = await super().query_k8s_deployments(cluster=cluster, namespace=namespace, deployments=deployments)
+        statuses.pop(self.omit, None)
+        return statuses
+
+
+def collect_status(operators: dict, backend, concurrency: int = 4, timeout: float = 5) -> dict:
+    statuses = asyncio.run(cloud_maintenance.collect_status(
+        operators=operators, backend=backend, concurrency=concurrency, timeout=timeout))
+    return {(status.kind, status.name): status for status in statuses}
+
+
+def test_status_of_shared_resources_is_queried_once(operators: dict) -> None:
+    backend = RecordingBackend()
+    statuses = collect_status(operators, backend)
+
+    assert sorted(backend.queried) == sorted([
+        "user", "address", "favorite", "audit_log",
+        "p-authentication-api", "p-address-api",
+        "p-address-api", "p-audit-log-api"])
+    assert len(statuses) == len(backend.queried)
+    assert statuses[("database", "user")].status == "available"
+    assert statuses[("k8s deployment", "p-address-api")].status == "READY"
+
+
+def test_status_errors(operators: dict) -> None:
+    statuses = collect_status(operators, cloud_maintenance.FakeStatusBackend(latency=0, error_rate=1))
+
+    assert {status.status for status in statuses.values()} == {"ERROR"}
+    assert {status.detail for status in statuses.values()} == {"Injected error"}
+
+
+def test_status_timeout(operators: dict) -> None:
+    statuses = collect_status(operators, RecordingBackend(delay=5), timeout=0.05)
+
+    assert {status.status for status in statuses.values()} == {"TIMEOUT"}
+    assert statuses[("database", "user")].detail == "no reply in 0.05s"
+
+
+def test_status_missing(operators: dict) -> None:
+    statuses = collect_status(operators, RecordingBackend(omit="p-audit-log-api"))
+
+    assert statuses[("k8s deployment", "p-audit-log-api")].status == "MISSING"
+    assert statuses[("k8s deployment", "p-address-api")].status == "READY"
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_status_concurrency_is_bounded(operators: dict, concurrency: int) -> None:
+    backend = RecordingBackend()
+    collect_status(operators, backend, concurrency=concurrency)
+
+    # The four databases of the region are queried at most *concurrency* at
+    # a time
+    assert backend.max_in_flight["rds/ap-east-1"] == concurrency
+
+
+def test_snapshot_is_loaded_while_unchanged(tmp_path: Path) -> None:
+    cache_dir = tmp_path.joinpath("cache")
+    _, operators = cloud_maintenance.load_model(
+        data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name, cache_dir=cache_dir)
+    snapshot_path, = cache_dir.iterdir()
+    key = cloud_maintenance.get_model_key(
+        data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name, pattern="*")
+
+    _, snapshot_operators = cloud_maintenance.read_snapshot(snapshot_path=snapshot_path, key=key)
+    assert sorted(snapshot_operators) == sorted(operators)
+    assert cloud_maintenance.read_snapshot(snapshot_path=snapshot_path, key="stale") is None
+
+
+def test_truncated_snapshot_is_a_miss(tmp_path: Path) -> None:
+    cache_dir = tmp_path.joinpath("cache")
+    cloud_maintenance.load_model(data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name, cache_dir=cache_dir)
+    snapshot_path, = cache_dir.iterdir()
+    snapshot_path.write_bytes(snapshot_path.read_bytes()[:200])
+
+    _, operators = cloud_maintenance.load_model(
+        data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name, cache_dir=cache_dir)
+    assert sorted(operators) == ["operator1", "operator2", "operator3"]
+    # The snapshot is written again
+    key = cloud_maintenance.get_model_key(
+        data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name, pattern="*")
+    assert cloud_maintenance.read_snapshot(snapshot_path=snapshot_path, key=key) is not None
+
+
+@pytest.fixture(scope="module")
+def example_operators() -> dict:
+    _, operators = cloud_maintenance.load_model(data_path=EXAMPLE_PATH.parent, maintenance_id=EXAMPLE_PATH.name)
+    return operators
+
+
+def test_step_resources_agree_with_eligible(example_operators: dict) -> None:
+    checked = set()
+    for operator in example_operators.values():
+        index = cloud_maintenance.ResourceIndex(operator)
+        for step in cloud_maintenance.STEPS:
+            if step.class_ not in cloud_maintenance.STEP_RESOURCES:
+                continue
+            step_impl = cloud_maintenance.create_step(step=step, step_no=1, operator=operator, dist_path=None)
+            eligible = bool(cloud_maintenance.STEP_RESOURCES[step.class_](index))
+            assert eligible == step_impl.eligible(), f"{step.name} of {operator.id}"
+            checked.add(step.class_)
+
+    assert checked == set(cloud_maintenance.STEP_RESOURCES)
+
+
+def test_render_step_matches_write_file(example_operators: dict, tmp_path: Path) -> None:
+    cloud_maintenance._init_worker(example_operators)
+    for operator in example_operators.values():
+        for step, step_no in cloud_maintenance.number_steps(
+                steps=cloud_maintenance.order_steps(cloud_maintenance.STEPS),
+                operator=operator,
+                index=cloud_maintenance.ResourceIndex(operator)):
+            step_impl = cloud_maintenance.create_step(step=step, step_no=step_no, operator=operator, dist_path=tmp_path)
+            step_impl.write_file()
+            content, _, _ = cloud_maintenance.render_step(step=step, step_no=step_no, operator_id=operator.id)
+            assert content == step_impl.output_filepath().read_bytes(), step_impl.filename()
@@ -0,0 +1,103 @@
+import argparse
+import importlib.util
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from cryptography.fernet import Fernet
+
+# The script is not a module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "crypt_message", Path(__file__).parent.parent.joinpath("bin", "crypt-message.py"))
+crypt_message = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(crypt_message)
+
+
+@pytest.fixture
+def key() -> bytes:
+    return Fernet.generate_key()
+
+
+def encrypt(message: bytes, key: bytes, chunk_size: int = 4) -> bytes:
+    sink = BytesIO()
+    crypt_message.encrypt_stream(source=BytesIO(message), sink=sink, key=key, chunk_size=chunk_size)
+    return sink.getvalue()
+
+
+def decrypt(stream: bytes, key: bytes) -> bytes:
+    sink = BytesIO()
+    crypt_message.decrypt_stream(source=BytesIO(stream), sink=sink, key=key)
+    return sink.getvalue()
+
+
+@pytest.mark.parametrize("message", [b"", b"abc", b"abcd", b"abcdefghij" * 10])
+def test_round_trip(message: bytes, key: bytes) -> None:
+    assert decrypt(encrypt(message, key), key) == message
+
+
+def test_truncated(key: bytes) -> None:
+    lines = encrypt(b"abcdefghij", key).splitlines(keepends=True)
+    with pytest.raises(ValueError, match="truncated"):
+        decrypt(b"".join(lines[:-1]), key)
+
+
+def test_reordered(key: bytes) -> None:
+    magic, *chunks = encrypt(b"abcdefghij", key).splitlines(keepends=True)
+    chunks[0], chunks[1] = chunks[1], chunks[0]
+    with pytest.raises(ValueError, match="out of order"):
+        decrypt(magic + b"".join(chunks), key)
+
+
+def test_chunk_from_another_stream(key: bytes) -> None:
+    magic, *chunks = encrypt(b"abcdefghij", key).splitlines(keepends=True)
+    _, *other_chunks = encrypt(b"abcdefghij", key).splitlines(keepends=True)
+    with pytest.raises(ValueError, match="out of order"):
+        decrypt(magic + chunks[0] + other_chunks[1] + chunks[2], key)
+
+
+def test_data_after_last_chunk(key: bytes) -> None:
+    stream = encrypt(b"abc", key)
+    with pytest.raises(ValueError, match="after its last chunk"):
+        decrypt(stream + stream.splitlines(keepends=True)[-1], key)
+
+
+def test_short_chunk(key: bytes) -> None:
+    stream = crypt_message.STREAM_MAGIC + Fernet(key).encrypt(b"abc") + b"\n"
+    with pytest.raises(ValueError, match="too short"):
+        decrypt(stream, key)
+
+
+def test_not_a_stream(key: bytes) -> None:
+    with pytest.raises(ValueError, match="not an encrypted stream"):
+        decrypt(Fernet(key).encrypt(b"abc") + b"\n", key)
+
+
+def stream_args(tmp_path: Path, **kwargs) -> argparse.Namespace:
+    return argparse.Namespace(**{"input": str(tmp_path.joinpath("message.txt")),
+                                 "output": str(tmp_path.joinpath("message.txt.enc")),
+                                 "decrypt": False,
+                                 "chunk_size": 4,
+                                 **kwargs})
+
+
+def test_stream_missing_input(tmp_path: Path, key: bytes, capsys: pytest.CaptureFixture) -> None:
+    args = stream_args(tmp_path)
+    assert crypt_message.crypt_stream(args=args, key=key) == 1
+    assert "Failed to open the stream" in capsys.readouterr().err
+    assert not Path(args.output).exists()
+
+
+def test_stream_unwritable_output(tmp_path: Path, key: bytes, capsys: pytest.CaptureFixture) -> None:
+    args = stream_args(tmp_path, output=str(tmp_path.joinpath("missing", "message.txt.enc")))
+    Path(args.input).write_bytes(b"abc")
+    assert crypt_message.crypt_stream(args=args, key=key) == 1
+    assert "Failed to open the stream" in capsys.readouterr().err
+
+
+def test_stream_file_round_trip(tmp_path: Path, key: bytes) -> None:
+    args = stream_args(tmp_path)
+    Path(args.input).write_bytes(b"abcdefghij")
+    assert crypt_message.crypt_stream(args=args, key=key) == 0
+    decrypted = stream_args(tmp_path, input=args.output, output=str(tmp_path.joinpath("message.dec")), decrypt=True)
+    assert crypt_message.crypt_stream(args=decrypted, key=key) == 0
+    assert Path(decrypted.output).read_bytes() == b"abcdefghij"
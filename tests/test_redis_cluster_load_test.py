@@ -0,0 +1,138 @@
+import importlib.util
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# The script is not a module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "redis_cluster_load_test", Path(__file__).parent.parent.joinpath("bin", "redis-cluster-load-test.py"))
+load_test = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(load_test)
+
+WORKLOAD_PATH = Path(__file__).parent.parent.joinpath("conf", "redis-workload.yaml")
+
+
+def test_histogram_percentiles() -> None:
+    histogram = load_test.LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.record(value)
+
+    # The values below 2^10 have their own bucket, so they are exact
+    assert histogram.percentile(50) == 500
+    assert histogram.percentile(99) == 990
+    assert histogram.percentile(100) == 1000
+    assert histogram.total == 1000
+    assert load_test.LatencyHistogram().percentile(99) == 0
+
+
+def test_histogram_relative_error() -> None:
+    histogram = load_test.LatencyHistogram()
+    for value in (12345, 1_000_000, 123_456_789):
+        histogram.record(value)
+        assert value <= load_test.LatencyHistogram.highest_value_of(
+            load_test.LatencyHistogram.bucket_of(value)) <= value * 1.002
+
+    assert histogram.percentile(50) == pytest.approx(1_000_000, rel=0.002)
+    assert histogram.percentile(100) == 123_456_789
+
+
+def test_histogram_merge() -> None:
+    merged, low, high = load_test.LatencyHistogram(), load_test.LatencyHistogram(), load_test.LatencyHistogram()
+    for value in range(0, 5000, 7):
+        merged.record(value)
+        (low if value < 2500 else high).record(value)
+
+    low.merge(load_test.LatencyHistogram.from_list(high.to_list()))
+    assert low.counts == merged.counts
+    assert (low.total, low.max) == (merged.total, merged.max)
+    assert [low.percentile(p) for p in (50, 90, 99)] == [merged.percentile(p) for p in (50, 90, 99)]
+
+
+@pytest.mark.parametrize("key, slot", [
+    ("123456789", 0x31C3),
+    ("foo", 12182),
+    ("bar", 5061),
+    ("{user1000}.following", 3443),
+    ("{user1000}.followers", 3443),
+    # An empty hash tag hashes the whole key, and the tag ends at the first }
+    ("foo{}{bar}", 8363),
+    ("foo{{bar}}zap", 4015),
+    ("foo{bar}{zap}", 5061)])
+def test_key_slot(key: str, slot: int) -> None:
+    assert load_test.get_key_slot(key) == slot
+
+
+def test_find_slot_tags() -> None:
+    slots = [0, 5061, 12182, 16383]
+    tags = load_test.find_slot_tags(slots)
+
+    assert sorted(tags) == slots
+    for slot, tag in tags.items():
+        assert load_test.get_key_slot(f"lt:{{{tag}}}anything") == slot
+
+
+def test_parse_slots() -> None:
+    assert load_test.parse_slots("0-2, 5000,16383") == [0, 1, 2, 5000, 16383]
+    with pytest.raises(ValueError):
+        load_test.parse_slots("16380-16384")
+
+
+def test_key_generator_targets_slots() -> None:
+    payloads = load_test.PayloadPool(size=1024)
+    generator = load_test.KeyGenerator(payloads=payloads, key_space=1000, slots=[100, 200],
+                                       distribution="zipf", size=1024)
+
+    assert {load_test.get_key_slot(generator.key("string")) for _ in range(1000)} == {100, 200}
+    # The hottest key is in the first slot
+    assert load_test.get_key_slot(generator.key_of(0)) == 100
+    assert generator.key_of(0, "hash").startswith("lt:{")
+
+
+def test_key_generator_without_key_space() -> None:
+    payloads = load_test.PayloadPool(size=1024)
+    generator = load_test.KeyGenerator(payloads=payloads, slots=[42], prefix="test")
+
+    keys = [generator.key() for _ in range(100)]
+    assert {load_test.get_key_slot(key) for key in keys} == {42}
+    assert all(key.startswith("test:") for key in keys)
+
+
+def test_workload_profile() -> None:
+    workload = load_test.WorkloadProfile.load(path=WORKLOAD_PATH, name="session-store")
+
+    assert sorted(workload.operations) == ["del", "hget", "hgetall", "hset"]
+    assert workload.elements == (4, 16)
+    assert (workload.key_space, workload.ttl, workload.transaction) == (100000, 1800, True)
+    # The weights of the reads and the writes are scaled to the read ratio
+    draws = Counter(workload.operation() for _ in range(20000))
+    reads = sum(count for operation, count in draws.items() if operation in workload.READ_OPERATIONS)
+    assert reads / 20000 == pytest.approx(0.8, abs=0.02)
+
+
+def test_workload_commands() -> None:
+    workload = load_test.WorkloadProfile(name="test", profile={
+        "operations": {"hset": 1, "get": 1}, "elements": 3, "keys": {"ttl": 60}})
+    payloads = load_test.PayloadPool(size=1024)
+
+    hset, expire = workload.commands("hset", "lt:key", payloads)
+    assert hset[:2] == ("HSET", "lt:key") and len(hset) == 2 + 3 * 2
+    assert expire == ("EXPIRE", "lt:key", 60)
+    assert workload.commands("get", "lt:key", payloads) == [("GET", "lt:key")]
+    assert workload.commands("lrange", "lt:key", payloads) == [("LRANGE", "lt:key", 0, 99)]
+    assert workload.commands("set", "lt:key", payloads)[0][3:] == ("EX", 60)
+
+
+@pytest.mark.parametrize("profile", [
+    {"operations": {}},
+    {"operations": {"get": 1, "flushall": 1}},
+    {"operations": {"get": 1}, "read_ratio": 0.5},
+    {"operations": {"get": 1, "set": 1}, "read_ratio": 1.5}])
+def test_invalid_workload_profile(profile: dict) -> None:
+    with pytest.raises(ValueError):
+        load_test.WorkloadProfile(name="invalid", profile=profile)
+
+
+def test_unknown_workload_profile() -> None:
+    with pytest.raises(ValueError, match="not found"):
+        load_test.WorkloadProfile.load(path=WORKLOAD_PATH, name="missing")
@@ -0,0 +1,92 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+# The script is not a module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "redis_cluster_stand_in", Path(__file__).parent.parent.joinpath("bin", "redis-cluster-stand-in.py"))
+stand_in = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stand_in)
+
+
+def test_parse_commands() -> None:
+    buffer = bytearray(b"*3\r\n$3\r\nSET\r\n$3\r\nfoo\r\n$3\r\nbar\r\nPING\r\n*2\r\n$3\r\nGET\r\n$3\r\nf")
+
+    commands, parsed = stand_in.parse_commands(buffer)
+    # The incomplete command at the end is left in the buffer
+    assert commands == [[b"SET", b"foo", b"bar"], [b"PING"]]
+    assert buffer[parsed:] == b"*2\r\n$3\r\nGET\r\n$3\r\nf"
+
+    buffer = buffer[parsed:] + b"oo\r\n"
+    assert stand_in.parse_commands(buffer) == ([[b"GET", b"foo"]], len(buffer))
+
+
+def test_parse_binary_arguments() -> None:
+    value = b"a\r\nb\x00"
+    buffer = bytearray(b"*2\r\n$4\r\nECHO\r\n$%d\r\n%s\r\n" % (len(value), value))
+
+    assert stand_in.parse_commands(buffer) == ([[b"ECHO", value]], len(buffer))
+
+
+@pytest.mark.parametrize("reply, encoded", [
+    (None, b"$-1\r\n"),
+    (b"bar", b"$3\r\nbar\r\n"),
+    ("OK", b"+OK\r\n"),
+    (42, b":42\r\n"),
+    (True, b":1\r\n"),
+    (1.5, b"$3\r\n1.5\r\n"),
+    (stand_in.RedisError("ERR failed"), b"-ERR failed\r\n"),
+    ([b"a", [1, None]], b"*2\r\n$1\r\na\r\n*2\r\n:1\r\n$-1\r\n")])
+def test_encode_reply(reply, encoded: bytes) -> None:
+    assert stand_in.encode_reply(reply) == encoded
+
+
+@pytest.mark.parametrize("key, slot", [(b"123456789", 0x31C3), (b"foo", 12182), (b"{user1000}.following", 3443)])
+def test_key_slot(key: bytes, slot: int) -> None:
+    assert stand_in.get_key_slot(key) == slot
+
+
+@pytest.fixture
+def cluster():
+    # foo is in slot 12182, which the third node serves
+    return stand_in.StandInCluster(port=7001, nodes=3)
+
+
+def execute(node, *args: bytes, state=None):
+    return node.execute(state or stand_in.ConnectionState(), list(args))
+
+
+def test_moved(cluster) -> None:
+    first, _, third = cluster.nodes
+
+    assert str(execute(first, b"SET", b"foo", b"bar")) == "MOVED 12182 127.0.0.1:7003"
+    assert execute(third, b"SET", b"foo", b"bar") == "OK"
+    assert execute(third, b"GET", b"foo") == b"bar"
+
+    cluster.owners[12182] = first
+    assert str(execute(third, b"GET", b"foo")) == "MOVED 12182 127.0.0.1:7001"
+    assert execute(first, b"GET", b"foo") == b"bar"
+
+
+def test_ask(cluster) -> None:
+    first, _, third = cluster.nodes
+    cluster.ask_rate = 1.0
+
+    assert str(execute(third, b"GET", b"foo")) == "ASK 12182 127.0.0.1:7001"
+    # The target serves the slot only for the command following ASKING
+    state = stand_in.ConnectionState()
+    assert execute(first, b"ASKING", state=state) == "OK"
+    assert execute(first, b"GET", b"foo", state=state) is None
+    assert str(execute(first, b"GET", b"foo", state=state)) == "MOVED 12182 127.0.0.1:7003"
+
+
+def test_crossslot(cluster) -> None:
+    assert str(execute(cluster.nodes[2], b"DEL", b"foo", b"bar")).startswith("CROSSSLOT")
+    # Keys sharing a hash tag are in one slot
+    assert execute(cluster.nodes[2], b"DEL", b"{foo}a", b"{foo}b") == 0
+
+
+def test_slot_ranges(cluster) -> None:
+    assert [(start, end, node.index) for start, end, node in cluster.slot_ranges()] == [
+        (0, 5461, 0), (5462, 10922, 1), (10923, 16383, 2)]
@@ -0,0 +1,38 @@
+import argparse
+import importlib.util
+import json
+from pathlib import Path
+
+# The script is not a module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "redis_load_test_results", Path(__file__).parent.parent.joinpath("bin", "redis-load-test-results.py"))
+results = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(results)
+
+ARGS = argparse.Namespace(confidence=0.99, trim=5, throughput_threshold=0.05, latency_threshold=0.1,
+                          failure_threshold=0.001, percentiles=[50])
+
+
+def request(rates: list) -> dict:
+    return {"count": sum(rates), "failures": 0,
+            "throughput": json.dumps([[second, rate] for second, rate in enumerate(rates)]),
+            "histogram": json.dumps({"buckets": [[100, sum(rates)]]})}
+
+
+def throughput_row(baseline: list, candidate: list) -> dict:
+    rows = results.compare_runs((None, request(baseline)), (None, request(candidate)), ARGS)
+    return next(row for row in rows if row["metric"] == "req/s")
+
+
+def test_short_runs_show_untrimmed_rates() -> None:
+    row = throughput_row([100] * 12, [90] * 8 + [130] * 4)
+
+    assert (row["baseline"], row["candidate"]) == ("100.0", "103.3")
+    assert row["verdict"].startswith("insufficient data: needs 10s per run after trimming 5s")
+
+
+def test_long_runs_are_tested() -> None:
+    row = throughput_row([100, 101, 99, 100] * 10, [80, 81, 79, 80] * 10)
+
+    assert (row["baseline"], row["candidate"]) == ("100.0", "80.0")
+    assert row["verdict"] == "REGRESSION"